@@ -1,20 +1,135 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, make_response, copy_current_request_context, g
+from flask.sessions import SecureCookieSessionInterface
 import os
+import time
 from datetime import datetime
 import json
+import uuid
+import pandas as pd
+from werkzeug.datastructures import MultiDict
 from models.diet_model import DietPlanner
+from models.tenant_rules import TenantPlanners
+from models.allergens import parse_allergies
+from models.multi_week import MultiWeekPlanner
 
 from utils.health_calculator import HealthCalculator
 from utils.meal_database import MealDatabase
+from utils.render_cache import RenderCache, profile_hash
+from utils.plan_serializer import compact_plan, diff_plans, encode, available_mimetypes, JSON_MIMETYPE
+from utils.plan_store import PlanStore
+from utils.metrics import registry, timed, resident_memory_bytes
+from utils.profiler import SamplingProfiler
+from utils.single_flight import SingleFlight
+from utils.cohort_analytics import cohort_report
+from utils.job_queue import JobQueue, WorkerPool, LANES
+from utils.event_log import EventLog, FEEDBACK_ACTIONS
+from utils.compression import ResponseCompressor
+from utils.static_assets import StaticAssets
+from utils.vitals_store import VitalsStore, METRICS as VITALS_METRICS, PERIODS
+from utils.procurement import ProcurementStore, catalog_quantities, plan_quantities
+from models.features import MEAL_PREFERENCES
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
 
+# Per-request sampling profiles are opt-in (?profile=1 or X-Profile: 1) and
+# only honoured when BITEBALANCE_PROFILING=1
+app.config['PROFILING_ENABLED'] = os.environ.get('BITEBALANCE_PROFILING') == '1'
+app.config['PROFILE_DIR'] = os.environ.get('BITEBALANCE_PROFILE_DIR', 'profiles')
+
+# Background plan jobs (/api/jobs/...) run in a local worker pool; with
+# BITEBALANCE_ASYNC_JOBS=1 the assessment form uses it too
+app.config['ASYNC_JOBS'] = os.environ.get('BITEBALANCE_ASYNC_JOBS') == '1'
+app.config['JOB_DB'] = os.environ.get('BITEBALANCE_JOB_DB', 'data/jobs.db')
+app.config['JOB_WORKERS'] = int(os.environ.get('BITEBALANCE_JOB_WORKERS', '2'))
+app.config['JOB_MAX_WAIT'] = 30
+app.config['EVENT_DB'] = os.environ.get('BITEBALANCE_EVENT_DB', 'data/events.db')
+app.config['VITALS_DB'] = os.environ.get('BITEBALANCE_VITALS_DB', 'data/vitals.db')
+app.config['PROCUREMENT_DB'] = os.environ.get('BITEBALANCE_PROCUREMENT_DB', 'data/procurement.db')
+app.config['TREND_DAYS'] = 90
+
+# Per-clinic rule overlays, selected with a `clinic` field or an X-Clinic header
+app.config['TENANT_RULES'] = os.environ.get('BITEBALANCE_TENANT_RULES', 'data/tenant_rules.json')
+
+# HTML and JSON bodies of at least this many bytes are gzip/brotli compressed
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('BITEBALANCE_COMPRESS_MIN_SIZE', '1024'))
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    def save_session(self, app, session, response):
+        with timed('session_write'):
+            return super().save_session(app, session, response)
+
+app.session_interface = TimedSessionInterface()
+request_seconds = registry.histogram(
+    'bitebalance_request_seconds', 'Request latency by endpoint', 'endpoint')
+resident_memory = registry.gauge(
+    'bitebalance_resident_memory_bytes', 'Resident memory of each worker process', 'pid')
+jobs_queued = registry.gauge(
+    'bitebalance_jobs_queued', 'Background jobs waiting for a worker', 'lane')
+
 # Initialize components
 diet_planner = DietPlanner()
+tenant_planners = TenantPlanners(diet_planner, app.config['TENANT_RULES'])
+multi_week_planner = MultiWeekPlanner()
 
 health_calc = HealthCalculator()
 meal_db = MealDatabase()
+render_cache = RenderCache()
+plan_store = PlanStore()
+procurement = ProcurementStore(app.config['PROCUREMENT_DB'])
+event_log = EventLog(app.config['EVENT_DB'])
+vitals_store = VitalsStore(app.config['VITALS_DB'])
+static_assets = StaticAssets(app.static_folder)
+compress_response = ResponseCompressor(app.config['COMPRESS_MIN_SIZE'])
+plan_flight = SingleFlight()
+job_queue = JobQueue(app.config['JOB_DB'])
+job_pool = WorkerPool(app.config['JOB_DB'], processes=app.config['JOB_WORKERS'])
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if app.config['PROFILING_ENABLED'] and (
+            request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+        g.profiler = SamplingProfiler().start()
+
+@app.before_request
+def pin_meal_catalog():
+    # One catalog snapshot per request, even if a bulk edit publishes a new one meanwhile
+    g.meal_catalog = meal_db.snapshot()
+
+@app.after_request
+def record_request_time(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        path = profiler.write_collapsed(app.config['PROFILE_DIR'], request.endpoint or 'unknown')
+        response.headers['X-Profile-Path'] = path
+    if 'request_start' in g:
+        request_seconds.observe(request.endpoint or 'unknown', time.perf_counter() - g.request_start)
+    return response
+
+@app.after_request
+def compress(response):
+    # Registered last so it runs first and the request timer includes it
+    return compress_response(response, request.accept_encodings)
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = static_assets.url_filename(values['filename'])
+
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    # Built by `python -m utils.static_assets`; hashed names never change content
+    return static_assets.send(filename, request.accept_encodings)
+
+@app.route('/metrics')
+def metrics():
+    resident_memory.set(os.getpid(), resident_memory_bytes())
+    if os.path.exists(app.config['JOB_DB']):
+        for lane, depth in job_queue.depth().items():
+            jobs_queued.set(lane, depth)
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -27,40 +142,410 @@ def assessment():
 @app.route('/generate_plan', methods=['POST'])
 def generate_plan():
     try:
-        # Extract user data from form
-        user_data = {
-            'age': int(request.form.get('age')),
-            'gender': request.form.get('gender'),
-            'height': float(request.form.get('height')),
-            'weight': float(request.form.get('weight')),
-            'activity_level': request.form.get('activity_level'),
-            'systolic_bp': int(request.form.get('systolic_bp', 0)),
-            'diastolic_bp': int(request.form.get('diastolic_bp', 0)),
-            'blood_sugar': float(request.form.get('blood_sugar', 0)),
-            'conditions': request.form.getlist('conditions'),
-            'allergies': request.form.get('allergies', '').split(','),
-            'dietary_preferences': request.form.getlist('dietary_preferences')
-        }
+        user_data = build_user_data(request.form)
+        record_vitals(user_data)
+        if app.config['ASYNC_JOBS']:
+            job_id = enqueue_plan_jobs([user_data], 'interactive', owner=patient_owner())[0]
+            return redirect(url_for('plan_job', job_id=job_id), code=303)
         
-        # Calculate BMI and health metrics
-        user_data['bmi'] = health_calc.calculate_bmi(user_data['height'], user_data['weight'])
-        user_data['bmr'] = health_calc.calculate_bmr(user_data)
-        user_data['daily_calories'] = health_calc.calculate_daily_calories(user_data)
+        plan_id = profile_hash(user_data)
         
         # Generate meal plan using AI model
-        meal_plan = diet_planner.generate_meal_plan(user_data)
+        meal_plan = generate_shared_plan(plan_id, user_data)
+        return publish_plan(plan_id, user_data, meal_plan)
+        
+    except Exception as e:
+        return render_template('error.html', error=str(e))
+
+@app.route('/plan/job/<job_id>')
+def plan_job(job_id):
+    try:
+        # Hold the request briefly so quick jobs skip the waiting page
+        job = job_queue.wait(job_id, timeout=2)
+        if job is None or job['kind'] != 'meal_plan':
+            return render_template('error.html', error='Meal plan not found'), 404
+        if job['status'] == 'failed':
+            return render_template('error.html', error=job['error']), 500
+        if job['status'] != 'done':
+            return render_template('plan_pending.html', job=job, refresh_seconds=1), 202
+        
+        return publish_plan(job['payload']['plan_id'], job['payload']['user_data'], job['result'], job_owner(job))
+        
+    except Exception as e:
+        return render_template('error.html', error=str(e))
+
+@app.route('/plan/<plan_id>')
+def view_plan(plan_id):
+    try:
+        # Plan IDs can be derived from a profile, so check the caller before any cached page
+        stored = owned_plan(plan_id)
+        if stored is None:
+            return render_template('error.html', error='Meal plan not found'), 404
+        entry = render_cache.get_or_render(plan_id, lambda: render_plan_page(*stored))
+        
+        html, etag = entry
+        response = make_response(html)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        return render_template('error.html', error=str(e))
+
+@app.route('/api/plan', methods=['POST'])
+def api_plan():
+    try:
+        fields = request_fields()
+        user_data = build_user_data(fields)
+        record_vitals(user_data)
+        plan_id = profile_hash(user_data)
+        meal_plan = generate_shared_plan(plan_id, user_data)
+        store_plan(plan_id, user_data, meal_plan, patient_owner())
+        return negotiated(compact_plan(meal_plan, plan_id=plan_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/plan/weeks', methods=['POST'])
+def api_multi_week_plan():
+    try:
+        # ?weeks=1..12 (default 4), ?window=N days before a meal may repeat (default 7)
+        user_data = build_user_data(request_fields())
+        weeks = int(request.args.get('weeks', 4))
+        window = int(request.args.get('window', 7))
+        catalog = g.meal_catalog
+        summary, days = multi_week_planner.plan(planner_for(user_data), catalog, user_data, weeks, window)
+        summary['plan_id'] = plan_id = profile_hash(dict(user_data, weeks=weeks, window=window))
+        owner = patient_owner()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Newline-delimited JSON: the summary, then each day as soon as it is built
+    def lines():
+        yield encode(summary) + b'\n'
+        rows, servings = [], []
+        for day in days:
+            for meal in day['meals'].values():
+                rows.append(catalog.row_of(meal['id']))
+                servings.append(meal['servings'])
+            yield encode(day) + b'\n'
+        # Only fully delivered plans count toward procurement; they replace the patient's previous plan
+        procurement.record(owner, plan_id, user_data.get('clinic'), catalog_quantities(catalog, rows, servings))
+    return app.response_class(lines(), mimetype='application/x-ndjson')
+
+@app.route('/api/procurement')
+def api_procurement():
+    try:
+        # Totals over the plans of ?clinic= (or X-Clinic; all plans without either), or only ?plan_id=...
+        clinic = request.args.get('clinic') or request.headers.get('X-Clinic')
+        plan_ids = request.args.getlist('plan_id') or None
+        return negotiated(procurement.totals(clinic, plan_ids))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/plan/<plan_id>', methods=['GET'])
+def api_get_plan(plan_id):
+    stored = owned_plan(plan_id)
+    if stored is None:
+        return jsonify({'error': 'Meal plan not found'}), 404
+    return negotiated(compact_plan(stored[1], plan_id=plan_id))
+
+@app.route('/api/plan/<plan_id>', methods=['PATCH'])
+def api_patch_plan(plan_id):
+    try:
+        stored = owned_plan(plan_id)
+        if stored is None:
+            return jsonify({'error': 'Meal plan not found'}), 404
+        user_data, meal_plan = stored
+        
+        # Body: changed assessment fields, add_allergies/remove_allergies, and
+        # swap: [{"day": "Tuesday", "meal": "dinner"}] (no day = today's meal)
+        body = request.get_json() or {}
+        delta = dict(body)
+        swaps = [(swap.get('day'), swap['meal']) for swap in delta.pop('swap', [])]
+        new_user_data = build_user_data(json_fields(patched_fields(user_data, delta)))
+        
+        new_plan, rebuilt = planner_for(new_user_data).replan(user_data, meal_plan, new_user_data, swaps)
+        new_plan_id = plan_key(new_user_data, new_plan)
+        # The patched plan replaces the base plan as this patient's current one
+        store_plan(new_plan_id, new_user_data, new_plan, patient_owner())
+        event_log.log('plan_patched', plan_id, new_plan_id=new_plan_id, profile=new_user_data,
+                      meal_preference=new_plan.get('meal_preference'),
+                      changed=sorted(key for key in body if key != 'swap'), swaps=[{'day': day, 'meal': meal} for day, meal in swaps])
+        
+        old, new = compact_plan(meal_plan, plan_id=plan_id), compact_plan(new_plan, plan_id=new_plan_id)
+        return negotiated({'base_plan_id': plan_id, 'plan_id': new_plan_id,
+                           'meals_rebuilt': rebuilt, 'patch': diff_plans(old, new)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/plan/<plan_id>/feedback', methods=['POST'])
+def api_plan_feedback(plan_id):
+    try:
+        # Feedback feeds model updates, so only the plan's owner may give it
+        stored = owned_plan(plan_id)
+        if stored is None:
+            return jsonify({'error': 'Meal plan not found'}), 404
+        user_data, meal_plan = stored
+        
+        # Body: {"action": "accept" | "reject", "day": ..., "meal": ..., "preference": ...}
+        feedback = request.get_json() or {}
+        action = feedback.get('action')
+        if action not in FEEDBACK_ACTIONS:
+            raise ValueError(f"action must be one of {list(FEEDBACK_ACTIONS)}")
+        preference = feedback.get('preference')
+        if preference is not None and preference not in MEAL_PREFERENCES:
+            raise ValueError(f"Unknown meal preference {preference!r}")
         
-        # Store in session for later reference
-        session['user_data'] = user_data
-        session['meal_plan'] = meal_plan
+        event_log.log('feedback', plan_id, action=action, day=feedback.get('day'), meal=feedback.get('meal'),
+                      preference=preference, meal_preference=meal_plan.get('meal_preference'),
+                      profile=user_data)
+        return jsonify({'status': 'logged'}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/vitals/<metric>')
+def api_vitals(metric):
+    try:
+        if metric not in VITALS_METRICS:
+            return jsonify({'error': f"Unknown metric {metric!r}"}), 404
+        
+        # ?period=raw|day|week, ?start=&end= as Unix timestamps
+        period = request.args.get('period', 'raw')
+        start = int(request.args.get('start', 0))
+        end = int(request.args['end']) if 'end' in request.args else None
+        patient = patient_id()
+        if period == 'raw':
+            timestamps, values = vitals_store.range(patient, metric, start, end)
+            readings = [{'ts': ts, 'value': value} for ts, value in zip(timestamps.tolist(), values.tolist())]
+        elif period in PERIODS:
+            readings = vitals_store.rollups(patient, metric, period, start, end)
+        else:
+            raise ValueError(f"period must be 'raw' or one of {list(PERIODS)}")
+        return jsonify({'metric': metric, 'period': period, 'readings': readings})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/health_status')
+def api_health_status():
+    try:
+        user_data = session.get('user_data')
+        if user_data is None:
+            return jsonify({'error': 'No assessment yet'}), 404
+        days = int(request.args.get('days', app.config['TREND_DAYS']))
+        trends = vitals_store.trends(patient_id(), days)
+        return jsonify(health_calc.get_health_status(user_data, trends=trends))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/cohort_report', methods=['POST'])
+def api_cohort_report():
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            ext = os.path.splitext(upload.filename or '')[1].lower()
+            df = pd.read_parquet(upload) if ext in ('.parquet', '.pq') else pd.read_csv(upload)
+        else:
+            df = pd.DataFrame(request.get_json() or [])
+        
+        by = request.args.getlist('by')
+        return jsonify(cohort_report(df, by=by, health_calc=health_calc))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/jobs/plan', methods=['POST'])
+def api_enqueue_plan():
+    try:
+        # A JSON list is a roster: one job per profile, in the bulk lane by default
+        roster = request.get_json() if request.is_json else None
+        if isinstance(roster, list):
+            lane = request.args.get('lane', 'bulk')
+            profiles = [build_user_data(json_fields(fields)) for fields in roster]
+            owner = None
+        else:
+            lane = request.args.get('lane', 'interactive')
+            profiles = [build_user_data(request_fields())]
+            owner = patient_owner()
         
+        jobs = [{'job_id': job_id, 'status': 'queued', 'lane': lane,
+                 'status_url': url_for('api_job', job_id=job_id)}
+                for job_id in enqueue_plan_jobs(profiles, lane, owner)]
+        return jsonify({'jobs': jobs} if isinstance(roster, list) else jobs[0]), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    try:
+        # ?wait=N long-polls up to N seconds for the job to finish
+        wait = min(float(request.args.get('wait', 0)), app.config['JOB_MAX_WAIT'])
+        job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        body = {key: job[key] for key in ('kind', 'lane', 'status', 'attempts',
+                                          'created_at', 'started_at', 'finished_at')}
+        body['job_id'] = job['id']
+        if job['status'] == 'done':
+            store_plan(job['payload']['plan_id'], job['payload']['user_data'], job['result'], job_owner(job))
+            # Holding the job ID is what lets the caller fetch or patch its plan
+            plan_store.grant(job['payload']['plan_id'], patient_owner())
+            body['plan'] = compact_plan(job['result'], plan_id=job['payload']['plan_id'])
+        elif job['status'] == 'failed':
+            body['error'] = job['error']
+        return jsonify(body)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+def enqueue_plan_jobs(profiles, lane, owner=None):
+    """Queue one plan job per user_data dict and return the job IDs; roster jobs own their plans"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane {lane!r}, expected one of {sorted(LANES)}")
+    job_pool.ensure_started()
+    payloads = [{'user_data': user_data, 'plan_id': profile_hash(user_data)} for user_data in profiles]
+    if owner is not None:
+        for payload in payloads:
+            payload['owner'] = owner
+    return job_queue.enqueue_many('meal_plan', payloads, lane)
+
+def publish_plan(plan_id, user_data, meal_plan, owner=None):
+    """Keep the plan in the session, prerender its page and redirect to it"""
+    session['user_data'] = user_data
+    session['meal_plan'] = meal_plan
+    session['plan_id'] = plan_id
+    store_plan(plan_id, user_data, meal_plan, owner or patient_owner())
+    # A roster job owns its plan; the patient publishing it may see it too
+    plan_store.grant(plan_id, patient_owner())
+    
+    # Render the page off the request thread; the redirect picks it up
+    render_cache.prerender(plan_id, copy_current_request_context(
+        lambda: render_plan_page(user_data, meal_plan)))
+    
+    return redirect(url_for('view_plan', plan_id=plan_id), code=303)
+
+def store_plan(plan_id, user_data, meal_plan, owner):
+    """Keep a plan for patching and make its week the owner's plan in its clinic's procurement totals"""
+    plan_store.put(plan_id, user_data, meal_plan, owner)
+    try:
+        procurement.record(owner, plan_id, user_data.get('clinic'), plan_quantities(meal_plan))
+    except Exception as e:
+        print(f"Recording plan quantities failed: {e}")
+
+def patient_id():
+    """Patient the vitals belong to: one per signed session, never taken from request fields"""
+    return session.setdefault('patient_id', uuid.uuid4().hex)
+
+def patient_owner():
+    """Procurement owner of this session's plans"""
+    return f"patient:{patient_id()}"
+
+def job_owner(job):
+    """Procurement owner of a job's plan: the enqueuing patient, or the job itself for rosters"""
+    return job['payload'].get('owner') or f"job:{job['id']}"
+
+def record_vitals(user_data):
+    """Append an assessment's vitals to the patient's history; kept out of user_data so plan IDs stay shared"""
+    try:
+        vitals_store.append(patient_id(), {metric: user_data.get(metric) for metric in VITALS_METRICS})
+    except Exception as e:
+        print(f"Recording vitals failed: {e}")
+
+def owned_plan(plan_id):
+    """(user_data, meal_plan) of a recent plan this session owns, from the plan store or the session"""
+    stored = plan_store.get(plan_id, patient_owner())
+    if stored is None and session.get('plan_id') == plan_id:
+        stored = (session['user_data'], session['meal_plan'])
+    return stored
+
+def plan_key(user_data, meal_plan):
+    """Plan ID: the profile hash, plus any swapped slots since those differ from a fresh plan"""
+    variants = [f"{day or 'today'}/{meal_type}/{meal['variant']}"
+                for day, meal_type, meal in DietPlanner.plan_slots(meal_plan) if meal.get('variant')]
+    return profile_hash(dict(user_data, variants=variants) if variants else user_data)
+
+def patched_fields(user_data, delta):
+    """Assessment fields of a stored profile with a patch delta applied"""
+    fields = {key: user_data[key] for key in PROFILE_FIELDS if key in user_data}
+    allergies = list(fields.get('allergies', []))
+    allergies += [a for a in parse_allergies(delta.pop('add_allergies', [])) if a not in allergies]
+    removed = parse_allergies(delta.pop('remove_allergies', []))
+    fields['allergies'] = [a for a in allergies if a not in removed]
+    
+    unknown = set(delta) - set(PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields in patch: {sorted(unknown)}")
+    fields.update(delta)
+    return fields
+
+def negotiated(payload):
+    """Response encoded as JSON or msgpack according to the Accept header"""
+    mimetype = request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+    return app.response_class(encode(payload, mimetype), mimetype=mimetype)
+
+def generate_shared_plan(plan_id, user_data):
+    """Generate a plan, sharing the work with identical concurrent requests"""
+    def generate():
+        meal_plan = planner_for(user_data).generate_meal_plan(user_data)
+        event_log.log('plan_generated', plan_id, profile=user_data,
+                      meal_preference=meal_plan.get('meal_preference'))
+        return meal_plan
+    return plan_flight.do(plan_id, generate)
+
+def planner_for(user_data):
+    """The planner holding the rules of the profile's clinic"""
+    return tenant_planners.get(user_data.get('clinic'))
+
+def request_fields():
+    """Assessment fields from either a form post or a JSON body"""
+    if not request.is_json:
+        return request.form
+    return json_fields(request.get_json() or {})
+
+def json_fields(data):
+    """Form-like view of one JSON profile"""
+    data = dict(data)
+    if isinstance(data.get('allergies'), list):
+        data['allergies'] = ','.join(data['allergies'])
+    return MultiDict(data)
+
+PROFILE_FIELDS = ['age', 'gender', 'height', 'weight', 'activity_level', 'systolic_bp', 'diastolic_bp',
+                  'blood_sugar', 'conditions', 'allergies', 'dietary_preferences', 'clinic']
+
+def build_user_data(form):
+    # Extract user data from form
+    with timed('parse_form'):
+        user_data = {
+            'age': int(form.get('age')),
+            'gender': form.get('gender'),
+            'height': float(form.get('height')),
+            'weight': float(form.get('weight')),
+            'activity_level': form.get('activity_level'),
+            'systolic_bp': int(form.get('systolic_bp', 0)),
+            'diastolic_bp': int(form.get('diastolic_bp', 0)),
+            'blood_sugar': float(form.get('blood_sugar', 0)),
+            'conditions': form.getlist('conditions'),
+            'allergies': parse_allergies(form.get('allergies', '')),
+            'dietary_preferences': form.getlist('dietary_preferences')
+        }
+        # Only set for clinic requests, so plain profiles keep their plan IDs
+        clinic = form.get('clinic') or request.headers.get('X-Clinic')
+        if clinic:
+            tenant_planners.get(clinic)
+            user_data['clinic'] = clinic
+    
+    # Calculate BMI and health metrics
+    with timed('health_calculator'):
+        user_data['bmi'] = health_calc.calculate_bmi(user_data['height'], user_data['weight'])
+        user_data['bmr'] = health_calc.calculate_bmr(user_data)
+        user_data['daily_calories'] = health_calc.calculate_daily_calories(user_data)
+    return user_data
+
+def render_plan_page(user_data, meal_plan):
+    with timed('render_template'):
         return render_template('meal_plan.html', 
                              user_data=user_data, 
                              meal_plan=meal_plan,
                              health_metrics=health_calc.get_health_status(user_data))
-        
-    except Exception as e:
-        return render_template('error.html', error=str(e))
 
 
 @app.route('/api/meal_suggestions')
@@ -69,7 +554,7 @@ def meal_suggestions():
         meal_type = request.args.get('type', 'breakfast')
         user_data = session.get('user_data', {})
         
-        suggestions = meal_db.get_meal_suggestions(meal_type, user_data)
+        suggestions = meal_db.get_meal_suggestions(meal_type, user_data, catalog=g.meal_catalog)
         return jsonify(suggestions)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -77,7 +562,7 @@ def meal_suggestions():
 @app.route('/nutrition_info/<meal_id>')
 def nutrition_info(meal_id):
     try:
-        nutrition = meal_db.get_nutrition_info(meal_id)
+        nutrition = meal_db.get_nutrition_info(meal_id, catalog=g.meal_catalog)
         return render_template('nutrition_modal.html', nutrition=nutrition)
     except Exception as e:
         return render_template('error.html', error=str(e))
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+from werkzeug.datastructures import Headers
+from werkzeug.wrappers import Request, Response
+
+from utils.compression import ResponseCompressor
+from synthetic import make_profile
+
+
+@pytest.fixture(scope='module')
+def plan_page(planner):
+    # Plan JSON is a fair stand-in for the repetitive markup of the plan page
+    return json.dumps(planner.generate_meal_plan(make_profile('conditions')), indent=2).encode('utf-8')
+
+
+def accept_gzip():
+    return Request.from_values(headers=Headers({'Accept-Encoding': 'gzip'})).accept_encodings
+
+
+@pytest.mark.parametrize('etag', [False, True], ids=['dynamic', 'cached'])
+def bench_compress_response(benchmark, plan_page, etag):
+    compressor = ResponseCompressor()
+    accept = accept_gzip()
+
+    def respond():
+        response = Response(plan_page, mimetype='text/html')
+        if etag:
+            response.set_etag('plan0000')
+        return compressor(response, accept)
+
+    response = benchmark(respond)
+    benchmark.extra_info.update({'bytes': len(plan_page), 'wire_bytes': len(response.get_data())})
@@ -0,0 +1,49 @@
+import pytest
+
+from synthetic import make_profile, make_profiles, many_allergies
+
+
+@pytest.mark.parametrize('complexity', ['simple', 'conditions', 'complex'])
+def bench_generate_meal_plan(benchmark, planner, complexity):
+    benchmark(planner.generate_meal_plan, make_profile(complexity))
+
+
+@pytest.mark.parametrize('complexity', ['simple', 'complex'])
+def bench_calculate_nutrition_targets(benchmark, planner, complexity):
+    benchmark(planner._calculate_nutrition_targets, make_profile(complexity))
+
+
+@pytest.mark.parametrize('n_users', [1000, 100_000])
+def bench_nutrition_targets_batch(benchmark, planner, n_users):
+    benchmark(planner.calculate_nutrition_targets_batch, make_profiles(n_users))
+
+
+@pytest.mark.parametrize('n_allergies', [1, 10, 100])
+def bench_filter_meal_options(benchmark, planner, n_allergies):
+    template = planner._get_meal_templates()['dinner']
+    conditions = ['diabetes', 'heart_disease', 'hypertension', 'obesity']
+    benchmark(planner._filter_meal_options, template, conditions,
+              many_allergies(n_allergies), ['vegetarian'])
+
+
+REPLAN_EDITS = {
+    'weight': ({'weight': 80.0, 'daily_calories': 2300}, ()),
+    'allergy': ({'allergies': ['eggs']}, ()),
+    'swap': ({}, (('Tuesday', 'dinner'),))
+}
+
+
+@pytest.mark.parametrize('edit', list(REPLAN_EDITS))
+def bench_replan(benchmark, planner, edit):
+    profile = make_profile('conditions')
+    plan = planner.generate_meal_plan(profile)
+    changes, swaps = REPLAN_EDITS[edit]
+    benchmark(planner.replan, profile, plan, dict(profile, **changes), swaps)
+
+
+@pytest.mark.parametrize('overlay', ['limits', 'avoid_foods'])
+def bench_with_rule_overlay(benchmark, planner, overlay):
+    changes = {'hypertension': {'sodium_limit': 1200}, 'diabetes': {'sugar_limit': 20}}
+    if overlay == 'avoid_foods':
+        changes['heart_disease'] = {'avoid_foods': ['white rice', 'salmon', 'cheese']}
+    benchmark(planner.with_rule_overlay, changes)
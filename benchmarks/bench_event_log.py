@@ -0,0 +1,30 @@
+import pytest
+
+from utils.event_log import EventLog
+from synthetic import make_profile
+
+
+@pytest.fixture
+def event_log(tmp_path):
+    log = EventLog(str(tmp_path / 'events.db'))
+    log.log('warmup')
+    log.flush()
+    return log
+
+
+def bench_event_log_append(benchmark, event_log):
+    # Cost on the request path: queueing only, the write happens on the writer thread
+    profile = make_profile('conditions')
+    benchmark(event_log.log, 'feedback', 'plan0000', action='accept', profile=profile)
+    event_log.flush()
+
+
+def bench_event_log_group_commit(benchmark, event_log):
+    profile = make_profile('conditions')
+
+    def write_batch():
+        for _ in range(1000):
+            event_log.log('feedback', 'plan0000', action='accept', profile=profile)
+        event_log.flush()
+
+    benchmark.pedantic(write_batch, rounds=5, iterations=1)
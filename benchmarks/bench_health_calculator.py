@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from synthetic import make_profile
+
+
+def bench_calculate_bmi_scalar(benchmark, health_calc):
+    benchmark(health_calc.calculate_bmi, 172.0, 81.5)
+
+
+def bench_calculate_daily_calories_scalar(benchmark, health_calc):
+    benchmark(health_calc.calculate_daily_calories, make_profile())
+
+
+def bench_get_health_status_scalar(benchmark, health_calc):
+    benchmark(health_calc.get_health_status, make_profile())
+
+
+def bench_get_health_recommendations_scalar(benchmark, health_calc):
+    benchmark(health_calc.get_health_recommendations, make_profile())
+
+
+@pytest.mark.parametrize('n_rows', [1_000, 100_000, 1_000_000])
+def bench_calculate_bmi_array(benchmark, health_calc, n_rows):
+    rng = np.random.default_rng(42)
+    heights = rng.normal(165, 10, n_rows)
+    weights = rng.normal(70, 15, n_rows)
+    benchmark(health_calc.calculate_bmi, heights, weights)
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, WorkerPool
+
+
+def echo(payload):
+    time.sleep(payload.get('sleep', 0))
+    return payload
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = WorkerPool(str(tmp_path / 'jobs.db'), processes=2, handlers={'echo': echo})
+    yield pool.ensure_started()
+    pool.stop()
+
+
+def bench_job_round_trip(benchmark, pool):
+    queue = JobQueue(pool.path)
+
+    def round_trip():
+        job_id = queue.enqueue('echo', {})
+        assert queue.wait(job_id, timeout=30)['status'] == 'done'
+
+    benchmark.pedantic(round_trip, rounds=20, iterations=1)
+
+
+def bench_stop_after_worker_killed(benchmark, pool):
+    # A worker killed while idle must not wedge stop() for the others
+    queue = JobQueue(pool.path)
+    assert queue.wait(queue.enqueue('echo', {}), timeout=30)['status'] == 'done'
+    pool.workers[0].kill()
+    pool.workers[0].join()
+    pool.ensure_started()
+
+    def stop():
+        stopper = threading.Thread(target=pool.stop, daemon=True)
+        stopper.start()
+        stopper.join(timeout=20)
+        assert not stopper.is_alive(), 'WorkerPool.stop() hung after a worker was killed'
+
+    benchmark.pedantic(stop, rounds=1, iterations=1)
+
+
+def bench_requeue_killed_worker_job(benchmark, pool):
+    # The job of a worker killed mid-run is requeued when the pool replaces it, and finishes
+    queue = JobQueue(pool.path)
+    job_id = queue.enqueue('echo', {'sleep': 2}, lane='bulk')
+    while queue.get(job_id)['status'] != 'running':
+        time.sleep(0.05)
+    worker = next(process for process in pool.workers if process.pid == queue.get(job_id)['worker'])
+    worker.kill()
+    worker.join()
+
+    def recover():
+        pool.ensure_started()
+        return queue.wait(job_id, timeout=30)
+
+    job = benchmark.pedantic(recover, rounds=1, iterations=1)
+    assert job['status'] == 'done' and job['attempts'] == 2
@@ -0,0 +1,75 @@
+import gc
+import threading
+import tracemalloc
+
+import pytest
+
+from synthetic import make_synthetic_catalog
+from utils.meal_catalog import MealCatalog, Vocabulary
+from utils.meal_database import MealDatabase
+
+CATALOG_MEALS = 100_000
+
+
+def _allocated(build):
+    """Bytes still allocated by the object `build` returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_catalog_memory(benchmark):
+    meals_db, dict_bytes = _allocated(lambda: make_synthetic_catalog(CATALOG_MEALS))
+    catalog, catalog_bytes = _allocated(lambda: MealCatalog.from_meals_db(meals_db, Vocabulary()))
+
+    benchmark.extra_info['dict_bytes_per_meal'] = round(dict_bytes / CATALOG_MEALS)
+    benchmark.extra_info['catalog_bytes_per_meal'] = round(catalog_bytes / CATALOG_MEALS)
+    benchmark.extra_info['reduction'] = round(dict_bytes / catalog_bytes, 1)
+    print(f"\n{CATALOG_MEALS} meals: dicts {dict_bytes / CATALOG_MEALS:.0f} B/meal, "
+          f"catalog {catalog_bytes / CATALOG_MEALS:.0f} B/meal ({dict_bytes / catalog_bytes:.1f}x smaller)")
+    assert catalog_bytes * 3 < dict_bytes
+
+    benchmark.pedantic(MealCatalog.from_meals_db, args=(meals_db, Vocabulary()), rounds=3)
+
+
+def bench_catalog_meal_to_dict(benchmark, meal_db):
+    benchmark(meal_db.catalog.meal, len(meal_db.catalog) - 1)
+
+
+@pytest.mark.parametrize('edits', ['idle', 'bulk_edits', 'bulk_edits_persisted'])
+def bench_reads_during_bulk_edits(benchmark, tmp_path, edits):
+    meals_db = make_synthetic_catalog(CATALOG_MEALS)
+    db = MealDatabase()
+    db.meals_path = str(tmp_path / 'meals_database.json')
+    db.catalog = MealCatalog.from_meals_db(meals_db)
+    snacks = meals_db['snacks'][:1000]
+    dinner_ids = [meal['id'] for meal in meals_db['dinner'][:100]]
+
+    stop = threading.Event()
+
+    def writer():
+        # A 1000-meal bulk edit every second, each publishing a new snapshot
+        version = 0
+        while not stop.wait(1.0):
+            version = db.update_meals([('snacks', {**meal, 'name': f"{meal['name']} v{version}"}) for meal in snacks],
+                                      persist=edits == 'bulk_edits_persisted')
+
+    def reads():
+        catalog = db.snapshot()
+        for meal_id in dinner_ids:
+            assert db.get_nutrition_info(meal_id, catalog=catalog) is not None
+        db.get_meal_suggestions('dinner', {'conditions': ['diabetes']}, catalog=catalog)
+
+    thread = threading.Thread(target=writer)
+    if edits != 'idle':
+        thread.start()
+    try:
+        benchmark(reads)
+    finally:
+        stop.set()
+        if thread.is_alive():
+            thread.join()
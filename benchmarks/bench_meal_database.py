@@ -0,0 +1,44 @@
+import pytest
+
+from models.multi_week import MultiWeekPlanner
+from synthetic import make_profile
+
+
+def bench_get_nutrition_info(benchmark, meal_db):
+    # Worst case for the linear scan: the last meal in the catalog
+    last_id = meal_db.catalog.ids[-1]
+    assert benchmark(meal_db.get_nutrition_info, last_id) is not None
+
+
+def bench_get_nutrition_info_missing(benchmark, meal_db):
+    assert benchmark(meal_db.get_nutrition_info, 'missing') is None
+
+
+def bench_search_meals_by_name(benchmark, meal_db):
+    benchmark(meal_db.search_meals, 'mediterranean')
+
+
+def bench_search_meals_by_ingredient(benchmark, meal_db):
+    benchmark(meal_db.search_meals, 'quinoa', 'lunch')
+
+
+def bench_get_meals_by_condition(benchmark, meal_db):
+    benchmark(meal_db.get_meals_by_condition, 'diabetes')
+
+
+def bench_get_meal_suggestions(benchmark, meal_db):
+    benchmark(meal_db.get_meal_suggestions, 'dinner', make_profile('conditions'))
+
+
+def bench_calculate_daily_nutrition(benchmark, meal_db):
+    catalog = meal_db.catalog
+    selected = [catalog.meal(catalog.rows(meal_type)[0]) for meal_type in catalog.meal_types]
+    benchmark(meal_db.calculate_daily_nutrition, selected)
+
+
+@pytest.mark.parametrize('weeks', [4, 12])
+def bench_multi_week_plan(benchmark, planner, meal_db, weeks):
+    # Compatibility bitsets are cached per profile, so this is the repeat-visit cost
+    multi_week = MultiWeekPlanner()
+    profile = make_profile('complex')
+    benchmark(lambda: list(multi_week.plan(planner, meal_db.catalog, profile, weeks, window=14)[1]))
@@ -0,0 +1,63 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from models.diet_model import DietPlanner
+from synthetic import make_profile
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def bench_model_load(benchmark, trained_model):
+    path, _, _ = trained_model
+    benchmark(_load, path)
+
+
+def bench_predict_single_row(benchmark, trained_model):
+    path, scaler, X = trained_model
+    model = _load(path)
+    row = scaler.transform(X[:1])
+    benchmark(model.predict, row)
+
+
+def bench_predict_batch(benchmark, trained_model):
+    path, scaler, X = trained_model
+    model = _load(path)
+    batch = scaler.transform(np.repeat(X, 10, axis=0))
+    benchmark(model.predict, batch)
+
+
+@pytest.mark.parametrize('cache', ['hit', 'miss'])
+def bench_predict_meal_preference(benchmark, trained_model, cache):
+    path, _, _ = trained_model
+    planner = DietPlanner()
+    planner.model_path = path
+    planner.scaler_path = os.path.join(os.path.dirname(path), 'scaler.pkl')
+    planner._load_model()
+    profile = make_profile('conditions')
+    planner.predict_meal_preference(profile)
+    if cache == 'miss':
+        # A fresh cache per call: every lookup goes through the forest
+        benchmark(lambda: planner.prediction_cache.invalidate(planner.model_version)
+                  or planner.predict_meal_preference(profile))
+    else:
+        benchmark(planner.predict_meal_preference, profile)
+
+
+def bench_trainer_generate_synthetic_data(benchmark, trainer):
+    benchmark.pedantic(trainer.generate_synthetic_data, kwargs={'n_samples': 1000},
+                       rounds=3, iterations=1)
+
+
+def bench_trainer_prepare_features(benchmark, trainer, training_frame):
+    benchmark(trainer.prepare_features, training_frame)
+
+
+def bench_trainer_train_models(benchmark, trainer, training_frame):
+    X, y = trainer.prepare_features(training_frame)
+    benchmark.pedantic(trainer.train_models, args=(X, y), rounds=1, iterations=1)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from models.multi_week import MultiWeekPlanner
+from utils.procurement import ProcurementStore, catalog_quantities, plan_quantities
+from synthetic import make_profile
+
+N_PLANS = 10_000
+FACILITIES = 20
+
+
+@pytest.fixture(scope='module')
+def template_plans(planner):
+    return [planner.generate_meal_plan(make_profile(complexity))
+            for complexity in ('simple', 'conditions', 'complex')]
+
+
+@pytest.fixture(scope='module')
+def procurement(planner, meal_db, template_plans, tmp_path_factory):
+    # 10k patients' weekly plans over 20 facilities: half template plans, half one-week catalog plans
+    index = ProcurementStore(str(tmp_path_factory.mktemp('procurement') / 'procurement.db'))
+    catalog = meal_db.catalog
+    rng = np.random.default_rng(0)
+    encoded = [plan_quantities(plan) for plan in template_plans]
+    for i in range(N_PLANS // 2):
+        index.record(f"patient:t{i}", f"t{i % len(encoded)}", f"clinic-{i % FACILITIES}",
+                     encoded[i % len(encoded)])
+    for i in range(N_PLANS // 2):
+        rows = np.concatenate([rng.choice(catalog.rows(t), 7) for t in catalog.meal_types])
+        servings = rng.choice([0.5, 0.75, 1.0, 1.25, 1.5], len(rows))
+        index.record(f"patient:w{i}", f"w{i}", f"clinic-{i % FACILITIES}",
+                     catalog_quantities(catalog, rows, servings))
+    return index
+
+
+def bench_procurement_totals(benchmark, procurement):
+    report = benchmark(procurement.totals)
+    assert report['plans'] == N_PLANS
+
+
+def bench_procurement_totals_facility(benchmark, procurement):
+    report = benchmark(procurement.totals, 'clinic-3')
+    assert report['plans'] == N_PLANS // FACILITIES
+
+
+def bench_plan_quantities(benchmark, template_plans):
+    benchmark(plan_quantities, template_plans[0])
+
+
+def bench_multi_week_catalog_quantities(benchmark, planner, meal_db):
+    # Encoding a streamed 12-week plan once it has been delivered
+    days = list(MultiWeekPlanner().plan(planner, meal_db.catalog, make_profile('conditions'), 12)[1])
+    rows = [meal_db.catalog.row_of(meal['id']) for day in days for meal in day['meals'].values()]
+    servings = [meal['servings'] for day in days for meal in day['meals'].values()]
+    benchmark(catalog_quantities, meal_db.catalog, rows, servings)
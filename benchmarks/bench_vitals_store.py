@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from utils.vitals_store import VitalsStore
+
+DAY = 86400
+START = 1_700_000_000
+
+
+@pytest.fixture(scope='module')
+def vitals_store(tmp_path_factory):
+    # ~1M readings: four years of glucose-monitor data for one patient, plus
+    # 2000 patients with a hundred weekly-ish assessments each
+    store = VitalsStore(str(tmp_path_factory.mktemp('vitals') / 'vitals.db'))
+    rng = np.random.default_rng(0)
+    ts = START + np.cumsum(rng.integers(120, 240, 800_000))
+    store.append_series('cgm', 'blood_sugar', ts, 100 + 20 * np.sin(np.arange(len(ts)) / 500))
+    for patient in range(2000):
+        days = START + np.cumsum(rng.integers(1, 14, 100)) * DAY
+        store.append_series(f'p{patient}', 'weight', days, 80 - np.arange(100) * 0.05)
+    store.end = int(ts[-1])
+    return store
+
+
+def bench_vitals_append(benchmark, vitals_store):
+    ts = iter(range(START, START + 10_000_000, 60))
+    benchmark(lambda: vitals_store.append('append', {'systolic_bp': 120, 'diastolic_bp': 80,
+                                                     'blood_sugar': 95, 'weight': 70, 'bmi': 22.9},
+                                          next(ts)))
+
+
+def bench_vitals_range(benchmark, vitals_store):
+    benchmark(vitals_store.range, 'cgm', 'blood_sugar', vitals_store.end - 30 * DAY, vitals_store.end)
+
+
+def bench_vitals_trend(benchmark, vitals_store):
+    benchmark(vitals_store.trend, 'cgm', 'blood_sugar', 90, vitals_store.end)
+
+
+def bench_vitals_bytes_per_reading(benchmark, vitals_store):
+    stats = benchmark.pedantic(vitals_store.stats, rounds=1, iterations=1)
+    benchmark.extra_info.update(stats)
@@ -0,0 +1,76 @@
+"""
+Benchmark suite for the plan generation hot paths.
+
+Run from the repository root:
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks
+
+Every run is autosaved as JSON under .benchmarks/; compare two runs with
+
+    pytest-benchmark compare 0001 0002 --group-by=func
+"""
+
+import os
+import pickle
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app resolves models/ and data/ relative to the working directory
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_training import DietModelTrainer
+from models.diet_model import DietPlanner
+from utils.health_calculator import HealthCalculator
+from utils.meal_catalog import MealCatalog
+from utils.meal_database import MealDatabase
+
+from synthetic import make_synthetic_catalog
+
+CATALOG_SIZES = [10, 10_000, 100_000]
+
+
+@pytest.fixture(scope='session')
+def planner():
+    return DietPlanner()
+
+
+@pytest.fixture(scope='session')
+def health_calc():
+    return HealthCalculator()
+
+
+@pytest.fixture(scope='session', params=CATALOG_SIZES, ids=lambda n: f"{n}meals")
+def meal_db(request):
+    db = MealDatabase()
+    db.catalog = MealCatalog.from_meals_db(make_synthetic_catalog(request.param))
+    return db
+
+
+@pytest.fixture(scope='session')
+def trainer(tmp_path_factory):
+    trainer = DietModelTrainer()
+    # Keep benchmark artifacts out of the tracked data/ and models/ folders
+    trainer.data_dir = str(tmp_path_factory.mktemp('data'))
+    trainer.model_dir = str(tmp_path_factory.mktemp('trained'))
+    return trainer
+
+
+@pytest.fixture(scope='session')
+def training_frame(trainer):
+    return trainer.generate_synthetic_data(n_samples=1000)
+
+
+@pytest.fixture(scope='session')
+def trained_model(trainer, training_frame):
+    X, y = trainer.prepare_features(training_frame)
+    trainer.train_models(X, y)
+    trainer.save_models()
+    with open(os.path.join(trainer.model_dir, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    return os.path.join(trainer.model_dir, 'diet_model.pkl'), scaler, X
@@ -0,0 +1,219 @@
+"""
+HTTP load generator for a running BiteBalance instance.
+
+Replays assessment submissions drawn from data/synthetic_training_data.csv
+(with random allergies and dietary preferences) against /generate_plan and
+/api/meal_suggestions, then reports throughput and latency percentiles per
+endpoint. Worker memory is sampled from /metrics while the test runs, so
+growth is reported per worker PID.
+
+Usage (standard library only):
+
+    gunicorn -w 4 app:app &
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --users 16 --duration 60
+"""
+
+import argparse
+import csv
+import http.cookiejar
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'data', 'synthetic_training_data.csv')
+
+ALLERGENS = ['nuts', 'peanuts', 'eggs', 'dairy', 'soy', 'wheat', 'fish', 'shellfish', 'sesame']
+PREFERENCES = ['vegetarian', 'vegan', 'gluten_free', 'dairy_free', 'low_carb', 'mediterranean']
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks']
+
+_MEMORY_LINE = re.compile(r'^bitebalance_resident_memory_bytes\{pid="(\d+)"\} (\d+)', re.M)
+
+
+class ProfileGenerator:
+    """Draws realistic assessment form submissions from the training data"""
+
+    def __init__(self, path=DATA_PATH, seed=None):
+        with open(path, newline='') as f:
+            self.rows = list(csv.DictReader(f))
+        self.rng = random.Random(seed)
+
+    def submission(self):
+        row = self.rng.choice(self.rows)
+        fields = [
+            ('age', row['age']),
+            ('gender', row['gender']),
+            ('height', f"{float(row['height']):.1f}"),
+            ('weight', f"{float(row['weight']):.1f}"),
+            ('activity_level', row['activity_level']),
+            ('systolic_bp', str(round(float(row['systolic_bp'])))),
+            ('diastolic_bp', str(round(float(row['diastolic_bp'])))),
+            ('blood_sugar', f"{float(row['blood_sugar']):.1f}")
+        ]
+        fields += [('conditions', c) for c in row['conditions'].split(',') if c]
+
+        allergies = self.rng.sample(ALLERGENS, self.rng.choice([0, 0, 0, 1, 1, 2, 3]))
+        fields.append(('allergies', ', '.join(allergies)))
+
+        n_preferences = self.rng.choice([0, 0, 1, 1, 2])
+        fields += [('dietary_preferences', p) for p in self.rng.sample(PREFERENCES, n_preferences)]
+        return fields
+
+
+class Stats:
+    """Thread-safe latency samples per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok, size=0):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.bytes[endpoint] += size
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed):
+        report = {}
+        with self._lock:
+            for endpoint, samples in sorted(self.latencies.items()):
+                samples = sorted(samples)
+                report[endpoint] = {
+                    'requests': len(samples),
+                    'errors': self.errors[endpoint],
+                    'throughput_rps': round(len(samples) / elapsed, 2),
+                    'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                    'p90_ms': round(percentile(samples, 90) * 1000, 2),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 2),
+                    'max_ms': round(samples[-1] * 1000, 2),
+                    'avg_bytes': round(self.bytes[endpoint] / len(samples))
+                }
+        return report
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+def virtual_user(base_url, generator, stats, deadline, think_time):
+    # Each virtual user keeps its own cookie jar, like a browser session
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    while time.monotonic() < deadline:
+        body = urllib.parse.urlencode(generator.submission()).encode('utf-8')
+        timed_request(opener, stats, 'generate_plan', f"{base_url}/generate_plan", body)
+
+        for meal_type in random.sample(MEAL_TYPES, 2):
+            timed_request(opener, stats, 'meal_suggestions',
+                          f"{base_url}/api/meal_suggestions?type={meal_type}")
+        if think_time:
+            time.sleep(random.expovariate(1 / think_time))
+
+
+def timed_request(opener, stats, endpoint, url, body=None):
+    # Ask for compressed bodies like a browser; sizes are bytes on the wire
+    request = urllib.request.Request(url, data=body, headers={'Accept-Encoding': 'gzip'})
+    start = time.perf_counter()
+    ok, size = True, 0
+    try:
+        with opener.open(request, timeout=30) as response:
+            size = len(response.read())
+            ok = response.status < 400
+    except (urllib.error.URLError, OSError):
+        ok = False
+    stats.record(endpoint, time.perf_counter() - start, ok, size)
+
+
+def sample_memory(base_url, interval, stop, timeline):
+    """Poll /metrics; each scrape lands on one worker and reports its RSS"""
+    start = time.monotonic()
+    while not stop.wait(interval):
+        try:
+            with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+                text = response.read().decode('utf-8')
+        except (urllib.error.URLError, OSError):
+            continue
+        for pid, rss in _MEMORY_LINE.findall(text):
+            timeline[pid].append((round(time.monotonic() - start, 1), int(rss)))
+
+
+def memory_report(timeline):
+    report = {}
+    for pid, points in sorted(timeline.items()):
+        first, last = points[0], points[-1]
+        minutes = max((last[0] - first[0]) / 60, 1e-9)
+        report[pid] = {
+            'samples': len(points),
+            'start_mb': round(first[1] / 2**20, 1),
+            'end_mb': round(last[1] / 2**20, 1),
+            'growth_mb': round((last[1] - first[1]) / 2**20, 1),
+            'growth_mb_per_min': round((last[1] - first[1]) / 2**20 / minutes, 2) if len(points) > 1 else 0.0
+        }
+    return report
+
+
+def run(base_url, users, duration, think_time, memory_interval, seed):
+    generator = ProfileGenerator(seed=seed)
+    stats = Stats()
+    timeline = defaultdict(list)
+    stop = threading.Event()
+
+    sampler = threading.Thread(target=sample_memory, args=(base_url, memory_interval, stop, timeline), daemon=True)
+    sampler.start()
+
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(base_url, generator, stats, deadline, think_time), daemon=True)
+        for _ in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    stop.set()
+    sampler.join()
+    return {
+        'url': base_url,
+        'users': users,
+        'duration_s': round(elapsed, 1),
+        'endpoints': stats.report(elapsed),
+        'memory': memory_report(timeline)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running BiteBalance instance')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='test length in seconds')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between iterations (s)')
+    parser.add_argument('--memory-interval', type=float, default=1.0, help='seconds between /metrics scrapes')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    report = run(args.url.rstrip('/'), args.users, args.duration, args.think_time,
+                 args.memory_interval, args.seed)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Synthetic inputs for the benchmark suite: meal catalogs of arbitrary size
+and user profiles of increasing complexity.
+"""
+
+import random
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks']
+CONDITIONS = ['diabetes', 'heart_disease', 'hypertension', 'obesity']
+
+INGREDIENTS = [
+    'oatmeal', 'steel cut oats', 'blueberries', 'strawberries', 'almonds', 'cinnamon',
+    'greek yogurt', 'granola', 'honey', 'mixed berries', 'whole grain bread', 'avocado',
+    'eggs', 'tomato', 'lime', 'quinoa', 'chickpeas', 'kale', 'sweet potato', 'tahini',
+    'lemon', 'salmon', 'mixed greens', 'cucumber', 'olive oil', 'balsamic vinegar',
+    'red lentils', 'carrots', 'celery', 'onion', 'garlic', 'vegetable broth',
+    'chicken breast', 'broccoli', 'herbs', 'cod fillet', 'asparagus', 'firm tofu',
+    'brown rice', 'bell peppers', 'snap peas', 'ginger', 'soy sauce', 'apple',
+    'almond butter', 'hummus', 'lean beef', 'spinach', 'cottage cheese', 'walnuts'
+]
+
+NAME_WORDS = ['Roasted', 'Grilled', 'Baked', 'Fresh', 'Spiced', 'Herb', 'Garden',
+              'Mediterranean', 'Hearty', 'Light', 'Bowl', 'Salad', 'Wrap', 'Soup',
+              'Stir-Fry', 'Plate', 'Parfait', 'Toast', 'Skillet', 'Medley']
+
+
+def make_synthetic_catalog(n_meals, seed=42):
+    """Build a meals_db dict with the same schema as data/meals_database.json"""
+    rng = random.Random(seed)
+    # Separate stream, so quantities leave the rest of each catalog unchanged
+    amounts = random.Random(seed + 1)
+    catalog = {meal_type: [] for meal_type in MEAL_TYPES}
+    for i in range(n_meals):
+        meal_type = MEAL_TYPES[i % len(MEAL_TYPES)]
+        ingredients = rng.sample(INGREDIENTS, rng.randint(3, 7))
+        catalog[meal_type].append({
+            'id': f"{meal_type[0]}{i:06d}",
+            'name': ' '.join(rng.sample(NAME_WORDS, 3)) + f" {i}",
+            'ingredients': ingredients,
+            'nutrition': {
+                'calories': rng.randint(120, 700),
+                'protein': rng.randint(2, 50),
+                'carbs': rng.randint(5, 90),
+                'fat': rng.randint(1, 35),
+                'fiber': rng.randint(0, 18),
+                'sodium': rng.randint(0, 900),
+                'sugar': rng.randint(0, 30)
+            },
+            'health_conditions': rng.sample(CONDITIONS, rng.randint(0, 3)),
+            'prep_time': rng.choice([2, 5, 10, 15, 20, 25, 30, 45]),
+            'difficulty': rng.choice(['easy', 'medium', 'hard']),
+            'instructions': ['Prepare all ingredients', 'Cook and serve'],
+            'quantities': {ingredient: {'amount': amounts.choice([5, 10, 15, 30, 50, 80, 120, 150]),
+                                        'unit': amounts.choice(['g', 'g', 'g', 'ml'])}
+                           for ingredient in ingredients}
+        })
+    return catalog
+
+
+def make_profile(complexity='simple'):
+    """User profile as produced by app.build_user_data"""
+    profile = {
+        'age': 45,
+        'gender': 'female',
+        'height': 165.0,
+        'weight': 72.0,
+        'activity_level': 'moderate',
+        'systolic_bp': 125,
+        'diastolic_bp': 82,
+        'blood_sugar': 105.0,
+        'conditions': [],
+        'allergies': [],
+        'dietary_preferences': [],
+        'bmi': 26.4,
+        'bmr': 1405,
+        'daily_calories': 2178
+    }
+    if complexity in ('conditions', 'complex'):
+        profile['conditions'] = ['diabetes', 'hypertension']
+    if complexity == 'complex':
+        profile['conditions'] = list(CONDITIONS)
+        profile['allergies'] = ['nuts', 'eggs', 'shellfish']
+        profile['dietary_preferences'] = ['vegan']
+    return profile
+
+
+def make_profiles(n, seed=42):
+    """A population of profiles with random calories, weights and condition mixes"""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        profile = make_profile()
+        profile['daily_calories'] = rng.randint(1200, 3500)
+        profile['weight'] = round(rng.uniform(45, 140), 1)
+        profile['conditions'] = rng.sample(CONDITIONS, rng.randint(0, len(CONDITIONS)))
+        profiles.append(profile)
+    return profiles
+
+
+def many_allergies(n):
+    """A long allergy list, padded with names that match nothing"""
+    base = ['nuts', 'eggs', 'dairy', 'soy', 'wheat', 'fish', 'shellfish', 'sesame']
+    return (base + [f"allergen{i}" for i in range(max(0, n - len(base)))])[:n]
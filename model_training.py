@@ -9,16 +9,26 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import classification_report, accuracy_score
+from sklearn.utils.class_weight import compute_class_weight
 import pickle
 import json
 import os
+import argparse
 from datetime import datetime
 
+from models.compression import build_variants, evaluate_variant, select_variant
+from models.search import run_search, print_leaderboard
+from models.features import FeaturePipeline, FEATURE_NAMES, GENDERS, ACTIVITY_LEVELS, MEAL_PREFERENCES
+from utils.event_log import read_events
+
 class DietModelTrainer:
     def __init__(self):
         self.models = {}
         self.scalers = {}
         self.encoders = {}
+        self.pipeline = FeaturePipeline()
+        self.accuracy_tolerance = 0.01
+        self.compression_report = {}
         self.model_dir = 'models/trained'
         self.data_dir = 'data'
         
@@ -145,45 +155,17 @@ class DietModelTrainer:
         """Prepare features for machine learning"""
         print("Preparing features...")
         
-        # Create feature matrix
-        features = []
-        
-        # Numerical features
-        numerical_cols = ['age', 'height', 'weight', 'bmi', 'systolic_bp', 
-                         'diastolic_bp', 'blood_sugar', 'daily_calories']
-        
-        for col in numerical_cols:
-            features.append(df[col].values)
-        
-        # Encode categorical features
-        # Gender
-        gender_encoder = LabelEncoder()
-        gender_encoded = gender_encoder.fit_transform(df['gender'])
-        features.append(gender_encoded)
-        self.encoders['gender'] = gender_encoder
-        
-        # Activity level
-        activity_encoder = LabelEncoder()
-        activity_encoded = activity_encoder.fit_transform(df['activity_level'])
-        features.append(activity_encoded)
-        self.encoders['activity'] = activity_encoder
-        
-        # Health conditions (binary encoding)
-        condition_types = ['diabetes', 'heart_disease', 'hypertension', 'obesity']
-        for condition in condition_types:
-            condition_feature = df['conditions'].str.contains(condition, na=False).astype(int)
-            features.append(condition_feature.values)
-        
-        # Combine all features
-        X = np.column_stack(features)
+        # Same encoding the app uses for online inference
+        X = self.pipeline.transform(df)
+        y = self.pipeline.encode_target(df['meal_preference'])
         
-        # Target variable (meal preferences)
-        preference_encoder = LabelEncoder()
-        y = preference_encoder.fit_transform(df['meal_preference'])
-        self.encoders['meal_preference'] = preference_encoder
+        # Keep fitted encoders for compatibility with encoders.pkl consumers
+        self.encoders['gender'] = LabelEncoder().fit(GENDERS)
+        self.encoders['activity'] = LabelEncoder().fit(ACTIVITY_LEVELS)
+        self.encoders['meal_preference'] = LabelEncoder().fit(MEAL_PREFERENCES)
         
         print(f"Feature matrix shape: {X.shape}")
-        print(f"Target classes: {preference_encoder.classes_}")
+        print(f"Target classes: {self.encoders['meal_preference'].classes_}")
         
         return X, y
     
@@ -201,6 +183,7 @@ class DietModelTrainer:
         X_train_scaled = scaler.fit_transform(X_train)
         X_test_scaled = scaler.transform(X_test)
         self.scalers['main'] = scaler
+        self.train_split = (X_train_scaled, y_train)
 
         # Initialize models
         rf_model = RandomForestClassifier(
@@ -261,15 +244,8 @@ class DietModelTrainer:
 
         # Feature importance (if RF is selected)
         if isinstance(best_model, RandomForestClassifier):
-            feature_names = (
-                ['age', 'height', 'weight', 'bmi', 'systolic_bp',
-                'diastolic_bp', 'blood_sugar', 'daily_calories',
-                'gender', 'activity_level'] +
-                ['diabetes', 'heart_disease', 'hypertension', 'obesity']
-            )
-
             importances = best_model.feature_importances_
-            feature_importance = list(zip(feature_names, importances))
+            feature_importance = list(zip(FEATURE_NAMES, importances))
             feature_importance.sort(key=lambda x: x[1], reverse=True)
 
             print("\nTop 5 Feature Importances:")
@@ -278,6 +254,32 @@ class DietModelTrainer:
 
         return best_model, X_test_scaled, y_test
 
+    def compress_model(self, model, X_test, y_test):
+        """Pick the smallest model variant within the accuracy tolerance"""
+        print("\nCompressing model...")
+        X_train, y_train = self.train_split
+
+        variants = build_variants(model, X_train, y_train)
+        reports = {name: evaluate_variant(variant, X_test, y_test) for name, variant in variants.items()}
+
+        print(f"{'variant':<28}{'size KB':>10}{'p50 ms':>9}{'p99 ms':>9}{'batch ms':>10}{'accuracy':>10}")
+        for name, report in reports.items():
+            print(f"{name:<28}{report['size_bytes'] / 1024:>10.1f}{report['single_p50_ms']:>9.3f}"
+                  f"{report['single_p99_ms']:>9.3f}{report['batch_p50_ms']:>10.2f}{report['accuracy']:>10.3f}")
+
+        chosen = select_variant(reports, self.accuracy_tolerance)
+        print(f"Selected '{chosen}' (accuracy tolerance {self.accuracy_tolerance})")
+
+        # The full model stays the base for incremental updates
+        self.models['full'] = model
+        self.models['best'] = variants[chosen]
+        self.compression_report = {
+            'accuracy_tolerance': self.accuracy_tolerance,
+            'selected': chosen,
+            'variants': reports
+        }
+        return variants[chosen]
+
     
     def save_models(self):
         """Save trained models and encoders"""
@@ -288,6 +290,14 @@ class DietModelTrainer:
             with open(f'{self.model_dir}/diet_model.pkl', 'wb') as f:
                 pickle.dump(self.models['best'], f)
         
+        # Save the uncompressed model next to a compressed one; drop a stale one otherwise
+        full_path = f'{self.model_dir}/full_model.pkl'
+        if self.models.get('full') is not None and self.models['full'] is not self.models.get('best'):
+            with open(full_path, 'wb') as f:
+                pickle.dump(self.models['full'], f)
+        elif os.path.exists(full_path):
+            os.remove(full_path)
+        
         # Save scaler
         if 'main' in self.scalers:
             with open(f'{self.model_dir}/scaler.pkl', 'wb') as f:
@@ -300,16 +310,128 @@ class DietModelTrainer:
         # Save model metadata
         metadata = {
             'training_date': datetime.now().isoformat(),
-            'model_type': 'RandomForestClassifier',
+            'model_type': type(self.models['best']).__name__,
             'feature_count': len(self.encoders),
-            'classes': self.encoders['meal_preference'].classes_.tolist()
+            'classes': self.encoders['meal_preference'].classes_.tolist(),
+            'feature_names': FEATURE_NAMES
         }
         
         with open(f'{self.model_dir}/model_metadata.json', 'w') as f:
             json.dump(metadata, f, indent=2)
         
+        if self.compression_report:
+            with open(f'{self.model_dir}/compression_report.json', 'w') as f:
+                json.dump(self.compression_report, f, indent=2)
+        
         print("Models saved successfully!")
     
+    def feedback_examples(self, events_path, after_id=0):
+        """Labelled profiles from feedback events after `after_id`, and the last event ID read"""
+        profiles, labels, last_id = [], [], after_id
+        for event_id, _, _, _, data in read_events(events_path, after_id, kinds=['feedback']):
+            last_id = event_id
+            # Only an explicit preference is a label: the prediction never changes what a plan
+            # shows, so an accept of it would train the model on its own output
+            label = data.get('preference')
+            if label in MEAL_PREFERENCES and data.get('profile'):
+                profiles.append(data['profile'])
+                labels.append(label)
+        
+        df = pd.DataFrame(profiles)
+        if len(df):
+            df['conditions'] = df['conditions'].map(lambda c: ','.join(c) if isinstance(c, list) else c)
+            df['meal_preference'] = labels
+        return df, last_id
+    
+    def update_from_events(self, events_path='data/events.db', new_trees=25, replay_per_class=50):
+        """Grow the saved model with trees fit on feedback logged since the last update
+
+        A compressed model is never grown itself: the full model saved beside
+        it is warm-started, then compressed and selected again.
+        """
+        print("Updating model from feedback events...")
+        metadata_path = f'{self.model_dir}/model_metadata.json'
+        metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+        
+        feedback, last_id = self.feedback_examples(events_path, metadata.get('events_applied_through', 0))
+        if feedback.empty:
+            print("No new labelled feedback; model unchanged.")
+            return None
+        
+        full_path = f'{self.model_dir}/full_model.pkl'
+        compressed = os.path.exists(full_path)
+        with open(full_path if compressed else f'{self.model_dir}/diet_model.pkl', 'rb') as f:
+            model = pickle.load(f)
+        with open(f'{self.model_dir}/scaler.pkl', 'rb') as f:
+            scaler = pickle.load(f)
+        if isinstance(model, RandomForestClassifier):
+            n_estimators = len(model.estimators_) + new_trees
+        elif isinstance(model, GradientBoostingClassifier):
+            n_estimators = model.n_estimators_ + new_trees
+        else:
+            raise ValueError(f"the saved {type(model).__name__} cannot be grown incrementally and no full model "
+                             f"was saved beside it; retrain with `python model_training.py` first")
+        
+        # Replay a slice of the original data so every class is present in the new fit
+        replay_path = f'{self.data_dir}/synthetic_training_data.csv'
+        original = pd.read_csv(replay_path) if os.path.exists(replay_path) else self.generate_synthetic_data(2000)
+        replay = original.sample(frac=1, random_state=len(feedback)).groupby('meal_preference').head(replay_per_class)
+        df = pd.concat([feedback, replay], ignore_index=True)
+        
+        # Keep the original scaling: existing trees split on it
+        X = scaler.transform(self.pipeline.transform(df))
+        y = self.pipeline.encode_target(df['meal_preference'])
+        params = model.get_params()
+        model.set_params(warm_start=True, n_estimators=n_estimators)
+        preset = params.get('class_weight') in ('balanced', 'balanced_subsample')
+        if preset:
+            # Presets would be recomputed from this batch alone; pin them explicitly instead
+            classes = np.unique(y)
+            model.set_params(class_weight=dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y))))
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        if preset:
+            model.set_params(class_weight=params['class_weight'])
+        
+        served = model
+        if compressed:
+            # Score variants on the original held-out split and distil them from its training side plus the feedback
+            everything = pd.concat([original, feedback], ignore_index=True)
+            X_all = scaler.transform(self.pipeline.transform(everything))
+            y_all = self.pipeline.encode_target(everything['meal_preference'])
+            n = len(original)
+            X_train, X_test, y_train, y_test = train_test_split(
+                X_all[:n], y_all[:n], test_size=0.2, random_state=42, stratify=y_all[:n])
+            self.train_split = (np.vstack([X_train, X_all[n:]]), np.concatenate([y_train, y_all[n:]]))
+            report_path = f'{self.model_dir}/compression_report.json'
+            if os.path.exists(report_path):
+                with open(report_path) as f:
+                    self.accuracy_tolerance = json.load(f).get('accuracy_tolerance', self.accuracy_tolerance)
+            served = self.compress_model(model, X_test, y_test)
+            with open(full_path, 'wb') as f:
+                pickle.dump(model, f)
+            with open(report_path, 'w') as f:
+                json.dump(self.compression_report, f, indent=2)
+        
+        with open(f'{self.model_dir}/diet_model.pkl', 'wb') as f:
+            pickle.dump(served, f)
+        metadata['model_type'] = type(served).__name__
+        metadata['events_applied_through'] = last_id
+        metadata.setdefault('incremental_updates', []).append({
+            'date': datetime.now().isoformat(),
+            'feedback_examples': len(feedback),
+            'replay_examples': len(replay),
+            'n_estimators': n_estimators
+        })
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        
+        print(f"Added {new_trees} trees from {len(feedback)} feedback examples (events through #{last_id})")
+        return served
+    
     def create_nutrition_rules(self):
         """Create evidence-based nutrition rules"""
         print("Creating nutrition rules database...")
@@ -372,7 +494,7 @@ class DietModelTrainer:
         
         print("Nutrition rules created!")
     
-    def run_full_training(self):
+    def run_full_training(self, compress=True):
         """Run complete model training pipeline"""
         print("Starting full AI model training pipeline...")
         print("=" * 50)
@@ -386,6 +508,10 @@ class DietModelTrainer:
         # Train models
         best_model, X_test, y_test = self.train_models(X, y)
         
+        # Slim the model for serving
+        if compress:
+            best_model = self.compress_model(best_model, X_test, y_test)
+        
         # Save everything
         self.save_models()
         
@@ -401,8 +527,44 @@ class DietModelTrainer:
 
 def main():
     """Main training function"""
+    parser = argparse.ArgumentParser(description='Train the BiteBalance diet model')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.01,
+                        help='accuracy the compressed model may lose against the full model')
+    parser.add_argument('--no-compress', action='store_true', help='keep the full trained model')
+    commands = parser.add_subparsers(dest='command')
+    
+    search = commands.add_parser('search', help='resumable hyperparameter search')
+    search.add_argument('--data', default='data/synthetic_training_data.csv')
+    search.add_argument('--search-dir', default='models/search')
+    search.add_argument('--trials', type=int, default=40)
+    search.add_argument('--cores', type=int, default=None, help='worker processes (default: all cores)')
+    search.add_argument('--time-budget', type=float, default=600, help='seconds before no new trials start')
+    search.add_argument('--seed', type=int, default=42)
+    
+    update = commands.add_parser('update', help='grow the saved model from logged feedback events')
+    update.add_argument('--events', default='data/events.db')
+    update.add_argument('--trees', type=int, default=25, help='trees (or boosting stages) to add')
+    update.add_argument('--replay-per-class', type=int, default=50,
+                        help='original training rows per class mixed into the update')
+    args = parser.parse_args()
+    
+    if args.command == 'search':
+        leaderboard = run_search(args.search_dir, args.data, n_trials=args.trials, cores=args.cores,
+                                 time_budget=args.time_budget, seed=args.seed)
+        print_leaderboard(leaderboard)
+        print(f"\nLeaderboard saved to: {args.search_dir}/leaderboard.json")
+        return
+    
+    if args.command == 'update':
+        try:
+            DietModelTrainer().update_from_events(args.events, args.trees, args.replay_per_class)
+        except ValueError as e:
+            parser.exit(1, f"Model update failed: {e}\n")
+        return
+    
     trainer = DietModelTrainer()
-    model = trainer.run_full_training()
+    trainer.accuracy_tolerance = args.accuracy_tolerance
+    model = trainer.run_full_training(compress=not args.no_compress)
     
     print("\nTo use the trained model:")
     print("1. Start the Flask app: python app.py")
@@ -0,0 +1,226 @@
+"""
+Allergen normalization and per-ingredient allergen bitmasks.
+
+data/allergens.json lists canonical allergens, what users call them
+("names") and the foods that contain them ("foods"); an optional parent
+makes one allergen part of a broader one:
+
+    "almond": {"parent": "tree_nuts", "names": ["almond"], "foods": ["almond butter", ...]}
+
+Every allergen gets one bit. Names and foods are loaded into a trie over
+word tokens, so "apple with almond butter" is tagged almond | tree_nuts
+(longest match wins, so it is not also tagged dairy for "butter"), and a
+user's "Tree-Nuts" or " nuts" resolves to the same bits as "tree nuts".
+Matching an ingredient against a user's allergies is then one AND of two
+ints. Tokens miss compounds such as "chestnuts" for "nuts", so to fail
+closed every term, and for known terms the names of the allergens it
+covers, is also matched as a substring of the ingredient.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+# Entries that mean "no allergies" rather than an allergen called "none"
+NO_ALLERGY_TERMS = {'none', 'no', 'n', 'na', 'n a', 'nil', 'nothing', 'no allergies'}
+
+AllergenSet = namedtuple('AllergenSet', ['bits', 'terms', 'unknown', 'substrings'])
+NO_ALLERGENS = AllergenSet(0, (), (), ())
+
+
+def normalize_term(text):
+    """Lowercase, punctuation-free, single-spaced form of one allergy entry"""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).split())
+
+
+def parse_allergies(value):
+    """Allergy entries from a comma-separated string or a list: normalized, deduplicated, in input order"""
+    entries = value.split(',') if isinstance(value, str) else value or []
+    allergies = []
+    for entry in entries:
+        term = normalize_term(entry)
+        if term and term not in NO_ALLERGY_TERMS and term not in allergies:
+            allergies.append(term)
+    return allergies
+
+
+def tokens(text):
+    """Word tokens with a plural 's' dropped, so "almonds" and "almond" are one key"""
+    return [word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+            for word in normalize_term(text).split()]
+
+
+class _Node:
+    __slots__ = ('children', 'food', 'query')
+
+    def __init__(self):
+        self.children = {}
+        self.food = None   # bits of an ingredient containing this phrase
+        self.query = None  # bits a user means by this phrase
+
+
+class AllergenTrie:
+    """Phrase trie over word tokens"""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def _node(self, phrase):
+        node = self.root
+        for token in tokens(phrase):
+            node = node.children.setdefault(token, _Node())
+        return node
+
+    def add_name(self, phrase, bits):
+        node = self._node(phrase)
+        node.query = (node.query or 0) | bits
+
+    def add_food(self, phrase, bits, own_bit):
+        node = self._node(phrase)
+        node.food = (node.food or 0) | bits
+        # A user naming a food (e.g. "almond butter") means that food's own allergen
+        if node.query is None:
+            node.query = own_bit
+
+    def lookup(self, phrase):
+        """Query bits for an exact user phrase, or None"""
+        node = self.root
+        for token in tokens(phrase):
+            node = node.children.get(token)
+            if node is None:
+                return None
+        return node.query
+
+    def scan(self, text):
+        """OR of the food bits of every phrase in `text`, taking the longest match at each position"""
+        words = tokens(text)
+        bits = 0
+        i = 0
+        while i < len(words):
+            node, matched, end = self.root, None, i
+            for j in range(i, len(words)):
+                node = node.children.get(words[j])
+                if node is None:
+                    break
+                if node.food is not None:
+                    matched, end = node.food, j
+            if matched is None:
+                i += 1
+            else:
+                bits |= matched
+                i = end + 1
+        return bits
+
+
+class AllergenIndex:
+    """Allergen vocabulary, ingredient masks and a cache of normalized allergy sets"""
+
+    def __init__(self, path='data/allergens.json', max_sets=4096):
+        self.path = path
+        self.max_sets = max_sets
+        self.allergens = {}
+        self.bits = {}
+        self.closures = {}
+        self.trie = AllergenTrie()
+        self.fingerprint = None
+        self._masks = {}
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.allergens = json.load(f)
+            else:
+                print("No allergen list found. Matching allergies by name only.")
+            self._build()
+        except Exception as e:
+            print(f"Allergen loading failed: {e}")
+            self.allergens = {}
+            self.trie = AllergenTrie()
+            self._build()
+
+    def _build(self):
+        self.bits = {allergen: 1 << i for i, allergen in enumerate(self.allergens)}
+        self.closures = {}
+        for allergen, spec in self.allergens.items():
+            # Foods carry their allergen's bit and every ancestor's, so "tree nuts" catches almonds
+            closure, parent, seen = 0, allergen, set()
+            while parent is not None:
+                if parent not in self.bits or parent in seen:
+                    raise ValueError(f"Allergen {allergen} has an unknown or cyclic parent {parent!r}")
+                seen.add(parent)
+                closure |= self.bits[parent]
+                parent = self.allergens[parent].get('parent')
+
+            self.closures[allergen] = closure
+            own = self.bits[allergen]
+            for name in [allergen.replace('_', ' ')] + spec.get('names', []):
+                self.trie.add_name(name, own)
+            for food in spec.get('foods', []):
+                self.trie.add_food(food, closure, own)
+        payload = json.dumps(self.allergens, sort_keys=True).encode('utf-8')
+        self.fingerprint = hashlib.sha256(payload).hexdigest()[:16]
+
+    def normalize(self, allergies):
+        """AllergenSet for a user's allergy list, cached per distinct list"""
+        if not allergies:
+            return NO_ALLERGENS
+        key = tuple(allergies)
+        with self._lock:
+            allergen_set = self._sets.get(key)
+            if allergen_set is not None:
+                self._sets.move_to_end(key)
+                return allergen_set
+
+        bits, unknown = 0, []
+        terms = parse_allergies(list(allergies))
+        for term in terms:
+            query = self.trie.lookup(term)
+            if query is None:
+                unknown.append(term)
+            else:
+                bits |= query
+        allergen_set = AllergenSet(bits, tuple(terms), tuple(unknown), self._substrings(terms, bits))
+        with self._lock:
+            self._sets[key] = allergen_set
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+        return allergen_set
+
+    def _substrings(self, terms, bits):
+        """The terms plus the names of every allergen they cover, including narrower ones"""
+        substrings = list(terms)
+        for allergen, closure in self.closures.items():
+            if closure & bits:
+                spec = self.allergens[allergen]
+                substrings += [normalize_term(name) for name in [allergen.replace('_', ' ')] + spec.get('names', [])]
+        return tuple(dict.fromkeys(term for term in substrings if term))
+
+    def mask(self, item):
+        """Allergen bits of one ingredient"""
+        bits = self._masks.get(item)
+        if bits is None:
+            bits = self._masks[item] = self.trie.scan(item)
+        return bits
+
+    def excludes(self, item, allergen_set):
+        """Whether an ingredient is unsafe for a normalized allergy set"""
+        if self.mask(item) & allergen_set.bits:
+            return True
+        return self.contains(item, allergen_set.substrings)
+
+    def contains(self, item, substrings):
+        """Whether any of the normalized substrings occurs in the ingredient's name"""
+        if not substrings:
+            return False
+        text = normalize_term(item)
+        return any(term in text for term in substrings)
+
+    def names(self, bits):
+        return [allergen for allergen, bit in self.bits.items() if bits & bit]
@@ -0,0 +1,115 @@
+"""
+Post-training model compression: trade a little accuracy for a much
+smaller, faster model.
+
+Variants are derived from the trained model (the teacher): forests with
+fewer trees, depth-capped forests, a single distilled decision tree and a
+rule table keyed on the condition flags and an age bucket. Each variant is
+measured for size, single-row and batch latency, and held-out accuracy.
+"""
+
+import copy
+import pickle
+import time
+from collections import Counter
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.tree import DecisionTreeClassifier
+
+from models.features import FEATURE_NAMES, CONDITION_COL
+
+AGE_COL = FEATURE_NAMES.index('age')
+
+
+class RuleTableClassifier(ClassifierMixin, BaseEstimator):
+    """Lookup table from (condition flags, age bucket) to the most common label"""
+
+    def __init__(self, n_age_buckets=8):
+        self.n_age_buckets = n_age_buckets
+
+    def fit(self, X, y):
+        X = np.asarray(X)
+        self.classes_ = np.unique(y)
+        quantiles = np.linspace(0, 1, self.n_age_buckets + 1)[1:-1]
+        self.age_edges_ = np.unique(np.quantile(X[:, AGE_COL], quantiles))
+        # Conditions are 0/1 before scaling, so the midpoint splits them after
+        self.condition_thresholds_ = (X[:, CONDITION_COL:].min(axis=0) + X[:, CONDITION_COL:].max(axis=0)) / 2
+
+        votes = {}
+        for key, label in zip(self._keys(X), y):
+            votes.setdefault(key, Counter())[label] += 1
+        self.table_ = {key: counts.most_common(1)[0][0] for key, counts in votes.items()}
+        self.default_ = Counter(y).most_common(1)[0][0]
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X)
+        return np.array([self.table_.get(key, self.default_) for key in self._keys(X)])
+
+    def _keys(self, X):
+        flags = X[:, CONDITION_COL:] > self.condition_thresholds_
+        condition_bits = flags.astype(np.int64) @ (1 << np.arange(flags.shape[1]))
+        age_bucket = np.searchsorted(self.age_edges_, X[:, AGE_COL])
+        return (condition_bits * (len(self.age_edges_) + 1) + age_bucket).tolist()
+
+
+def build_variants(teacher, X_train, y_train, random_state=42):
+    """Candidate compressed models, keyed by name"""
+    variants = {'baseline': teacher}
+    teacher_labels = teacher.predict(X_train)
+
+    if isinstance(teacher, RandomForestClassifier):
+        for n_trees in (10, 25, 50, 100):
+            if n_trees < len(teacher.estimators_):
+                pruned = copy.copy(teacher)
+                pruned.estimators_ = teacher.estimators_[:n_trees]
+                pruned.n_estimators = n_trees
+                variants[f'forest_{n_trees}_trees'] = pruned
+
+        for depth in (6, 10):
+            capped = RandomForestClassifier(**{**teacher.get_params(), 'n_estimators': 50, 'max_depth': depth})
+            variants[f'forest_50_trees_depth_{depth}'] = capped.fit(X_train, y_train)
+
+    for depth in (6, 10):
+        tree = DecisionTreeClassifier(max_depth=depth, random_state=random_state)
+        variants[f'distilled_tree_depth_{depth}'] = tree.fit(X_train, teacher_labels)
+
+    variants['rule_table'] = RuleTableClassifier().fit(X_train, teacher_labels)
+    return variants
+
+
+def evaluate_variant(model, X_test, y_test, single_row_samples=200, batch_repeats=5):
+    """Size, latency percentiles and held-out accuracy of one model"""
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(X_test), single_row_samples)
+    single = []
+    for i in rows:
+        row = X_test[i:i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+
+    batch = []
+    for _ in range(batch_repeats):
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        batch.append(time.perf_counter() - start)
+
+    return {
+        'size_bytes': len(pickle.dumps(model)),
+        'single_p50_ms': round(float(np.percentile(single, 50)) * 1000, 4),
+        'single_p99_ms': round(float(np.percentile(single, 99)) * 1000, 4),
+        'batch_rows': len(X_test),
+        'batch_p50_ms': round(float(np.percentile(batch, 50)) * 1000, 4),
+        'accuracy': round(float(accuracy_score(y_test, y_pred)), 4)
+    }
+
+
+def select_variant(reports, tolerance):
+    """Smallest variant whose accuracy is within `tolerance` of the baseline"""
+    floor = reports['baseline']['accuracy'] - tolerance
+    eligible = [name for name, report in reports.items() if report['accuracy'] >= floor]
+    return min(eligible, key=lambda name: reports[name]['size_bytes'])
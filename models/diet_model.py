@@ -1,23 +1,78 @@
 import os
+import copy
 import json
 import pickle
+import hashlib
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 
+from models.allergens import AllergenIndex
+from models.features import FeaturePipeline, NUMERICAL_COLS
+from models.plan_table import PlanTable, CONDITIONS, source_fingerprint
+from models.prediction_cache import PredictionCache
+from models.target_rules import TargetRules
+from utils.metrics import timed_stage
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks']
+# Share of the day's targets each meal covers
+MEAL_SPLIT = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.3, 'snacks': 0.1}
+# Ingredient words each dietary preference rules out
+PREFERENCE_EXCLUSIONS = {
+    'vegetarian': ['chicken', 'beef', 'fish'],
+    'vegan': ['eggs', 'yogurt', 'cheese', 'chicken', 'beef', 'fish']
+}
+# Amounts of template ingredients in one meal of a 2000 kcal day, scaled with
+# the meal's calories; snack options made of several foods are listed by part
+REFERENCE_CALORIES = 2000
+TEMPLATE_QUANTITIES = {
+    'oatmeal': (50, 'g'), 'whole grain toast': (60, 'g'), 'whole grain bread': (60, 'g'),
+    'greek yogurt': (170, 'g'), 'eggs': (2, 'piece'), 'cottage cheese': (150, 'g'), 'nuts': (25, 'g'),
+    'berries': (100, 'g'), 'banana': (1, 'piece'), 'avocado': (0.5, 'piece'), 'seeds': (15, 'g'),
+    'olive oil': (10, 'ml'), 'quinoa': (75, 'g'), 'brown rice': (75, 'g'), 'whole grain wrap': (1, 'piece'),
+    'salad': (100, 'g'), 'grilled chicken': (150, 'g'), 'salmon': (150, 'g'), 'tofu': (150, 'g'),
+    'legumes': (120, 'g'), 'spinach': (60, 'g'), 'broccoli': (100, 'g'), 'bell peppers': (80, 'g'),
+    'tomatoes': (100, 'g'), 'sweet potato': (200, 'g'), 'cauliflower rice': (150, 'g'),
+    'grilled fish': (150, 'g'), 'lean beef': (130, 'g'), 'chicken breast': (150, 'g'), 'lentils': (80, 'g'),
+    'asparagus': (100, 'g'), 'brussels sprouts': (100, 'g'), 'kale': (60, 'g'), 'carrots': (80, 'g'),
+    'apple': (1, 'piece'), 'almond butter': (16, 'g'), 'hummus': (60, 'g'), 'vegetables': (100, 'g'),
+    'cucumber': (100, 'g')
+}
+TEMPLATE_PARTS = {
+    'apple with almond butter': ['apple', 'almond butter'],
+    'greek yogurt with berries': ['greek yogurt', 'berries'],
+    'hummus with vegetables': ['hummus', 'vegetables'],
+    'cottage cheese with cucumber': ['cottage cheese', 'cucumber']
+}
+
+# Profile fields each part of a plan depends on, for incremental re-planning;
+# a different clinic means different rules for both
+TARGET_INPUTS = {'daily_calories', 'weight', 'conditions', 'clinic'}
+FILTER_INPUTS = {'conditions', 'allergies', 'dietary_preferences', 'clinic'}
+PREFERENCE_INPUTS = set(NUMERICAL_COLS) | {'gender', 'activity_level', 'conditions'}
+
 class DietPlanner:
     def __init__(self):
         self.model_path = 'models/trained/diet_model.pkl'
         self.scaler_path = 'models/trained/scaler.pkl'
         self.meal_rules_path = 'data/meal_rules.json'
+        self.plan_table_path = 'models/trained/plan_table.json'
+        self.allergens_path = 'data/allergens.json'
         
         self.model = None
+        self.model_version = None
         self.scaler = None
+        self.prediction_cache = PredictionCache()
         self.meal_rules = {}
+        self.target_rules = None
+        self.plan_table = None
+        self.pipeline = FeaturePipeline()
+        self.allergens = AllergenIndex(self.allergens_path)
 
         self._load_model()
         self._load_meal_rules()
+        self._load_plan_table()
 
     # -----------------------------
     # MODEL AND RULE LOADING
@@ -26,9 +81,12 @@ class DietPlanner:
         try:
             if os.path.exists(self.model_path):
                 with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    blob = f.read()
                 with open(self.scaler_path, 'rb') as f:
                     self.scaler = pickle.load(f)
+                self.model = pickle.loads(blob)
+                # Cached predictions are only valid for the model that made them
+                self.model_version = hashlib.sha1(blob).hexdigest()[:12]
                 print("Model and scaler loaded.")
             else:
                 print("No model found. Using rule-based logic.")
@@ -46,6 +104,58 @@ class DietPlanner:
         except Exception as e:
             print(f"Rule loading failed: {e}")
             self.meal_rules = self._default_meal_rules()
+        self._compile_target_rules()
+
+    def _compile_target_rules(self):
+        try:
+            self.target_rules = TargetRules(self._with_default_targets(self.meal_rules))
+        except ValueError as e:
+            print(f"Target rule compilation failed: {e}")
+            self.target_rules = TargetRules(self._default_meal_rules())
+
+    def _with_default_targets(self, meal_rules):
+        # Rules written before target_rules existed keep the built-in adjustments,
+        # with built-in values for any limit those refer to
+        defaults = self._default_meal_rules()
+        return {cond: dict(defaults[cond], **value)
+                if cond in defaults and isinstance(value, dict) and 'target_rules' not in value else value
+                for cond, value in meal_rules.items()}
+
+    def with_rule_overlay(self, overlay):
+        """Planner view with `overlay` ({condition: {key: value}}) applied on top of these rules.
+
+        The model, templates and plan table slots are shared; only conditions the
+        overlay touches get new rule dicts, recompiled target rules and, when
+        their avoid-lists change, new plan table exclusion masks.
+        """
+        view = copy.copy(self)
+        view.meal_rules = dict(self.meal_rules)
+        for cond, changes in overlay.items():
+            view.meal_rules[cond] = dict(self.meal_rules.get(cond, {}), **changes)
+        changed = {cond: view.meal_rules[cond] for cond in overlay}
+        view.target_rules = self.target_rules.with_overlay(self._with_default_targets(changed))
+        avoid_changed = [cond for cond, changes in overlay.items() if 'avoid_foods' in changes]
+        if self.plan_table is not None and avoid_changed:
+            view.plan_table = self.plan_table.with_rules(view, avoid_changed)
+        return view
+
+    def _load_plan_table(self):
+        """Load the saved plan table, or build one in memory; only `python -m models.plan_table` writes it"""
+        try:
+            if os.path.exists(self.plan_table_path):
+                try:
+                    table = PlanTable.load(self.plan_table_path)
+                except ValueError:
+                    # Written by an older table version
+                    table = None
+                if table is not None and table.fingerprint == source_fingerprint(self):
+                    self.plan_table = table
+                    return
+                print("Plan table is stale. Rebuilding in memory; run `python -m models.plan_table` to save it.")
+            self.plan_table = PlanTable.build(self)
+        except Exception as e:
+            print(f"Plan table loading failed: {e}")
+            self.plan_table = None
 
     def _save_meal_rules(self):
         os.makedirs(os.path.dirname(self.meal_rules_path), exist_ok=True)
@@ -56,119 +166,225 @@ class DietPlanner:
         return {
             "diabetes": {
                 "carb_limit": 45,
+                "daily_carb_limit": 135,
                 "fiber_min": 25,
                 "sugar_limit": 25,
                 "recommended_foods": ["whole grains", "lean proteins", "non-starchy vegetables", "legumes", "nuts", "seeds", "low-fat dairy"],
-                "avoid_foods": ["refined sugars", "white bread", "sugary drinks", "processed foods", "high-sodium foods"]
+                "avoid_foods": ["refined sugars", "white bread", "sugary drinks", "processed foods", "high-sodium foods"],
+                "target_rules": [
+                    {"nutrient": "carbs", "max": "daily_carb_limit"},
+                    {"nutrient": "fiber", "min": "fiber_min"},
+                    {"nutrient": "sugar", "max": "sugar_limit"}
+                ]
             },
             "heart_disease": {
                 "sodium_limit": 2300,
                 "saturated_fat_limit": 13,
                 "fiber_min": 25,
                 "recommended_foods": ["fatty fish", "olive oil", "nuts", "whole grains", "fruits", "vegetables", "legumes"],
-                "avoid_foods": ["trans fats", "processed meats", "high-sodium foods", "refined carbohydrates", "excessive alcohol"]
+                "avoid_foods": ["trans fats", "processed meats", "high-sodium foods", "refined carbohydrates", "excessive alcohol"],
+                "target_rules": [
+                    {"nutrient": "sodium", "max": "sodium_limit"},
+                    {"nutrient": "fiber", "min": "fiber_min"},
+                    {"nutrient": "saturated_fat", "set": "saturated_fat_limit"}
+                ]
             },
             "hypertension": {
                 "sodium_limit": 1500,
                 "potassium_min": 3500,
                 "recommended_foods": ["leafy greens", "berries", "bananas", "beets", "oats", "garlic", "fatty fish", "seeds"],
-                "avoid_foods": ["processed foods", "canned soups", "deli meats", "pizza", "alcohol", "caffeine"]
+                "avoid_foods": ["processed foods", "canned soups", "deli meats", "pizza", "alcohol", "caffeine"],
+                "target_rules": [
+                    {"nutrient": "sodium", "max": "sodium_limit"},
+                    {"nutrient": "potassium", "set": "potassium_min"}
+                ]
             },
             "obesity": {
                 "calorie_deficit": 500,
                 "protein_min": 1.2,
                 "recommended_foods": ["lean proteins", "vegetables", "fruits", "whole grains", "legumes", "low-fat dairy"],
-                "avoid_foods": ["high-calorie drinks", "fried foods", "sweets", "processed snacks", "large portions"]
+                "avoid_foods": ["high-calorie drinks", "fried foods", "sweets", "processed snacks", "large portions"],
+                "target_rules": [
+                    {"nutrient": "calories", "subtract": "calorie_deficit"},
+                    {"nutrient": "protein", "min": "protein_min", "per_kg": True}
+                ]
             }
         }
 
     # -----------------------------
     # MEAL PLANNING INTERFACE
     # -----------------------------
+    @timed_stage('generate_meal_plan')
     def generate_meal_plan(self, user_data):
         try:
             nutrition = self._calculate_nutrition_targets(user_data)
             plan = {
                 meal: self._generate_meal(meal, user_data, nutrition)
-                for meal in ['breakfast', 'lunch', 'dinner', 'snacks']
+                for meal in MEAL_TYPES
             }
-            plan['weekly_plan'] = self._generate_weekly_variation(user_data)
+            plan['weekly_plan'] = self._generate_weekly_variation(user_data, nutrition)
             plan['nutrition_summary'] = nutrition
+            preference = self.predict_meal_preference(user_data)
+            if preference is not None:
+                plan['meal_preference'] = preference
             return plan
         except Exception as e:
             print(f"Failed to generate meal plan: {e}")
             return self._default_meal_plan()
 
+    @timed_stage('replan')
+    def replan(self, user_data, meal_plan, new_user_data, swaps=()):
+        """Patch a generated plan for changed inputs and swapped meals.
+
+        Only the parts that depend on what changed are rebuilt: targets and
+        portions for calorie or weight edits, ingredients for allergy,
+        condition or preference edits, and the swapped slots themselves.
+        Untouched meals are reused as-is. `swaps` are (day, meal_type) pairs,
+        day None for the single-day plan. Returns (plan, meals_rebuilt).
+        """
+        slots = dict(((day, meal_type), meal) for day, meal_type, meal in self.plan_slots(meal_plan))
+        for slot in swaps:
+            if slot not in slots:
+                raise ValueError(f"No meal to swap at {slot[0] or 'today'} {slot[1]}")
+        if len(slots) < len(MEAL_TYPES) * 8:
+            # Not a full generated plan (e.g. the fallback plan): start over
+            return self.generate_meal_plan(new_user_data), len(MEAL_TYPES) * 8
+
+        changed = {key for key in set(user_data) | set(new_user_data)
+                   if user_data.get(key) != new_user_data.get(key)}
+        nutrition = meal_plan.get('nutrition_summary')
+        if nutrition is None or changed & TARGET_INPUTS:
+            nutrition = self._calculate_nutrition_targets(new_user_data)
+        retarget = nutrition != meal_plan.get('nutrition_summary')
+        refilter = bool(changed & FILTER_INPUTS)
+        swaps = set(swaps)
+
+        # Slots of one meal type and variant come out identical, so build each once
+        rebuilt, portions = {}, {}
+
+        def patch(day, meal_type, meal):
+            variant = meal.get('variant', 0) + ((day, meal_type) in swaps)
+            if refilter or variant != meal.get('variant', 0):
+                key = (meal_type, variant)
+                if key not in rebuilt:
+                    rebuilt[key] = self._generate_meal(meal_type, new_user_data, nutrition, variant)
+                return rebuilt[key]
+            if retarget:
+                if meal_type not in portions:
+                    portions[meal_type] = self._calculate_portions(meal_type, nutrition)
+                return dict(meal, portions=portions[meal_type],
+                            nutrition=self._estimate_nutrition(portions[meal_type]),
+                            quantities=self._meal_quantities(meal_type, meal['ingredients'], portions[meal_type]))
+            return meal
+
+        plan = dict(meal_plan)
+        for meal_type in MEAL_TYPES:
+            plan[meal_type] = patch(None, meal_type, meal_plan[meal_type])
+        plan['weekly_plan'] = {}
+        for day, meals in meal_plan['weekly_plan'].items():
+            day_meals = {meal_type: patch(day, meal_type, meal) for meal_type, meal in meals.items()}
+            # Keep the original day object when nothing in it changed
+            unchanged = all(day_meals[m] is meals[m] for m in meals)
+            plan['weekly_plan'][day] = meals if unchanged else day_meals
+        plan['nutrition_summary'] = nutrition
+
+        if changed & PREFERENCE_INPUTS:
+            preference = self.predict_meal_preference(new_user_data)
+            if preference is not None:
+                plan['meal_preference'] = preference
+            else:
+                plan.pop('meal_preference', None)
+        return plan, len(rebuilt)
+
+    @staticmethod
+    def plan_slots(meal_plan):
+        """(day, meal_type, meal) for every meal of a plan; day is None for the single-day meals"""
+        for meal_type in MEAL_TYPES:
+            if isinstance(meal_plan.get(meal_type), dict):
+                yield None, meal_type, meal_plan[meal_type]
+        for day, meals in meal_plan.get('weekly_plan', {}).items():
+            for meal_type in MEAL_TYPES:
+                if isinstance(meals.get(meal_type), dict):
+                    yield day, meal_type, meals[meal_type]
+
+    @timed_stage('model_predict')
+    def predict_meal_preference(self, user_data):
+        if self.model is None or self.scaler is None:
+            return None
+        try:
+            return self.prediction_cache.get_or_predict(
+                self.model_version, self.pipeline.transform_one(user_data),
+                lambda row: self.pipeline.decode_target(self.model.predict(self.scaler.transform(row)))[0])
+        except Exception as e:
+            print(f"Model prediction failed: {e}")
+            return None
+
     # -----------------------------
     # CORE LOGIC
     # -----------------------------
+    @timed_stage('nutrition_targets')
     def _calculate_nutrition_targets(self, user_data):
-        base_cal = user_data.get('daily_calories', 2000)
-        weight = user_data.get('weight', 70)  # kg
+        return self.target_rules.targets_for(user_data)
+
+    def calculate_nutrition_targets_batch(self, users):
+        """Targets for many profiles at once, as NumPy arrays keyed by nutrient"""
+        return self.target_rules.evaluate_users(users)
+
+    def _generate_meal(self, meal_type, user_data, nutrition_targets, variant=0):
         conditions = user_data.get('conditions', [])
-        
-        targets = {
-            'calories': base_cal,
-            'protein': round(base_cal * 0.15 / 4),
-            'carbs': round(base_cal * 0.5 / 4),
-            'fat': round(base_cal * 0.35 / 9),
-            'fiber': 25,
-            'sodium': 2300,
-            'sugar': 50
-        }
+        allergies = user_data.get('allergies', [])
+        preferences = user_data.get('dietary_preferences', [])
+
+        if self._use_plan_table(conditions):
+            # Precomputed path: a table lookup plus portion scaling
+            excluded = self.plan_table.excluded(conditions, allergies, preferences, self)
+            ingredients = self.plan_table.ingredients(meal_type, excluded)
+            health_benefits = self.plan_table.health_benefits(conditions)
+        else:
+            templates = self._get_meal_templates()
+            ingredients = self._filter_meal_options(templates[meal_type], conditions, allergies, preferences)
+            health_benefits = self._get_health_benefits(conditions)
 
-        for cond in conditions:
-            rules = self.meal_rules.get(cond, {})
-            if cond == 'diabetes':
-                targets['carbs'] = min(targets['carbs'], 135)
-                targets['fiber'] = max(targets['fiber'], rules.get('fiber_min', 25))
-                targets['sugar'] = min(targets['sugar'], rules.get('sugar_limit', 50))
-            elif cond == 'heart_disease':
-                targets['sodium'] = min(targets['sodium'], rules.get('sodium_limit', 2300))
-                targets['fiber'] = max(targets['fiber'], rules.get('fiber_min', 25))
-                targets['saturated_fat'] = rules.get('saturated_fat_limit', 13)
-            elif cond == 'hypertension':
-                targets['sodium'] = min(targets['sodium'], rules.get('sodium_limit', 2300))
-                targets['potassium'] = rules.get('potassium_min', 3500)
-            elif cond == 'obesity':
-                targets['calories'] -= rules.get('calorie_deficit', 500)
-                targets['protein'] = max(targets['protein'], round(weight * rules.get('protein_min', 1.2)))
-        
-        return targets
-
-    def _generate_meal(self, meal_type, user_data, nutrition_targets):
-        templates = self._get_meal_templates()
-        ingredients = self._filter_meal_options(
-            templates[meal_type],
-            user_data.get('conditions', []),
-            user_data.get('allergies', []),
-            user_data.get('dietary_preferences', [])
-        )
         portions = self._calculate_portions(meal_type, nutrition_targets)
-        return {
+        meal = {
             'name': f"Personalized {meal_type.title()}",
             'ingredients': ingredients,
             'portions': portions,
             'instructions': self._generate_instructions(),
             'nutrition': self._estimate_nutrition(portions),
-            'health_benefits': self._get_health_benefits(user_data.get('conditions', []))
+            'health_benefits': health_benefits
         }
+        if variant:
+            # A swapped meal leads with different options from each category
+            meal['name'] += f" (Option {variant + 1})"
+            meal['ingredients'] = {cat: items[variant % len(items):] + items[:variant % len(items)] if items else items
+                                   for cat, items in ingredients.items()}
+            meal['variant'] = variant
+        meal['quantities'] = self._meal_quantities(meal_type, meal['ingredients'], portions)
+        return meal
 
+    def _use_plan_table(self, conditions):
+        # Conditions outside the table's space still go through the live filter
+        return self.plan_table is not None and all(c in CONDITIONS for c in conditions)
+
+    @timed_stage('filter_meal_options')
     def _filter_meal_options(self, template, conditions, allergies, preferences):
-        filtered = {}
-        for cat, items in template.items():
-            filtered[cat] = [
-                item for item in items
-                if not any(allergy.lower() in item.lower() for allergy in allergies)
-                and not ('vegetarian' in preferences and any(m in item.lower() for m in ['chicken', 'beef', 'fish']))
-                and not ('vegan' in preferences and any(v in item.lower() for v in ['eggs', 'yogurt', 'cheese', 'chicken', 'beef', 'fish']))
-                and all(avoid not in item.lower() for cond in conditions for avoid in self.meal_rules.get(cond, {}).get('avoid_foods', []))
-            ]
-        return filtered
+        allowed = self.ingredient_filter(conditions, allergies, preferences)
+        return {cat: [item for item in items if allowed(item)] for cat, items in template.items()}
+
+    def ingredient_filter(self, conditions, allergies, preferences):
+        """Predicate telling whether an ingredient suits the user's allergies, preferences and conditions"""
+        allergen_set = self.allergens.normalize(allergies)
+        words = [word for preference in preferences for word in PREFERENCE_EXCLUSIONS.get(preference, [])]
+        words += [avoid for cond in conditions for avoid in self.meal_rules.get(cond, {}).get('avoid_foods', [])]
+
+        def allowed(item):
+            lowered = item.lower()
+            return not self.allergens.excludes(item, allergen_set) and all(word not in lowered for word in words)
+        return allowed
 
     def _calculate_portions(self, meal, targets):
-        split = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.3, 'snacks': 0.1}
-        factor = split[meal]
+        factor = MEAL_SPLIT[meal]
         return {
             'calories': round(targets['calories'] * factor),
             'protein': round(targets['protein'] * factor),
@@ -176,6 +392,19 @@ class DietPlanner:
             'fat': round(targets['fat'] * factor)
         }
 
+    def _meal_quantities(self, meal_type, ingredients, portions):
+        """Amounts of the leading option of each ingredient category, scaled to the meal's calories"""
+        scale = portions['calories'] / (REFERENCE_CALORIES * MEAL_SPLIT[meal_type])
+        quantities = {}
+        for items in ingredients.values():
+            if not items:
+                continue
+            for part in TEMPLATE_PARTS.get(items[0], [items[0]]):
+                if part in TEMPLATE_QUANTITIES and part not in quantities:
+                    amount, unit = TEMPLATE_QUANTITIES[part]
+                    quantities[part] = {'amount': round(amount * scale, 1), 'unit': unit}
+        return quantities
+
     def _generate_instructions(self):
         return [
             "Prepare all ingredients.",
@@ -204,12 +433,15 @@ class DietPlanner:
         }
         return [msg for cond in conditions for msg in benefits.get(cond, [])]
 
-    def _generate_weekly_variation(self, user_data):
+    @timed_stage('weekly_variation')
+    def _generate_weekly_variation(self, user_data, nutrition_targets=None):
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        if nutrition_targets is None:
+            nutrition_targets = self._calculate_nutrition_targets(user_data)
         return {
             day: {
-                meal: self._generate_meal(meal, user_data, self._calculate_nutrition_targets(user_data))
-                for meal in ['breakfast', 'lunch', 'dinner', 'snacks']
+                meal: self._generate_meal(meal, user_data, nutrition_targets)
+                for meal in MEAL_TYPES
             }
             for day in days
         }
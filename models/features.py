@@ -0,0 +1,145 @@
+"""
+Feature pipeline shared by model training and online inference.
+
+Columns are laid out as the trained scaler and model expect them:
+8 numerical features, gender, activity level, then one flag per condition.
+Categoricals use fixed vocabularies (in LabelEncoder's sorted order, so
+existing models stay valid) and conditions are parsed once into an exact
+multi-hot matrix rather than substring-matched per condition.
+"""
+
+import numpy as np
+import pandas as pd
+
+NUMERICAL_COLS = ['age', 'height', 'weight', 'bmi', 'systolic_bp',
+                  'diastolic_bp', 'blood_sugar', 'daily_calories']
+GENDERS = ['female', 'male']
+ACTIVITY_LEVELS = ['active', 'light', 'moderate', 'sedentary', 'very_active']
+CONDITION_TYPES = ['diabetes', 'heart_disease', 'hypertension', 'obesity']
+MEAL_PREFERENCES = ['balanced', 'calcium_rich', 'complex_carbs', 'dash_diet', 'high_fiber',
+                    'high_protein', 'low_calorie', 'low_carb', 'low_sodium', 'mediterranean',
+                    'omega3_rich', 'portion_controlled', 'potassium_rich', 'vitamin_d_rich']
+
+FEATURE_NAMES = NUMERICAL_COLS + ['gender', 'activity_level'] + CONDITION_TYPES
+
+GENDER_COL = len(NUMERICAL_COLS)
+ACTIVITY_COL = GENDER_COL + 1
+CONDITION_COL = ACTIVITY_COL + 1
+
+_GENDER_CODES = {g: i for i, g in enumerate(GENDERS)}
+_ACTIVITY_CODES = {a: i for i, a in enumerate(ACTIVITY_LEVELS)}
+_CONDITION_CODES = {c: i for i, c in enumerate(CONDITION_TYPES)}
+
+
+def normalize_gender(value):
+    """Form of a gender value that training and inference both encode (' Male' -> 'male')"""
+    return str(value).strip().lower()
+
+
+class FeaturePipeline:
+    """Encodes user profiles into the float32 feature matrix used by the diet model"""
+
+    dtype = np.float32
+    n_features = len(FEATURE_NAMES)
+
+    # -----------------------------
+    # BATCH (TRAINING) PATH
+    # -----------------------------
+    def transform(self, df, out=None):
+        """Encode a DataFrame into a (n, n_features) array, optionally into `out`"""
+        n = len(df)
+        if out is None:
+            out = np.empty((n, self.n_features), dtype=self.dtype)
+
+        for i, col in enumerate(NUMERICAL_COLS):
+            out[:, i] = df[col].to_numpy(dtype=self.dtype, copy=False)
+        out[:, GENDER_COL] = self._normalized_codes(df['gender'], _GENDER_CODES, normalize_gender)
+        out[:, ACTIVITY_COL] = self._codes(df['activity_level'], ACTIVITY_LEVELS)
+        out[:, CONDITION_COL:] = self.condition_matrix(df['conditions'])
+        return out
+
+    def condition_matrix(self, conditions):
+        """Exact-match multi-hot boolean matrix from a comma-joined conditions column"""
+        # Only a few distinct condition strings exist, so parse each once
+        codes, uniques = pd.factorize(conditions.fillna(''), use_na_sentinel=False)
+        lookup = np.zeros((len(uniques), len(CONDITION_TYPES)), dtype=bool)
+        for i, value in enumerate(uniques):
+            for condition in str(value).split(','):
+                code = _CONDITION_CODES.get(condition)
+                if code is not None:
+                    lookup[i, code] = True
+        return lookup[codes]
+
+    def encode_target(self, preferences):
+        codes = self._codes(preferences, MEAL_PREFERENCES)
+        if (codes < 0).any():
+            unknown = sorted(set(preferences[codes < 0]))
+            raise ValueError(f"Unknown meal preference labels: {unknown}")
+        return codes.astype(np.int64)
+
+    def transform_csv(self, path, chunksize=1_000_000, out_path=None, target='meal_preference'):
+        """Encode a CSV in chunks with bounded memory.
+
+        Writes features into a preallocated array (a .npy memmap when out_path
+        is given) and returns (X, y).
+        """
+        n_rows = sum(len(chunk) for chunk in pd.read_csv(path, usecols=[target], chunksize=chunksize))
+        if out_path:
+            X = np.lib.format.open_memmap(out_path, mode='w+', dtype=self.dtype, shape=(n_rows, self.n_features))
+        else:
+            X = np.empty((n_rows, self.n_features), dtype=self.dtype)
+        y = np.empty(n_rows, dtype=np.int64)
+
+        start = 0
+        for chunk in self.iter_csv(path, chunksize, target):
+            end = start + len(chunk)
+            self.transform(chunk, out=X[start:end])
+            y[start:end] = self.encode_target(chunk[target])
+            start = end
+        if out_path:
+            X.flush()
+        return X, y
+
+    def iter_csv(self, path, chunksize, target='meal_preference'):
+        columns = NUMERICAL_COLS + ['gender', 'activity_level', 'conditions', target]
+        dtypes = {col: self.dtype for col in NUMERICAL_COLS}
+        dtypes.update({'gender': 'category', 'activity_level': 'category', 'conditions': str})
+        return pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize,
+                           keep_default_na=False)
+
+    # -----------------------------
+    # ONLINE (INFERENCE) PATH
+    # -----------------------------
+    def transform_one(self, user_data):
+        """Encode one user_data dict (as built by the app) into a (1, n_features) row"""
+        row = np.zeros((1, self.n_features), dtype=self.dtype)
+        for i, col in enumerate(NUMERICAL_COLS):
+            row[0, i] = user_data.get(col) or 0
+        row[0, GENDER_COL] = _GENDER_CODES.get(normalize_gender(user_data.get('gender', '')), -1)
+        row[0, ACTIVITY_COL] = _ACTIVITY_CODES.get(user_data.get('activity_level'), -1)
+        conditions = user_data.get('conditions', [])
+        if isinstance(conditions, str):
+            conditions = conditions.split(',')
+        for condition in conditions:
+            code = _CONDITION_CODES.get(condition)
+            if code is not None:
+                row[0, CONDITION_COL + code] = 1
+        return row
+
+    def decode_target(self, codes):
+        return [MEAL_PREFERENCES[int(code)] for code in codes]
+
+    # -----------------------------
+    # HELPERS
+    # -----------------------------
+    @staticmethod
+    def _codes(values, vocabulary):
+        # Unknown values map to -1
+        return pd.Categorical(values, categories=vocabulary).codes
+
+    @staticmethod
+    def _normalized_codes(values, codes, normalize):
+        # Few distinct values exist, so normalize each once; unknown values map to -1
+        index, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+        lookup = np.array([codes.get(normalize(value), -1) for value in uniques], dtype=np.int8)
+        return lookup[index]
@@ -0,0 +1,274 @@
+"""
+Multi-week meal plans drawn from the meal catalog.
+
+For a profile, each catalog meal is checked once against the planner's
+ingredient filter (allergies, dietary preferences, condition avoid-lists);
+the meals that pass form one bitset per meal type, cached for profiles
+that filter alike. Days are filled by rotating a cursor through each
+bitset, skipping meals served within the last `window` days, and
+backtracking over a few candidates per slot until the day's totals meet
+the nutrition targets. Meals are scaled in quarter servings toward their
+share of the day's calories.
+
+Days are yielded as they are built, so a 12-week plan can be streamed.
+"""
+
+import math
+import threading
+import weakref
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from models.diet_model import MEAL_SPLIT, MEAL_TYPES
+from utils.meal_catalog import BASE_UNITS, NO_PREP_TIME, NUTRIENTS
+from utils.render_cache import profile_hash
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MAX_WEEKS = 12
+SERVING_STEP = 0.25
+MIN_SERVINGS = 0.5
+MAX_SERVINGS = 2.0
+# A day meets its targets with calories within this fraction of the target
+# and each limited nutrient at most this fraction over its target
+TOLERANCE = 0.1
+LIMITED_NUTRIENTS = ('carbs', 'sodium', 'sugar')
+CANDIDATES_PER_SLOT = 6
+
+_COLUMNS = [NUTRIENTS.index('calories')] + [NUTRIENTS.index(n) for n in LIMITED_NUTRIENTS]
+
+
+class MultiWeekPlanner:
+    """Streams long plans from the catalog with no-repeat windows and per-day target checks"""
+
+    def __init__(self, max_profiles=1024):
+        self.max_profiles = max_profiles
+        # planner -> compatibility key -> (catalog, bitsets); views per clinic filter differently
+        self._compatible = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def compatible(self, planner, catalog, user_data):
+        """Per meal type: (bitset of catalog meals the user can eat, subset suited to their conditions)
+
+        Bit i stands for catalog.rows(meal_type)[i].
+        """
+        conditions = sorted(user_data.get('conditions', []))
+        preferences = sorted(user_data.get('dietary_preferences', []))
+        allergen_set = planner.allergens.normalize(user_data.get('allergies', []))
+        key = (tuple(conditions), allergen_set.terms, tuple(preferences))
+        with self._lock:
+            entries = self._compatible.setdefault(planner, OrderedDict())
+            entry = entries.get(key)
+            if entry is not None and entry[0] is catalog:
+                entries.move_to_end(key)
+                return entry[1]
+
+        # One filter call per distinct ingredient term, not per meal
+        allowed = planner.ingredient_filter(conditions, allergen_set.terms, preferences)
+        excluded = catalog.rows_with_ingredient_matching(lambda term: not allowed(term))
+        suited = catalog.rows_with_conditions(conditions) if conditions else None
+        bitsets = {}
+        # Meals whose calories or limited nutrients are unknown cannot be checked against the targets
+        unknown = np.isnan(catalog.nutrition[:, _COLUMNS]).any(axis=1)
+        for meal_type in MEAL_TYPES:
+            rows = catalog.rows(meal_type)
+            ok = ~excluded[rows] & ~unknown[rows]
+            preferred = np.zeros(len(rows), dtype=bool)
+            if suited is not None:
+                preferred[np.isin(rows, suited)] = True
+            bitsets[meal_type] = (_bitset(ok), _bitset(ok & preferred))
+
+        with self._lock:
+            entries[key] = (catalog, bitsets)
+            while len(entries) > self.max_profiles:
+                entries.popitem(last=False)
+        return bitsets
+
+    def plan(self, planner, catalog, user_data, weeks=4, window=7):
+        """(summary, days): targets and effective repeat windows, and a generator of day dicts"""
+        if not 1 <= weeks <= MAX_WEEKS:
+            raise ValueError(f"weeks must be between 1 and {MAX_WEEKS}")
+        if window < 0:
+            raise ValueError("window must not be negative")
+        targets = planner._calculate_nutrition_targets(user_data)
+        bitsets = self.compatible(planner, catalog, user_data)
+        # A window can only be as long as the meals available to fill it
+        windows = {meal_type: max(0, min(window, bin(bitsets[meal_type][0]).count('1') - 1))
+                   for meal_type in MEAL_TYPES}
+        summary = {'weeks': weeks, 'days': weeks * 7, 'repeat_window': windows, 'targets': targets,
+                   'meals_available': {t: bin(bitsets[t][0]).count('1') for t in MEAL_TYPES}}
+        return summary, self._days(catalog, user_data, targets, bitsets, windows, weeks * 7)
+
+    def _days(self, catalog, user_data, targets, bitsets, windows, n_days):
+        calories = targets['calories']
+        bounds = (calories * (1 - TOLERANCE), calories * (1 + TOLERANCE),
+                  [targets.get(n, float('inf')) * (1 + TOLERANCE) for n in LIMITED_NUTRIENTS])
+        slots = [_Slot(catalog, meal_type, targets, bounds, *bitsets[meal_type], windows[meal_type])
+                 for meal_type in MEAL_TYPES]
+        seed = int(profile_hash(user_data), 16)
+        for slot in slots:
+            slot.cursor = seed % slot.size if slot.size else 0
+        meals = {}
+
+        for index in range(n_days):
+            picks, meets = _search(slots, bounds)
+            served = [(slot, pick) for slot, pick in zip(slots, picks) if pick is not None]
+            rows = [int(slot.rows[pick]) for slot, pick in served]
+            servings = [float(slot.servings[pick]) for slot, pick in served]
+            scaled = np.round(catalog.nutrition[rows].astype(np.float64) * np.array(servings)[:, None], 1)
+
+            day_meals = {}
+            for (slot, pick), row, amount, nutrition in zip(served, rows, servings, scaled.tolist()):
+                slot.serve(pick)
+                meal = meals.get(row)
+                if meal is None:
+                    # Only the columns a plan shows, decoded once per meal per plan
+                    prep_time = int(catalog.prep_time[row])
+                    ingredients = catalog.vocabulary.lookup(catalog.ingredients[row])
+                    # Per-serving amounts of the quantified ingredients
+                    amounts = zip(catalog.amounts[row].tolist(), catalog.units[row].tolist())
+                    known = [(name, a, BASE_UNITS[u]) for name, (a, u) in zip(ingredients, amounts)
+                             if not math.isnan(a)]
+                    meal = meals[row] = (catalog.ids[row], catalog.names[row], ingredients,
+                                         None if prep_time == NO_PREP_TIME else prep_time, known)
+                day_meals[slot.meal_type] = {
+                    'id': meal[0],
+                    'name': meal[1],
+                    'servings': amount,
+                    'ingredients': meal[2],
+                    'quantities': {name: {'amount': round(a * amount, 1), 'unit': unit}
+                                   for name, a, unit in meal[4]},
+                    'nutrition': {n: None if math.isnan(v) else v for n, v in zip(NUTRIENTS, nutrition)},
+                    'prep_time': meal[3]
+                }
+            totals = np.round(np.nansum(scaled, axis=0), 1).tolist() if rows else [0.0] * len(NUTRIENTS)
+            yield {
+                'day_index': index,
+                'week': index // 7 + 1,
+                'day': DAYS[index % 7],
+                'meals': day_meals,
+                'totals': dict(zip(NUTRIENTS, totals)),
+                'meets_targets': meets and len(day_meals) == len(slots)
+            }
+
+
+class _Slot:
+    """Rotation and recent-use state of one meal type during a plan"""
+
+    def __init__(self, catalog, meal_type, targets, bounds, bits, preferred, window):
+        self.meal_type = meal_type
+        self.rows = catalog.rows(meal_type)
+        self.size = len(self.rows)
+        self.bits = bits
+        self.preferred = preferred
+        self.recent = 0
+        self.served = deque()
+        self.window = window
+        self.cursor = 0
+
+        # Quarter servings toward this meal's share of the day's calories
+        nutrition = catalog.nutrition[self.rows][:, _COLUMNS].astype(np.float64)
+        budget = targets['calories'] * MEAL_SPLIT[meal_type]
+        meal_calories = nutrition[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            servings = np.where(meal_calories > 0, budget / meal_calories, 1.0)
+        servings = np.clip(np.round(servings / SERVING_STEP) * SERVING_STEP, MIN_SERVINGS, MAX_SERVINGS)
+        self.servings = servings
+        self.scaled = nutrition * servings[:, None]
+
+        # Meals that stay within this meal's share of every daily bound; a day
+        # of such meals meets its targets, so they are tried first
+        low, high, limits = bounds
+        share = MEAL_SPLIT[meal_type]
+        fits = (self.scaled[:, 0] >= low * share) & (self.scaled[:, 0] <= high * share)
+        for column, limit in enumerate(limits, start=1):
+            fits &= self.scaled[:, column] <= limit * share
+        self.fits = _bitset(fits)
+
+    def candidates(self, limit):
+        """Up to `limit` bit positions not served within the window: meals fitting their share of
+        the targets first, condition-suited ones ahead of the rest, each tier in rotation order"""
+        available = self.bits & ~self.recent
+        fitting, other = available & self.fits, available & ~self.fits
+        found = []
+        for tier in (fitting & self.preferred, fitting & ~self.preferred,
+                     other & self.preferred, other & ~self.preferred):
+            if not tier:
+                continue
+            for position in _rotation(tier, self.cursor):
+                found.append(position)
+                if len(found) == limit:
+                    return found
+        return found
+
+    def serve(self, position):
+        self.cursor = position + 1 if position + 1 < self.size else 0
+        if not self.window:
+            return
+        self.served.append(position)
+        self.recent |= 1 << position
+        if len(self.served) > self.window:
+            self.recent &= ~(1 << self.served.popleft())
+
+
+def _search(slots, bounds):
+    """Backtrack over candidate meals per slot; returns (picks, meets_targets)
+
+    When no combination meets the targets, the one with the smallest
+    relative overshoot is used instead.
+    """
+    low, high, limits = bounds
+    candidates = [slot.candidates(CANDIDATES_PER_SLOT) for slot in slots]
+    best = [None, [c[0] if c else None for c in candidates]]
+    picks = [None] * len(slots)
+
+    def excess(totals):
+        over = max(0.0, low - totals[0], totals[0] - high) / high
+        return over + sum(max(0.0, value - limit) / limit
+                          for value, limit in zip(totals[1:], limits) if limit and limit != float('inf'))
+
+    def visit(k, totals):
+        if k == len(slots):
+            score = excess(totals)
+            if best[0] is None or score < best[0]:
+                best[0], best[1] = score, list(picks)
+            return score == 0
+        if not candidates[k]:
+            picks[k] = None
+            return visit(k + 1, totals)
+        scaled = slots[k].scaled
+        for position in candidates[k]:
+            values = scaled[position].tolist()
+            new = [a + b for a, b in zip(totals, values)]
+            # Partial sums only grow, so an overshoot here cannot be undone later
+            if new[0] > high or any(v > limit for v, limit in zip(new[1:], limits)):
+                continue
+            picks[k] = position
+            if visit(k + 1, new):
+                return True
+        return False
+
+    if visit(0, [0.0] * len(_COLUMNS)):
+        return list(picks), True
+    return best[1], False
+
+
+def _rotation(bits, start):
+    """Set bit positions of `bits` from `start` upward, then wrapping around from zero"""
+    high = bits >> start
+    while high:
+        low = high & -high
+        yield start + low.bit_length() - 1
+        high ^= low
+    wrapped = bits & ((1 << start) - 1)
+    while wrapped:
+        low = wrapped & -wrapped
+        yield low.bit_length() - 1
+        wrapped ^= low
+
+
+def _bitset(mask):
+    """Python int with bit i set where boolean array `mask` is true"""
+    if not len(mask):
+        return 0
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
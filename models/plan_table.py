@@ -0,0 +1,228 @@
+"""
+Precomputed lookup table for the discrete part of plan generation.
+
+Apart from calories and weight, a plan depends only on which of the four
+conditions a user has, the vegetarian/vegan preferences and the allergies.
+The table stores, for each template ingredient slot, a bitmask of which
+combinations exclude it, plus the slot's allergen bits (see
+models/allergens.py), so filtering at request time is a few ORs and ANDs.
+
+A missing or stale table is rebuilt in memory when the planner starts;
+the saved copy is only written (e.g. after editing meal_rules.json) with:
+
+    python -m models.plan_table
+"""
+
+import copy
+import hashlib
+import json
+import os
+
+CONDITIONS = ['diabetes', 'heart_disease', 'hypertension', 'obesity']
+PREFERENCES = ['vegetarian', 'vegan']
+
+TABLE_VERSION = 2
+# Distinct allergen sets whose slot masks are kept per table
+MAX_ALLERGEN_MASKS = 4096
+
+
+class PlanTable:
+    """Bitmask lookup of filtered ingredients and health benefits per profile combination"""
+
+    def __init__(self, slots, exclusions, slot_allergens, benefits, fingerprint):
+        self.slots = slots                    # [(meal_type, category, item), ...]
+        self.exclusions = exclusions          # [condition_subset][preference_subset] -> mask
+        self.slot_allergens = slot_allergens  # [allergen bits of each slot]
+        self.benefits = benefits              # condition_subset -> [benefit, ...]
+        self.fingerprint = fingerprint
+        self._allergen_masks = {}             # allergen bits or substrings -> mask of slots containing any
+
+        # Slot indices grouped by meal type and category, in template order
+        self.layout = {}
+        for index, (meal_type, category, _) in enumerate(slots):
+            self.layout.setdefault(meal_type, {}).setdefault(category, []).append(index)
+
+    # -----------------------------
+    # BUILD AND PERSISTENCE
+    # -----------------------------
+    @classmethod
+    def build(cls, planner):
+        """Precompute every combination using the planner's own filter as the reference"""
+        templates = planner._get_meal_templates()
+        slots = [
+            (meal_type, category, item)
+            for meal_type, template in templates.items()
+            for category, items in template.items()
+            for item in items
+        ]
+
+        def excluded_mask(conditions, allergies, preferences):
+            return _excluded_mask(planner, templates, conditions, allergies, preferences)
+
+        exclusions = [
+            [
+                excluded_mask(_subset(CONDITIONS, c), [], _subset(PREFERENCES, p))
+                for p in range(1 << len(PREFERENCES))
+            ]
+            for c in range(1 << len(CONDITIONS))
+        ]
+        slot_allergens = [planner.allergens.mask(item) for _, _, item in slots]
+        benefits = [planner._get_health_benefits(_subset(CONDITIONS, c)) for c in range(1 << len(CONDITIONS))]
+        return cls(slots, exclusions, slot_allergens, benefits, source_fingerprint(planner))
+
+    def with_rules(self, planner, conditions):
+        """Copy for a planner whose avoid-lists differ for `conditions`; slots, allergens and benefits are shared"""
+        # The filter is a union of independent per-condition and per-preference
+        # predicates, so every combination is an OR of single-flag masks
+        condition_masks = [self.exclusions[1 << i][0] for i in range(len(CONDITIONS))]
+        preference_masks = [self.exclusions[0][1 << j] for j in range(len(PREFERENCES))]
+        templates = planner._get_meal_templates()
+        for i, condition in enumerate(CONDITIONS):
+            if condition in conditions:
+                condition_masks[i] = _excluded_mask(planner, templates, [condition], [], [])
+
+        table = copy.copy(self)
+        table.exclusions = [
+            [_union(condition_masks, c) | _union(preference_masks, p) for p in range(1 << len(PREFERENCES))]
+            for c in range(1 << len(CONDITIONS))
+        ]
+        table.fingerprint = source_fingerprint(planner)
+        return table
+
+    def to_dict(self):
+        return {
+            'version': TABLE_VERSION,
+            'fingerprint': self.fingerprint,
+            'slots': self.slots,
+            'exclusions': self.exclusions,
+            'slot_allergens': self.slot_allergens,
+            'benefits': self.benefits
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            [tuple(slot) for slot in data['slots']],
+            data['exclusions'],
+            data['slot_allergens'],
+            data['benefits'],
+            data['fingerprint']
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != TABLE_VERSION:
+            raise ValueError(f"unsupported plan table version {data.get('version')}")
+        return cls.from_dict(data)
+
+    # -----------------------------
+    # LOOKUP
+    # -----------------------------
+    def excluded(self, conditions, allergies, preferences, planner):
+        """Mask of excluded slots; allergy terms and allergen names are also matched as substrings"""
+        mask = self.exclusions[_index(CONDITIONS, conditions)][_index(PREFERENCES, preferences)]
+        allergen_set = planner.allergens.normalize(allergies)
+        if allergen_set.bits:
+            mask |= self._allergen_mask(allergen_set.bits)
+        if allergen_set.substrings:
+            mask |= self._substring_mask(allergen_set.substrings, planner)
+        return mask
+
+    def ingredients(self, meal_type, excluded):
+        return {
+            category: [self.slots[i][2] for i in indices if not excluded >> i & 1]
+            for category, indices in self.layout[meal_type].items()
+        }
+
+    def health_benefits(self, conditions):
+        return list(self.benefits[_index(CONDITIONS, conditions)])
+
+    def _allergen_mask(self, bits):
+        mask = self._allergen_masks.get(bits)
+        if mask is None:
+            mask = 0
+            for index, slot_bits in enumerate(self.slot_allergens):
+                if slot_bits & bits:
+                    mask |= 1 << index
+            if len(self._allergen_masks) >= MAX_ALLERGEN_MASKS:
+                self._allergen_masks.clear()
+            self._allergen_masks[bits] = mask
+        return mask
+
+    def _substring_mask(self, substrings, planner):
+        mask = self._allergen_masks.get(substrings)
+        if mask is None:
+            mask = 0
+            for index, (_, _, item) in enumerate(self.slots):
+                if planner.allergens.contains(item, substrings):
+                    mask |= 1 << index
+            if len(self._allergen_masks) >= MAX_ALLERGEN_MASKS:
+                self._allergen_masks.clear()
+            self._allergen_masks[substrings] = mask
+        return mask
+
+
+def _excluded_mask(planner, templates, conditions, allergies, preferences):
+    mask = 0
+    index = 0
+    for meal_type, template in templates.items():
+        kept = planner._filter_meal_options(template, conditions, allergies, preferences)
+        for category, items in template.items():
+            for item in items:
+                if item not in kept[category]:
+                    mask |= 1 << index
+                index += 1
+    return mask
+
+
+def _union(masks, bits):
+    mask = 0
+    for i, single in enumerate(masks):
+        if bits >> i & 1:
+            mask |= single
+    return mask
+
+
+def _subset(names, bits):
+    return [name for i, name in enumerate(names) if bits >> i & 1]
+
+
+def _index(names, values):
+    bits = 0
+    for i, name in enumerate(names):
+        if name in values:
+            bits |= 1 << i
+    return bits
+
+
+def source_fingerprint(planner):
+    """Hash of the inputs the table is derived from, to detect a stale table"""
+    source = {
+        'templates': planner._get_meal_templates(),
+        'rules': {c: planner.meal_rules.get(c, {}).get('avoid_foods', []) for c in CONDITIONS},
+        'benefits': {c: planner._get_health_benefits([c]) for c in CONDITIONS},
+        'allergens': planner.allergens.fingerprint
+    }
+    return hashlib.sha256(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def main():
+    from models.diet_model import DietPlanner
+
+    planner = DietPlanner()
+    table = PlanTable.build(planner)
+    table.save(planner.plan_table_path)
+    combinations = (1 << len(CONDITIONS)) * (1 << len(PREFERENCES))
+    print(f"Plan table with {len(table.slots)} slots and {combinations} combinations "
+          f"saved to {planner.plan_table_path}")
+
+
+if __name__ == '__main__':
+    main()
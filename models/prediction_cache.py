@@ -0,0 +1,101 @@
+"""
+Inference cache for the meal-preference classifier.
+
+Form inputs cluster heavily (integer ages, BP and blood sugar, a handful of
+condition flags), so the continuous features are snapped to buckets and
+the encoded vector itself is the cache key. Predictions for a bucket are
+made on the snapped vector, so a key always maps to the same answer no
+matter which profile filled it. Entries belong to one model version; a
+new version empties the cache.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from models.features import NUMERICAL_COLS
+from utils.metrics import registry
+
+# Bucket width per continuous feature, in the feature's own unit
+QUANTA = {
+    'age': 1,
+    'height': 1.0,
+    'weight': 0.5,
+    'bmi': 0.1,
+    'systolic_bp': 1,
+    'diastolic_bp': 1,
+    'blood_sugar': 1,
+    'daily_calories': 10
+}
+
+prediction_cache_lookups = registry.counter(
+    'bitebalance_prediction_cache_lookups_total', 'Prediction cache lookups by result', 'result')
+prediction_cache_hit_ratio = registry.gauge(
+    'bitebalance_prediction_cache_hit_ratio', 'Prediction cache hit ratio since the model version was loaded',
+    'model_version')
+
+
+class PredictionCache:
+    """Bounded LRU of predictions keyed on quantized feature rows"""
+
+    def __init__(self, max_entries=65536, quanta=QUANTA):
+        self.max_entries = max_entries
+        self.steps = np.array([quanta.get(col, 0) for col in NUMERICAL_COLS], dtype=np.float32)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def quantize(self, rows):
+        """Snap the continuous columns of encoded rows to their bucket centres (in place)"""
+        n = len(self.steps)
+        bucketed = self.steps > 0
+        rows[:, :n][:, bucketed] = np.round(rows[:, :n][:, bucketed] / self.steps[bucketed]) * self.steps[bucketed]
+        return rows
+
+    def get_or_predict(self, version, row, predict):
+        """Cached prediction for one encoded row; `predict` gets the quantized row on a miss"""
+        row = self.quantize(row)
+        key = row.tobytes()
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._record('hit')
+                return value
+
+        value = predict(row)
+        with self._lock:
+            if version == self.version:
+                self.misses += 1
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._record('miss')
+        return value
+
+    def invalidate(self, version=None):
+        """Drop every entry, e.g. when a retrained model is loaded"""
+        with self._lock:
+            self._reset(version)
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _reset(self, version):
+        self._entries.clear()
+        self.version = version
+        self.hits = self.misses = 0
+
+    def _record(self, result):
+        prediction_cache_lookups.inc(result)
+        prediction_cache_hit_ratio.set(self.version, round(self.hit_ratio(), 4))
@@ -0,0 +1,198 @@
+"""
+Resumable, parallel hyperparameter search for the diet model.
+
+Trials run in a process pool limited to a number of cores and stop being
+scheduled once the time budget is spent. Every finished trial is appended
+to trials.jsonl in the search directory, so rerunning the same search
+skips completed trials. The leaderboard ranks trials by accuracy and
+shows training time, single-row latency and model size next to it.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from models.features import FeaturePipeline
+
+MODEL_CLASSES = {
+    'random_forest': RandomForestClassifier,
+    'gradient_boosting': GradientBoostingClassifier,
+    'decision_tree': DecisionTreeClassifier
+}
+
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [25, 50, 100, 200, 300],
+        'max_depth': [6, 10, 16, None],
+        'min_samples_leaf': [1, 3, 5, 10],
+        'max_features': ['sqrt', 'log2', 0.5],
+        'class_weight': [None, 'balanced']
+    },
+    'gradient_boosting': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [2, 3, 4, 6],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'subsample': [0.7, 1.0]
+    },
+    'decision_tree': {
+        'max_depth': [4, 6, 8, 10, 14],
+        'min_samples_leaf': [1, 5, 10, 20],
+        'class_weight': [None, 'balanced']
+    }
+}
+
+DATA_FILES = ('X_train.npy', 'X_test.npy', 'y_train.npy', 'y_test.npy')
+
+
+def sample_trials(n_trials, seed=42):
+    """Deterministic list of trials, so a resumed search sees the same IDs"""
+    rng = random.Random(seed)
+    trials, seen = [], set()
+    attempts = 0
+    while len(trials) < n_trials and attempts < n_trials * 20:
+        attempts += 1
+        model = rng.choice(sorted(SEARCH_SPACE))
+        params = {name: rng.choice(values) for name, values in sorted(SEARCH_SPACE[model].items())}
+        trial_id = hashlib.sha1(json.dumps([model, params], sort_keys=True).encode('utf-8')).hexdigest()[:10]
+        if trial_id not in seen:
+            seen.add(trial_id)
+            trials.append({'trial_id': trial_id, 'model': model, 'params': params})
+    return trials
+
+
+def prepare_search_data(search_dir, data_path):
+    """Encode, split and scale the data once; workers memory-map the arrays"""
+    if all(os.path.exists(os.path.join(search_dir, name)) for name in DATA_FILES):
+        return
+    X, y = FeaturePipeline().transform_csv(data_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    scaler = StandardScaler().fit(X_train)
+    arrays = (scaler.transform(X_train).astype(np.float32), scaler.transform(X_test).astype(np.float32),
+              y_train, y_test)
+    for name, array in zip(DATA_FILES, arrays):
+        np.save(os.path.join(search_dir, name), array)
+    with open(os.path.join(search_dir, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(scaler, f)
+
+
+def run_trial(trial, search_dir, latency_samples=100):
+    """Fit and evaluate one trial (runs in a worker process)"""
+    X_train, X_test, y_train, y_test = (
+        np.load(os.path.join(search_dir, name), mmap_mode='r') for name in DATA_FILES
+    )
+    params = dict(trial['params'])
+    if trial['model'] == 'random_forest':
+        params['n_jobs'] = 1  # parallelism comes from the pool
+    model = MODEL_CLASSES[trial['model']](random_state=42, **params)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start
+
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    latencies = []
+    for i in range(min(latency_samples, len(X_test))):
+        row = np.asarray(X_test[i:i + 1])
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        **trial,
+        'accuracy': round(float(accuracy), 4),
+        'train_seconds': round(train_seconds, 3),
+        'predict_p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 4),
+        'predict_p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4),
+        'size_bytes': len(pickle.dumps(model)),
+        'finished_at': time.time()
+    }
+
+
+def load_checkpoints(search_dir):
+    results = {}
+    path = os.path.join(search_dir, 'trials.jsonl')
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue  # a torn write from an interrupted run
+                results[result['trial_id']] = result
+    return results
+
+
+def checkpoint(search_dir, result):
+    with open(os.path.join(search_dir, 'trials.jsonl'), 'a') as f:
+        f.write(json.dumps(result) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run_search(search_dir, data_path, n_trials=40, cores=None, time_budget=600, seed=42):
+    """Run (or resume) a search and return the leaderboard"""
+    os.makedirs(search_dir, exist_ok=True)
+    prepare_search_data(search_dir, data_path)
+
+    results = load_checkpoints(search_dir)
+    pending = [t for t in sample_trials(n_trials, seed) if t['trial_id'] not in results]
+    print(f"{len(results)} trials already done, {len(pending)} to run")
+
+    cores = cores or os.cpu_count() or 1
+    deadline = time.monotonic() + time_budget
+    with ProcessPoolExecutor(max_workers=cores) as executor:
+        running = {}
+        while pending or running:
+            while pending and len(running) < cores and time.monotonic() < deadline:
+                trial = pending.pop(0)
+                running[executor.submit(run_trial, trial, search_dir)] = trial
+            if not running:
+                break
+
+            done, _ = wait(running, timeout=max(0.0, deadline - time.monotonic()) or None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                trial = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Trial {trial['trial_id']} failed: {e}")
+                    continue
+                results[result['trial_id']] = result
+                checkpoint(search_dir, result)
+                print(f"Trial {result['trial_id']} {result['model']}: accuracy {result['accuracy']:.3f}, "
+                      f"train {result['train_seconds']:.2f}s, p50 {result['predict_p50_ms']:.3f}ms")
+
+        if pending:
+            print(f"Time budget spent; {len(pending)} trials left for the next run")
+
+    leaderboard = build_leaderboard(results.values())
+    with open(os.path.join(search_dir, 'leaderboard.json'), 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+    return leaderboard
+
+
+def build_leaderboard(results):
+    return sorted(results, key=lambda r: (-r['accuracy'], r['predict_p50_ms'], r['train_seconds']))
+
+
+def print_leaderboard(leaderboard, top=15):
+    print(f"\n{'trial':<12}{'model':<19}{'accuracy':>9}{'train s':>9}{'p50 ms':>9}{'p99 ms':>9}{'size KB':>10}")
+    for r in leaderboard[:top]:
+        print(f"{r['trial_id']:<12}{r['model']:<19}{r['accuracy']:>9.3f}{r['train_seconds']:>9.2f}"
+              f"{r['predict_p50_ms']:>9.3f}{r['predict_p99_ms']:>9.3f}{r['size_bytes'] / 1024:>10.1f}")
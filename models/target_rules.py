@@ -0,0 +1,180 @@
+"""
+Declarative nutrition target rules, compiled into a vectorized evaluator.
+
+Base targets follow from the daily calories; each condition in
+meal_rules.json then adjusts them through its "target_rules" list:
+
+    {"nutrient": "sodium", "max": "sodium_limit"}                at most the limit
+    {"nutrient": "fiber", "min": "fiber_min"}                     at least the minimum
+    {"nutrient": "calories", "subtract": "calorie_deficit"}       also "add"
+    {"nutrient": "protein", "min": "protein_min", "per_kg": true}  value x body weight, rounded
+    {"nutrient": "potassium", "set": "potassium_min"}             extra target for this condition
+
+A string value names another key of the same condition's rules, so every
+limit is written once. Rules apply in file order; a batch of users is
+evaluated at once as NumPy arrays.
+"""
+
+import numpy as np
+
+BASE_NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium', 'sugar']
+OPS = ('min', 'max', 'add', 'subtract', 'set')
+
+
+def base_targets(calories):
+    """Targets before any condition adjustment, as float64 arrays"""
+    calories = np.asarray(calories, dtype=np.float64)
+    constant = lambda value: np.full(calories.shape, value, dtype=np.float64)
+    return {
+        'calories': calories.copy(),
+        'protein': np.round(calories * 0.15 / 4),
+        'carbs': np.round(calories * 0.5 / 4),
+        'fat': np.round(calories * 0.35 / 9),
+        'fiber': constant(25),
+        'sodium': constant(2300),
+        'sugar': constant(50)
+    }
+
+
+class TargetRules:
+    """Compiled condition rules; evaluate() works on whole batches of users"""
+
+    def __init__(self, meal_rules):
+        # Compiled entries per condition; overlays replace whole conditions and share the rest
+        self.compiled = {condition: self._compile_condition(condition, rules)
+                         for condition, rules in meal_rules.items()
+                         if isinstance(rules, dict) and rules.get('target_rules')}
+        self._flatten()
+
+    def with_overlay(self, changed_rules):
+        """Copy with the conditions in `changed_rules` recompiled; every other condition is shared"""
+        overlaid = TargetRules.__new__(TargetRules)
+        overlaid.compiled = dict(self.compiled)
+        for condition, rules in changed_rules.items():
+            if isinstance(rules, dict) and rules.get('target_rules'):
+                overlaid.compiled[condition] = self._compile_condition(condition, rules)
+            else:
+                overlaid.compiled.pop(condition, None)
+        overlaid._flatten()
+        return overlaid
+
+    def _flatten(self):
+        self.conditions = list(self.compiled)
+        self.index = {condition: i for i, condition in enumerate(self.conditions)}
+        self.rules = [(i,) + entry for i, condition in enumerate(self.conditions)
+                      for entry in self.compiled[condition]]
+        self.extra_nutrients = []
+        # Extra targets each condition introduces, for ordering single-user results
+        self.sets = {condition: [] for condition in self.conditions}
+        for condition in self.conditions:
+            for nutrient, op, _, _ in self.compiled[condition]:
+                if nutrient not in BASE_NUTRIENTS:
+                    if nutrient not in self.extra_nutrients:
+                        self.extra_nutrients.append(nutrient)
+                    if op == 'set':
+                        self.sets[condition].append(nutrient)
+
+    @staticmethod
+    def _compile_condition(condition, rules):
+        return tuple(TargetRules._compile(condition, rules, rule) for rule in rules['target_rules'])
+
+    @staticmethod
+    def _compile(condition, rules, rule):
+        ops = [op for op in OPS if op in rule]
+        if len(ops) != 1 or 'nutrient' not in rule:
+            raise ValueError(f"Target rule for {condition} needs a nutrient and one of {OPS}: {rule}")
+        op, nutrient = ops[0], rule['nutrient']
+        value = rule[op]
+        if isinstance(value, str):
+            if value not in rules:
+                raise ValueError(f"Target rule for {condition} refers to missing key {value!r}")
+            value = rules[value]
+        return nutrient, op, value, bool(rule.get('per_kg'))
+
+    def condition_counts(self, condition_lists):
+        """(users x conditions) matrix of how often each user lists each condition"""
+        counts = np.zeros((len(condition_lists), len(self.conditions)), dtype=np.float64)
+        for row, conditions in enumerate(condition_lists):
+            for condition in conditions:
+                j = self.index.get(condition)
+                if j is not None:
+                    counts[row, j] += 1
+        return counts
+
+    def evaluate(self, calories, weight, counts):
+        """Targets per nutrient as float64 arrays; NaN where an extra target does not apply"""
+        targets = base_targets(calories)
+        weight = np.asarray(weight, dtype=np.float64)
+        for nutrient in self.extra_nutrients:
+            targets[nutrient] = np.full(len(counts), np.nan)
+
+        for j, nutrient, op, value, per_kg in self.rules:
+            amount = np.round(weight * value) if per_kg else value
+            current = targets[nutrient]
+            if op in ('add', 'subtract'):
+                # Offsets stack when a condition is listed more than once
+                sign = 1 if op == 'add' else -1
+                targets[nutrient] = current + sign * counts[:, j] * amount
+                continue
+            if op == 'min':
+                updated = np.fmax(current, amount)
+            elif op == 'max':
+                updated = np.fmin(current, amount)
+            else:
+                updated = np.broadcast_to(amount, current.shape)
+            targets[nutrient] = np.where(counts[:, j] > 0, updated, current)
+        return targets
+
+    def evaluate_users(self, users):
+        """Batch targets for a list of user_data dicts"""
+        return self.evaluate(
+            [user.get('daily_calories', 2000) for user in users],
+            [user.get('weight', 70) for user in users],
+            self.condition_counts([user.get('conditions', []) for user in users]))
+
+    def targets_for(self, user_data):
+        """Targets for one user as a plain dict; walks the same compiled rules without NumPy"""
+        base_cal = user_data.get('daily_calories', 2000)
+        weight = user_data.get('weight', 70)
+        conditions = user_data.get('conditions', [])
+        targets = {
+            'calories': base_cal,
+            'protein': round(base_cal * 0.15 / 4),
+            'carbs': round(base_cal * 0.5 / 4),
+            'fat': round(base_cal * 0.35 / 9),
+            'fiber': 25,
+            'sodium': 2300,
+            'sugar': 50
+        }
+        counts = [0] * len(self.conditions)
+        for condition in conditions:
+            j = self.index.get(condition)
+            if j is not None:
+                counts[j] += 1
+
+        extras = {}
+        for j, nutrient, op, value, per_kg in self.rules:
+            if not counts[j]:
+                continue
+            amount = round(weight * value) if per_kg else value
+            current = targets.get(nutrient, extras.get(nutrient))
+            if op in ('add', 'subtract'):
+                updated = (current or 0) + (1 if op == 'add' else -1) * counts[j] * amount
+            elif op == 'min':
+                updated = amount if current is None else max(current, amount)
+            elif op == 'max':
+                updated = amount if current is None else min(current, amount)
+            else:
+                updated = amount
+            if nutrient in targets:
+                targets[nutrient] = updated
+            else:
+                extras[nutrient] = updated
+
+        # Extra targets appear in the order the user's conditions introduce them
+        for condition in conditions:
+            for nutrient in self.sets.get(condition, []):
+                targets.setdefault(nutrient, extras[nutrient])
+        for nutrient, value in extras.items():
+            targets.setdefault(nutrient, value)
+        return targets
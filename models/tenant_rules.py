@@ -0,0 +1,57 @@
+"""
+Per-clinic overlays on meal_rules.json.
+
+data/tenant_rules.json stores only what each clinic changes, per condition:
+
+    {
+      "clinic-north": {"hypertension": {"sodium_limit": 1200}},
+      "clinic-south": {"diabetes": {"sugar_limit": 20, "daily_carb_limit": 120,
+                                    "avoid_foods": ["white rice", "sugary drinks"]}}
+    }
+
+Each clinic gets a DietPlanner view built on first use. Views share the
+model, prediction cache, templates and every compiled rule the overlay
+does not touch, so a clinic costs the size of its delta, not of a planner.
+"""
+
+import json
+import os
+import threading
+
+
+class TenantPlanners:
+    """Clinic ID -> DietPlanner view over one shared base planner"""
+
+    def __init__(self, planner, path='data/tenant_rules.json'):
+        self.base = planner
+        self.path = path
+        self.overlays = {}
+        self._views = {}
+        self._lock = threading.Lock()
+        self._load_overlays()
+
+    def _load_overlays(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.overlays = json.load(f)
+        except Exception as e:
+            print(f"Tenant rule loading failed: {e}")
+            self.overlays = {}
+
+    def get(self, tenant=None):
+        """Planner for a clinic; no clinic means the base rules"""
+        if not tenant:
+            return self.base
+        view = self._views.get(tenant)
+        if view is None:
+            if tenant not in self.overlays:
+                raise ValueError(f"Unknown clinic {tenant!r}")
+            with self._lock:
+                view = self._views.get(tenant)
+                if view is None:
+                    view = self._views[tenant] = self.base.with_rule_overlay(self.overlays[tenant])
+        return view
+
+    def tenants(self):
+        return sorted(self.overlays)
@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals (
+    id TEXT PRIMARY KEY,
+    meal_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    norm_name TEXT NOT NULL UNIQUE,
+    ingredients TEXT NOT NULL,
+    nutrition TEXT NOT NULL,
+    health_conditions TEXT NOT NULL,
+    prep_time INTEGER,
+    difficulty TEXT,
+    instructions TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meals_by_type ON meals (meal_type);
+CREATE TABLE IF NOT EXISTS meal_ingredients (
+    ingredient TEXT NOT NULL,
+    meal_id TEXT NOT NULL,
+    PRIMARY KEY (ingredient, meal_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meal_conditions (
+    condition TEXT NOT NULL,
+    meal_id TEXT NOT NULL,
+    PRIMARY KEY (condition, meal_id)
+) WITHOUT ROWID;
+"""
+
+MEAL_COLUMNS = ['id', 'meal_type', 'name', 'ingredients', 'nutrition', 'health_conditions',
+                'prep_time', 'difficulty', 'instructions']
+
+# SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 999
+
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, separators=(',', ':'))
+
+
+class CatalogStore:
+    """SQLite-backed meal catalog with ingredient and condition indexes"""
+
+    def __init__(self, path='data/food_catalog.db'):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def insert_meals(self, meals):
+        """Insert (norm_name, meal) pairs in one transaction, skipping known names.
+
+        Meal IDs are derived from the normalized name, so already stored names
+        are found with one indexed lookup per batch. Returns the number of
+        meals actually inserted.
+        """
+        meals = list(meals)
+        known = self.existing_ids([meal['id'] for _, meal in meals])
+        new = [(norm_name, meal) for norm_name, meal in meals if meal['id'] not in known]
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO meals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(meal['id'], meal['meal_type'], meal['name'], norm_name,
+                  _dumps(meal['ingredients']), _dumps(meal['nutrition']),
+                  _dumps(meal['health_conditions']), meal.get('prep_time'),
+                  meal.get('difficulty'), _dumps(meal.get('instructions', [])))
+                 for norm_name, meal in new])
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO meal_ingredients VALUES (?, ?)',
+                [(ingredient.lower(), meal['id']) for _, meal in new for ingredient in meal['ingredients']])
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO meal_conditions VALUES (?, ?)',
+                [(condition, meal['id']) for _, meal in new for condition in meal['health_conditions']])
+        return len(new)
+
+    def delete_meals(self, meal_ids):
+        """Delete meals and their index rows in one transaction; returns the number of meals deleted"""
+        meal_ids = list(meal_ids)
+        deleted = 0
+        with self.conn:
+            for i in range(0, len(meal_ids), _MAX_PARAMS):
+                batch = meal_ids[i:i + _MAX_PARAMS]
+                marks = ', '.join('?' * len(batch))
+                deleted += self.conn.execute(f"DELETE FROM meals WHERE id IN ({marks})", batch).rowcount
+                self.conn.execute(f"DELETE FROM meal_ingredients WHERE meal_id IN ({marks})", batch)
+                self.conn.execute(f"DELETE FROM meal_conditions WHERE meal_id IN ({marks})", batch)
+        return deleted
+
+    def existing_ids(self, meal_ids):
+        known = set()
+        for i in range(0, len(meal_ids), _MAX_PARAMS):
+            batch = meal_ids[i:i + _MAX_PARAMS]
+            rows = self.conn.execute(
+                f"SELECT id FROM meals WHERE id IN ({', '.join('?' * len(batch))})", batch)
+            known.update(row[0] for row in rows)
+        return known
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM meals').fetchone()[0]
+
+    def iter_meals(self, meal_type=None, batch_size=5000):
+        """Stream meals as dicts in the meals_database.json schema"""
+        query = f"SELECT {', '.join(MEAL_COLUMNS)} FROM meals"
+        params = ()
+        if meal_type:
+            query += ' WHERE meal_type = ?'
+            params = (meal_type,)
+        cursor = self.conn.execute(query + ' ORDER BY rowid', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield self._to_meal(row)
+
+    def meal_ids_with_ingredient(self, ingredient):
+        rows = self.conn.execute('SELECT meal_id FROM meal_ingredients WHERE ingredient = ?',
+                                 (ingredient.lower(),))
+        return [row[0] for row in rows]
+
+    def meal_ids_for_condition(self, condition):
+        rows = self.conn.execute('SELECT meal_id FROM meal_conditions WHERE condition = ?', (condition,))
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _to_meal(row):
+        meal = dict(zip(MEAL_COLUMNS, row))
+        for key in ('ingredients', 'nutrition', 'health_conditions', 'instructions'):
+            meal[key] = orjson.loads(meal[key]) if orjson is not None else json.loads(meal[key])
+        return meal
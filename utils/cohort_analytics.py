@@ -0,0 +1,85 @@
+"""
+Cohort health analytics: distribution of BMI, blood pressure, blood sugar
+categories and overall score across many patients in one vectorized pass.
+
+    python -m utils.cohort_analytics patients.parquet --by gender
+"""
+
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from utils.health_calculator import HealthCalculator
+
+DIMENSIONS = ['bmi_category', 'bp_category', 'blood_sugar_category', 'overall_score']
+VITALS = ['bmi', 'systolic_bp', 'diastolic_bp', 'blood_sugar']
+
+
+def load_cohort(path):
+    """Read a CSV or Parquet cohort file (Parquet needs pyarrow or fastparquet)"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    if ext in ('.jsonl', '.ndjson'):
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
+
+
+def cohort_report(df, by=None, health_calc=None):
+    """Grouped counts, shares and mean vitals per category dimension"""
+    health_calc = health_calc or HealthCalculator()
+    status = health_calc.get_health_status_frame(df)
+    frame = pd.concat([df[[c for c in VITALS if c in df and c != 'bmi']], status], axis=1)
+    group_cols = [by] if isinstance(by, str) else list(by or [])
+    for col in group_cols:
+        frame[col] = df[col]
+
+    report = {'patients': len(frame), 'breakdown': {}}
+    for dimension in DIMENSIONS:
+        keys = group_cols + [dimension]
+        grouped = frame.groupby(keys, observed=False)
+        summary = grouped[VITALS].mean().round(1)
+        summary.insert(0, 'count', grouped.size())
+        summary.insert(1, 'share', (summary['count'] / max(len(frame), 1)).round(4))
+        report['breakdown'][dimension] = _nest(summary, len(keys))
+    return report
+
+
+def _nest(summary, depth):
+    """Turn a (multi-)indexed summary into nested dicts keyed by category"""
+    nested = {}
+    for key, row in summary.iterrows():
+        key = key if isinstance(key, tuple) else (key,)
+        node = nested
+        for part in key[:-1]:
+            node = node.setdefault(str(part), {})
+        values = row.to_dict()
+        values['count'] = int(values['count'])
+        node[str(key[-1])] = {k: (None if pd.isna(v) else v) for k, v in values.items()}
+    return nested
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cohort health analytics report')
+    parser.add_argument('path', help='CSV, JSON-lines or Parquet file of patients')
+    parser.add_argument('--by', action='append', help='extra column to group by (repeatable)')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    args = parser.parse_args()
+
+    df = load_cohort(args.path)
+    start = time.perf_counter()
+    report = cohort_report(df, by=args.by)
+    report['seconds'] = round(time.perf_counter() - start, 3)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Response compression for rendered pages and API payloads.
+
+Bodies of compressible types above a size threshold are compressed with
+brotli (when installed) or gzip, whichever the client prefers. Responses
+with an ETag, such as the render-cached plan page, are compressed once per
+(ETag, encoding) and then served from memory; their ETag becomes weak,
+since the bytes now depend on the negotiated encoding.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from utils.metrics import registry
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml'
+}
+# Below this a compressed body saves too little to pay for the CPU and headers
+MIN_SIZE = 1024
+
+response_bytes = registry.counter(
+    'bitebalance_response_bytes_total', 'Compressible response bytes sent, by content encoding', 'encoding')
+
+
+def available_encodings():
+    """Encodings this process can produce, most effective first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data, encoding, level=None):
+    """`data` compressed as `encoding`; `level` defaults to a fast setting for dynamic responses"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=4 if level is None else level)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output reproducible for identical input
+        return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+class ResponseCompressor:
+    """Compresses eligible responses in place; bodies with an ETag are compressed once"""
+
+    def __init__(self, min_size=MIN_SIZE, max_entries=256):
+        self.min_size = min_size
+        self.max_entries = max_entries
+        self.encodings = available_encodings()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, response, accept_encodings):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        data = response.get_data()
+        encoding = accept_encodings.best_match(self.encodings)
+        if len(data) < self.min_size or encoding is None:
+            response_bytes.inc('identity', len(data))
+            return response
+
+        etag, _ = response.get_etag()
+        compressed = self._compressed(etag, encoding, data) if etag else compress(data, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        response_bytes.inc(encoding, len(compressed))
+        return response
+
+    def _compressed(self, etag, encoding, data):
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed
+
+        compressed = compress(data, encoding)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
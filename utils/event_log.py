@@ -0,0 +1,150 @@
+"""
+Append-only log of plan feedback and usage events.
+
+Requests only put events on an in-memory queue; a background writer drains
+it and appends whole batches to SQLite in one transaction (group commit),
+so logging never waits on disk. If the writer falls behind and the queue
+fills up, new events are dropped and counted rather than blocking. Readers
+such as the incremental trainer page through events by ID.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.metrics import registry
+
+# Explicit feedback on a plan; only a stated preference is used as a training label
+FEEDBACK_ACTIONS = ('accept', 'reject')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    plan_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_kind ON events (kind, id);
+"""
+
+events_logged = registry.counter(
+    'bitebalance_events_total', 'Feedback and usage events by outcome: written or dropped', 'result')
+event_batch_size = registry.histogram(
+    'bitebalance_event_batch_size', 'Events per group commit', 'log',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+
+class EventLog:
+    """Batched, off-request-path writer for the events table"""
+
+    def __init__(self, path='data/events.db', batch_size=500, flush_interval=0.25, max_pending=100_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def log(self, kind, plan_id=None, **data):
+        """Queue one event; never blocks the caller"""
+        if self._writer is None or self._pid != os.getpid():
+            self._start()
+        try:
+            # Serialized by the writer, not here: callers must not mutate `data` afterwards
+            self._queue.put_nowait((time.time(), kind, plan_id, data))
+        except queue.Full:
+            events_logged.inc('dropped')
+
+    def flush(self, timeout=5):
+        """Wait until every event queued so far is on disk"""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _start(self):
+        with self._lock:
+            # A forked child needs its own writer thread
+            if self._writer is None or self._pid != os.getpid():
+                if self._writer is None:
+                    atexit.register(self.flush)
+                self._pid = os.getpid()
+                self._writer = threading.Thread(target=self._run, name='event-log', daemon=True)
+                self._writer.start()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: commits are durable across app crashes, fsync only at checkpoints
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or waiters:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(conn, batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, conn, batch):
+        rows = [(ts, kind, plan_id, json.dumps(data, default=str)) for ts, kind, plan_id, data in batch]
+        try:
+            with conn:
+                conn.executemany('INSERT INTO events (ts, kind, plan_id, data) VALUES (?, ?, ?, ?)', rows)
+        except sqlite3.Error as e:
+            print(f"Event log write failed: {e}")
+            events_logged.inc('dropped', len(rows))
+            return
+        events_logged.inc('written', len(rows))
+        event_batch_size.observe('events', len(rows))
+
+
+def read_events(path, after_id=0, kinds=None, batch_size=5000):
+    """Yield (id, ts, kind, plan_id, data) for events after `after_id`, oldest first"""
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        query = 'SELECT id, ts, kind, plan_id, data FROM events WHERE id > ?'
+        params = [after_id]
+        if kinds:
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        cursor = conn.execute(query + ' ORDER BY id', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for event_id, ts, kind, plan_id, data in rows:
+                yield event_id, ts, kind, plan_id, json.loads(data)
+    finally:
+        conn.close()
@@ -0,0 +1,222 @@
+"""
+Streaming import of external food-composition tables into the meal catalog.
+
+Reads a CSV or JSON-lines nutrient file in chunks, maps each row to the
+meal/nutrition schema of meals_database.json, deduplicates by normalized
+name and writes into the SQLite catalog store chunk by chunk, so the
+source is never held in memory.
+
+    python -m utils.food_import foods.csv --meal-type snacks
+    python -m utils.food_import foods.jsonl --map name=Description --map calories=Energy
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+import pandas as pd
+
+from utils.catalog_store import CatalogStore
+from utils.metrics import peak_resident_memory_bytes, resident_memory_bytes
+
+# Accepted source column names for each catalog field, compared case-insensitively
+FIELD_ALIASES = {
+    'name': ['name', 'description', 'food_name', 'product_name', 'food', 'title'],
+    'meal_type': ['meal_type', 'meal'],
+    'ingredients': ['ingredients', 'ingredient_list', 'components'],
+    'calories': ['calories', 'energy_kcal', 'energy (kcal)', 'kcal', 'energy'],
+    'protein': ['protein', 'protein_g', 'protein (g)', 'proteins_100g'],
+    'carbs': ['carbs', 'carbohydrate', 'carbohydrates', 'carbohydrate_g', 'carbohydrates_100g'],
+    'fat': ['fat', 'total_fat', 'fat_g', 'fat_100g', 'total lipid (fat)'],
+    'fiber': ['fiber', 'fibre', 'fiber_g', 'fiber_100g', 'dietary_fiber'],
+    'sodium': ['sodium', 'sodium_mg', 'sodium (mg)'],
+    'sugar': ['sugar', 'sugars', 'sugars_g', 'sugars_100g', 'total_sugars'],
+    'prep_time': ['prep_time', 'prep_minutes'],
+    'difficulty': ['difficulty']
+}
+NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium', 'sugar']
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks']
+
+# Conditions a food suits, by nutrient thresholds per serving; each rule works on
+# scalars and on NumPy columns alike. Unknown nutrients are NaN, which fails every
+# comparison, so a rule only tags a food whose nutrients it checks are all known
+CONDITION_RULES = {
+    'diabetes': lambda n: (n['sugar'] <= 10) & (n['fiber'] >= 3),
+    'heart_disease': lambda n: (n['sodium'] <= 480) & (n['fat'] <= 20),
+    'hypertension': lambda n: n['sodium'] <= 140,
+    'obesity': lambda n: (n['calories'] <= 400) & (n['protein'] >= 10)
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_INGREDIENT_SPLIT = re.compile(r'[;,|]')
+
+
+def normalize_name(name):
+    """Case-, accent- and punctuation-insensitive key used for deduplication"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def derive_conditions(nutrition):
+    """Tag a food with the conditions its nutrient profile suits"""
+    return [condition for condition, rule in CONDITION_RULES.items() if rule(nutrition)]
+
+
+def derive_condition_columns(nutrients):
+    """Vectorized derive_conditions over whole nutrient columns"""
+    masks = [(condition, rule(nutrients)) for condition, rule in CONDITION_RULES.items()]
+    return [[condition for condition, mask in masks if mask[i]] for i in range(len(nutrients['calories']))]
+
+
+def resolve_columns(columns, overrides=None):
+    """Map catalog fields to source columns using explicit overrides, then aliases"""
+    lookup = {c.strip().lower(): c for c in columns}
+    mapping = {}
+    for field, aliases in FIELD_ALIASES.items():
+        if overrides and field in overrides:
+            mapping[field] = overrides[field]
+            continue
+        for alias in aliases:
+            if alias in lookup:
+                mapping[field] = lookup[alias]
+                break
+    if 'name' not in mapping:
+        raise ValueError(f"No name column found among {list(columns)}")
+    return mapping
+
+
+def map_chunk(chunk, mapping, default_meal_type):
+    """Map one source chunk to (norm_name, meal) pairs and a count of rows without a name"""
+    names = chunk[mapping['name']].fillna('').astype(str).str.strip()
+    norm = names.map(normalize_name)
+    named = norm.str.len() > 0
+    # In-chunk duplicates are dropped here; the store ignores ones seen in earlier chunks
+    keep = (named & ~norm.duplicated()).to_numpy()
+
+    arrays = {}
+    for nutrient in NUTRIENTS:
+        column = mapping.get(nutrient)
+        if column:
+            values = pd.to_numeric(chunk[column], errors='coerce')
+        else:
+            values = pd.Series(float('nan'), index=chunk.index)
+        arrays[nutrient] = values.round(1).to_numpy(dtype=float)[keep]
+    conditions = derive_condition_columns(arrays)
+    columns = {nutrient: values.tolist() for nutrient, values in arrays.items()}
+
+    if 'meal_type' in mapping:
+        meal_types = chunk[mapping['meal_type']].astype(str).str.strip().str.lower()
+        meal_types = meal_types.where(meal_types.isin(MEAL_TYPES), default_meal_type)[keep].tolist()
+    else:
+        meal_types = [default_meal_type] * int(keep.sum())
+
+    names, norm = names[keep].tolist(), norm[keep].tolist()
+    ingredients = _optional(chunk, mapping, 'ingredients', keep)
+    prep_times = _optional(chunk, mapping, 'prep_time', keep)
+    difficulties = _optional(chunk, mapping, 'difficulty', keep)
+
+    parsed = {}
+    pairs = []
+    for i, (name, key) in enumerate(zip(names, norm)):
+        nutrition = {n: _number(columns[n][i]) for n in NUTRIENTS}
+        items = ingredients and ingredients[i]
+        if isinstance(items, str) and items.strip():
+            # Ingredient lists repeat a lot across a table; parse each distinct one once
+            if items not in parsed:
+                parsed[items] = [part.strip().lower() for part in _INGREDIENT_SPLIT.split(items) if part.strip()]
+            items = list(parsed[items])
+        else:
+            items = [name.lower()]
+        prep_time = prep_times and pd.to_numeric(prep_times[i], errors='coerce')
+        difficulty = difficulties and difficulties[i]
+        pairs.append((key, {
+            'id': 'x' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:11],
+            'meal_type': meal_types[i],
+            'name': name,
+            'ingredients': items,
+            'nutrition': nutrition,
+            'health_conditions': conditions[i],
+            'prep_time': int(prep_time) if prep_time is not None and pd.notna(prep_time) else None,
+            'difficulty': str(difficulty) if isinstance(difficulty, str) and difficulty else 'easy',
+            'instructions': []
+        }))
+    return pairs, int((~named).sum())
+
+
+def _optional(chunk, mapping, field, keep):
+    return chunk[mapping[field]][keep].tolist() if field in mapping else None
+
+
+def _number(value):
+    """JSON value of a nutrient: None when unknown, an int when whole"""
+    if value != value:
+        return None
+    return int(value) if value == int(value) else value
+
+
+def read_chunks(path, chunksize, fmt=None):
+    fmt = fmt or ('jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv')
+    if fmt == 'jsonl':
+        return pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    return pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False, na_values=[''])
+
+
+def import_foods(path, store_path='data/food_catalog.db', chunksize=10_000, fmt=None,
+                 default_meal_type='snacks', overrides=None, progress=True):
+    """Stream a food-composition file into the catalog store and return stats"""
+    stats = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    start = time.perf_counter()
+    start_rss = resident_memory_bytes()
+    mapping = None
+
+    with CatalogStore(store_path) as store:
+        for chunk in read_chunks(path, chunksize, fmt):
+            if mapping is None:
+                mapping = resolve_columns(chunk.columns, overrides)
+            pairs, invalid = map_chunk(chunk, mapping, default_meal_type)
+            inserted = store.insert_meals(pairs)
+
+            stats['rows'] += len(chunk)
+            stats['inserted'] += inserted
+            stats['invalid'] += invalid
+            stats['duplicates'] += len(chunk) - invalid - inserted
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"{stats['rows']:>10} rows  {stats['rows'] / elapsed:>10.0f} rows/s  "
+                      f"RSS {resident_memory_bytes() / 2**20:.0f}MB", file=sys.stderr)
+        stats['catalog_size'] = store.count()
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = round(elapsed, 2)
+    stats['rows_per_second'] = round(stats['rows'] / elapsed) if elapsed else 0
+    stats['start_rss_mb'] = round(start_rss / 2**20, 1)
+    peak_rss = peak_resident_memory_bytes()
+    stats['peak_rss_mb'] = round(peak_rss / 2**20, 1) if peak_rss is not None else None
+    stats['mapping'] = mapping
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a food-composition table into the meal catalog')
+    parser.add_argument('path', help='CSV or JSON-lines nutrient file')
+    parser.add_argument('--store', default='data/food_catalog.db')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    parser.add_argument('--chunksize', type=int, default=10_000)
+    parser.add_argument('--meal-type', default='snacks', choices=MEAL_TYPES,
+                        help='meal type for rows without a meal_type column')
+    parser.add_argument('--map', action='append', default=[], metavar='FIELD=COLUMN',
+                        help='explicit source column for a catalog field (repeatable)')
+    args = parser.parse_args()
+
+    overrides = dict(item.split('=', 1) for item in args.map)
+    stats = import_foods(args.path, args.store, args.chunksize, args.format, args.meal_type, overrides)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
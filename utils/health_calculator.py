@@ -1,4 +1,11 @@
 import math
+import numpy as np
+import pandas as pd
+
+BMI_CATEGORIES = ["Underweight", "Normal weight", "Overweight", "Obese"]
+BP_CATEGORIES = ["Normal", "Elevated", "Stage 1 Hypertension", "Stage 2 Hypertension", "Hypertensive Crisis"]
+BLOOD_SUGAR_CATEGORIES = ["Normal", "Prediabetes", "Diabetes"]
+OVERALL_SCORES = ["0/3", "1/3", "2/3", "3/3"]
 
 class HealthCalculator:
     """Calculate health metrics and BMI classifications"""
@@ -101,8 +108,11 @@ class HealthCalculator:
             'max': round(max_weight, 1)
         }
     
-    def get_health_status(self, user_data):
-        """Get comprehensive health status assessment"""
+    def get_health_status(self, user_data, trends=None):
+        """Get comprehensive health status assessment
+
+        `trends` (from VitalsStore.trends) attaches each metric's recent trend.
+        """
         try:
             bmi = user_data.get('bmi', 0)
             systolic = user_data.get('systolic_bp', 0)
@@ -137,6 +147,13 @@ class HealthCalculator:
                              if isinstance(metric, dict) and metric.get('status') == 'normal')
             status['overall_score'] = f"{normal_count}/3"
             
+            if trends:
+                status['bmi']['trend'] = trends.get('bmi')
+                status['blood_pressure']['trend'] = {'systolic': trends.get('systolic_bp'),
+                                                     'diastolic': trends.get('diastolic_bp')}
+                status['blood_sugar']['trend'] = trends.get('blood_sugar')
+                status['weight_trend'] = trends.get('weight')
+            
             return status
             
         except Exception as e:
@@ -151,10 +168,43 @@ class HealthCalculator:
             'overall_score': '0/3'
         }
     
-    def get_health_recommendations(self, user_data):
+    def get_health_status_frame(self, df):
+        """Column-wise get_health_status for a cohort DataFrame.
+
+        Needs systolic_bp, diastolic_bp, blood_sugar and either bmi or
+        height and weight. Returns one categorical column per category.
+        """
+        if 'bmi' in df:
+            bmi = df['bmi'].to_numpy(dtype=float)
+        else:
+            bmi = np.round(df['weight'].to_numpy(dtype=float) / (df['height'].to_numpy(dtype=float) / 100) ** 2, 1)
+        systolic = df['systolic_bp'].to_numpy(dtype=float)
+        diastolic = df['diastolic_bp'].to_numpy(dtype=float)
+        blood_sugar = df['blood_sugar'].to_numpy(dtype=float)
+
+        bmi_code = np.searchsorted([18.5, 25, 30], bmi, side='right')
+        bp_code = np.select(
+            [(systolic < 120) & (diastolic < 80),
+             (systolic < 130) & (diastolic < 80),
+             (systolic < 140) | (diastolic < 90),
+             (systolic < 180) | (diastolic < 120)],
+            [0, 1, 2, 3], default=4)
+        sugar_code = np.searchsorted([100, 126], blood_sugar, side='right')
+        score = (bmi_code == 1).astype(np.int8) + (bp_code == 0) + (sugar_code == 0)
+
+        return pd.DataFrame({
+            'bmi': bmi,
+            'bmi_category': pd.Categorical.from_codes(bmi_code, BMI_CATEGORIES),
+            'bp_category': pd.Categorical.from_codes(bp_code, BP_CATEGORIES),
+            'blood_sugar_category': pd.Categorical.from_codes(sugar_code, BLOOD_SUGAR_CATEGORIES),
+            'overall_score': pd.Categorical.from_codes(score, OVERALL_SCORES)
+        }, index=df.index)
+
+    def get_health_recommendations(self, user_data, health_status=None):
         """Get personalized health recommendations"""
         recommendations = []
-        health_status = self.get_health_status(user_data)
+        if health_status is None:
+            health_status = self.get_health_status(user_data)
         
         # BMI recommendations
         bmi_status = health_status['bmi']['status']
@@ -0,0 +1,274 @@
+"""
+Local background job queue for heavy plan generation.
+
+Jobs live in a SQLite table shared by the web process and a pool of
+worker processes, so nothing external is needed. Workers claim the oldest
+queued job of the most urgent lane first; part of the pool only serves the
+interactive lane, so a large bulk roster never delays a user waiting on
+their plan. Clients poll or long-poll a job until it is done or failed.
+
+Each worker writes a heartbeat while it runs. A running job goes back to
+the queue only once its worker is gone: replaced by the pool after dying,
+or silent for longer than the heartbeat timeout. How long the job itself
+has been running never matters, so a long roster job is not run twice.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Lower value = served first
+LANES = {'interactive': 0, 'bulk': 1}
+FINISHED = ('done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    lane INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_lane ON jobs (status, lane, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker INTEGER PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+_planners = None
+
+
+def run_meal_plan(payload):
+    """Worker-side handler: one weekly plan for one profile"""
+    global _planners
+    if _planners is None:
+        from models.diet_model import DietPlanner
+        from models.tenant_rules import TenantPlanners
+        _planners = TenantPlanners(DietPlanner(), os.environ.get('BITEBALANCE_TENANT_RULES', 'data/tenant_rules.json'))
+    user_data = payload['user_data']
+    return _planners.get(user_data.get('clinic')).generate_meal_plan(user_data)
+
+
+JOB_HANDLERS = {'meal_plan': run_meal_plan}
+
+
+class JobQueue:
+    """SQLite-backed job table; safe to share across threads and processes"""
+
+    def __init__(self, path='data/jobs.db'):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit: every statement below is its own atomic transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, lane='interactive'):
+        return self.enqueue_many(kind, [payload], lane)[0]
+
+    def enqueue_many(self, kind, payloads, lane='interactive'):
+        """Queue several jobs in one transaction and return their IDs"""
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane!r}, expected one of {sorted(LANES)}")
+        now = time.time()
+        rows = [(uuid.uuid4().hex, kind, LANES[lane], json.dumps(payload), now) for payload in payloads]
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                "INSERT INTO jobs (id, kind, lane, status, payload, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                rows)
+        return [row[0] for row in rows]
+
+    def claim(self, worker, max_lane=max(LANES.values())):
+        """Atomically mark the next queued job as running and return it, or None"""
+        row = self._conn().execute(
+            "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND lane <= ? "
+            "            ORDER BY lane, created_at LIMIT 1) "
+            "RETURNING id, kind, payload",
+            (worker, time.time(), max_lane)).fetchone()
+        if row is None:
+            return None
+        return {'id': row['id'], 'kind': row['kind'], 'payload': json.loads(row['payload'])}
+
+    def finish(self, job_id, result=None, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            ('failed' if error is not None else 'done',
+             None if error is not None else json.dumps(result), error, time.time(), job_id))
+
+    def get(self, job_id):
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['lane'] = next(name for name, value in LANES.items() if value == job['lane'])
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def wait(self, job_id, timeout, interval=0.05):
+        """Long-poll: the job once finished, or its current state after `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] in FINISHED or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+    def heartbeat(self, worker):
+        self._conn().execute('INSERT OR REPLACE INTO workers VALUES (?, ?)', (worker, time.time()))
+
+    def retire_worker(self, worker):
+        self._conn().execute('DELETE FROM workers WHERE worker = ?', (worker,))
+
+    def requeue_lost(self, heartbeat_timeout, max_attempts=3):
+        """Return jobs of workers silent for `heartbeat_timeout` seconds to the queue (or fail them after max_attempts)"""
+        return self._requeue('worker NOT IN (SELECT worker FROM workers WHERE heartbeat >= ?)',
+                             time.time() - heartbeat_timeout, max_attempts)
+
+    def requeue_worker(self, worker, max_attempts=3):
+        """Return the jobs a dead worker was running to the queue (or fail them after max_attempts)"""
+        self.retire_worker(worker)
+        return self._requeue('worker = ?', worker, max_attempts)
+
+    def _requeue(self, condition, value, max_attempts):
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'worker lost', finished_at = ? "
+            f"WHERE status = 'running' AND {condition} AND attempts >= ?",
+            (time.time(), value, max_attempts))
+        return conn.execute(
+            f"UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND {condition}",
+            (value,)).rowcount
+
+    def purge(self, older_than):
+        """Delete finished jobs older than `older_than` seconds"""
+        return self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - older_than,)).rowcount
+
+    def depth(self):
+        """Queued jobs per lane name"""
+        counts = dict(self._conn().execute(
+            "SELECT lane, COUNT(*) FROM jobs WHERE status = 'queued' GROUP BY lane").fetchall())
+        return {name: counts.get(value, 0) for name, value in LANES.items()}
+
+
+def worker_loop(path, max_lane, stop, handlers=None, retention=86400, poll_interval=0.1,
+                heartbeat_interval=5, heartbeat_timeout=30):
+    """Claim and run jobs until the shared `stop` flag is set (runs in a worker process)"""
+    handlers = handlers or JOB_HANDLERS
+    queue = JobQueue(path)
+    worker = os.getpid()
+    # A job still marked running under this PID belonged to a dead process that had it before
+    queue.requeue_worker(worker)
+    queue.heartbeat(worker)
+
+    def beat():
+        # Own thread, so a long job keeps its worker alive in the table
+        while not stop.value:
+            time.sleep(heartbeat_interval)
+            queue.heartbeat(worker)
+    threading.Thread(target=beat, daemon=True, name='heartbeat').start()
+
+    next_purge = 0
+    while not stop.value:
+        job = queue.claim(worker, max_lane)
+        if job is None:
+            # Idle: drop results nobody collected within the retention period, and
+            # requeue jobs of workers that stopped beating without the pool noticing
+            if time.monotonic() >= next_purge:
+                queue.purge(retention)
+                queue.requeue_lost(heartbeat_timeout)
+                next_purge = time.monotonic() + 60
+            time.sleep(poll_interval)
+            continue
+        try:
+            result = handlers[job['kind']](job['payload'])
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            queue.finish(job['id'], error=str(e))
+        else:
+            queue.finish(job['id'], result=result)
+    queue.retire_worker(worker)
+
+
+class WorkerPool:
+    """Worker processes for a JobQueue; the first `interactive_workers` only take interactive jobs"""
+
+    def __init__(self, path='data/jobs.db', processes=2, interactive_workers=1, heartbeat_timeout=30,
+                 retention=86400, handlers=None):
+        self.path = path
+        self.processes = processes
+        # At least one worker always serves every lane
+        self.interactive_workers = min(interactive_workers, processes - 1)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.retention = retention
+        self.handlers = handlers
+        self.workers = []
+        self._stop = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the pool on first use and replace any worker that has died"""
+        with self._lock:
+            if self._stop is None:
+                JobQueue(self.path).requeue_lost(self.heartbeat_timeout)
+                # spawn, not fork: the web process has threads and open SQLite handles
+                self._context = multiprocessing.get_context('spawn')
+                # A lock-free shared flag: an Event's lock and condition stay held if a worker dies in them
+                self._stop = self._context.RawValue('b', 0)
+                self.workers = [None] * self.processes
+            for i, process in enumerate(self.workers):
+                if process is None or not process.is_alive():
+                    if process is not None:
+                        # Its job would otherwise stay 'running' forever
+                        JobQueue(self.path).requeue_worker(process.pid)
+                    max_lane = LANES['interactive'] if i < self.interactive_workers else max(LANES.values())
+                    process = self._context.Process(target=worker_loop, daemon=True,
+                                                    args=(self.path, max_lane, self._stop, self.handlers, self.retention),
+                                                    kwargs={'heartbeat_timeout': self.heartbeat_timeout})
+                    process.start()
+                    self.workers[i] = process
+        return self
+
+    def stop(self, timeout=5):
+        with self._lock:
+            if self._stop is None:
+                return
+            self._stop.value = 1
+            deadline = time.monotonic() + timeout
+            queue = JobQueue(self.path)
+            for process in self.workers:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                # Jobs a dead or terminated worker left running go back to the queue
+                queue.requeue_worker(process.pid)
+            self.workers = []
+            self._stop = None
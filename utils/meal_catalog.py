@@ -0,0 +1,371 @@
+"""
+Compact, column-oriented meal catalog.
+
+Meals are stored as struct-of-arrays columns instead of nested dicts:
+nutrition in one float32 matrix, and ingredients, health conditions,
+difficulty and instructions as integer codes into a shared Vocabulary
+(ragged lists use offset/code arrays). Dicts in the meals_database.json
+schema are only built when a meal leaves the catalog, via `meal(row)`.
+
+Ingredient quantities per serving are optional, keyed by ingredient:
+
+    "quantities": {"steel cut oats": {"amount": 40, "unit": "g"}, ...}
+
+They are stored converted to a base unit (g, ml or piece) in two more
+ragged columns aligned with the ingredient codes, NaN where unknown.
+
+Catalogs are immutable snapshots: `with_changes` returns a new catalog
+with the next version number and leaves the old one intact for readers
+still holding it.
+"""
+
+import threading
+from array import array
+
+import numpy as np
+
+NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium', 'sugar']
+RAGGED_COLUMNS = ('ingredients', 'health_conditions', 'instructions')
+QUANTITY_COLUMNS = ('amounts', 'units')
+NO_PREP_TIME = -1
+
+BASE_UNITS = ['g', 'ml', 'piece']
+# Recipe units as (base unit, factor); other units leave the ingredient unquantified
+UNITS = {
+    'g': ('g', 1), 'kg': ('g', 1000), 'oz': ('g', 28.35), 'lb': ('g', 453.6),
+    'ml': ('ml', 1), 'l': ('ml', 1000), 'tsp': ('ml', 5), 'tbsp': ('ml', 15), 'cup': ('ml', 240),
+    'piece': ('piece', 1)
+}
+NO_UNIT = -1
+
+
+def base_quantity(quantity):
+    """(amount, BASE_UNITS index) of a {"amount", "unit"} dict, or (nan, NO_UNIT)"""
+    if not quantity or quantity.get('unit', 'g') not in UNITS:
+        return float('nan'), NO_UNIT
+    unit, factor = UNITS[quantity.get('unit', 'g')]
+    return float(quantity['amount']) * factor, BASE_UNITS.index(unit)
+
+
+class Vocabulary:
+    """Interned strings shared by all catalogs, addressed by integer code"""
+
+    __slots__ = ('terms', 'codes', '_lock', '_array')
+
+    def __init__(self):
+        self.terms = []
+        self.codes = {}
+        self._lock = threading.Lock()
+        self._array = np.empty(0, dtype=object)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def intern(self, term):
+        code = self.codes.get(term)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(term)
+                if code is None:
+                    code = len(self.terms)
+                    self.terms.append(term)
+                    self.codes[term] = code
+        return code
+
+    def lookup(self, codes):
+        """Terms for an array of codes"""
+        if len(self._array) < len(self.terms):
+            self._array = np.array(self.terms, dtype=object)
+        return self._array[codes].tolist()
+
+    def code(self, term):
+        """Code of a known term, or -1"""
+        return self.codes.get(term, -1)
+
+    def matching(self, predicate):
+        """Codes of every term satisfying `predicate`"""
+        return np.array([code for code, term in enumerate(self.terms) if predicate(term)], dtype=np.int32)
+
+
+VOCABULARY = Vocabulary()
+
+
+class Ragged:
+    """Variable-length lists of codes packed into offset and code arrays"""
+
+    __slots__ = ('offsets', 'codes', 'rows')
+
+    def __init__(self, offsets, codes):
+        self.offsets = offsets
+        self.codes = codes
+        # Owning row of every code, for vectorized per-row reductions
+        self.rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+    def __getitem__(self, row):
+        return self.codes[self.offsets[row]:self.offsets[row + 1]]
+
+    def gather(self, rows):
+        """Codes of each of `rows` as (flat codes, per-row lengths)"""
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        total = int(lengths.sum())
+        # Position of every wanted code: its row's start plus its rank within the row
+        ends = np.cumsum(lengths)
+        index = np.repeat(starts - (ends - lengths), lengths) + np.arange(total)
+        return self.codes[index], lengths
+
+    def take(self, rows):
+        codes, lengths = self.gather(rows)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=offsets[1:])
+        return Ragged(offsets, codes)
+
+    def concat(self, other):
+        offsets = np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]])
+        return Ragged(offsets, np.concatenate([self.codes, other.codes]))
+
+    def rows_containing(self, codes, n_rows):
+        """Boolean mask of rows holding any of `codes`"""
+        hit = np.isin(self.codes, codes)
+        return np.bincount(self.rows[hit], minlength=n_rows) > 0
+
+
+class MealCatalogBuilder:
+    """Accumulates meals into growable arrays, then freezes them into a MealCatalog"""
+
+    def __init__(self, vocabulary=VOCABULARY):
+        self.vocabulary = vocabulary
+        self.meal_types = []
+        self.ids = []
+        self.names = []
+        self.type_codes = array('b')
+        self.nutrition = array('f')
+        self.prep_time = array('h')
+        self.difficulty = array('i')
+        self.lists = {key: (array('i', [0]), array('i')) for key in RAGGED_COLUMNS}
+        # Aligned with the ingredient codes
+        self.amounts = array('f')
+        self.units = array('b')
+
+    def add(self, meal_type, meal):
+        if meal_type not in self.meal_types:
+            self.meal_types.append(meal_type)
+        intern = self.vocabulary.intern
+        self.type_codes.append(self.meal_types.index(meal_type))
+        self.ids.append(meal['id'])
+        self.names.append(meal['name'])
+        nutrition = meal.get('nutrition', {})
+        # None marks a nutrient an imported food does not report
+        self.nutrition.extend(float('nan') if nutrition.get(n, 0) is None else float(nutrition.get(n, 0))
+                              for n in NUTRIENTS)
+        prep_time = meal.get('prep_time')
+        self.prep_time.append(NO_PREP_TIME if prep_time is None else int(prep_time))
+        self.difficulty.append(intern(meal.get('difficulty') or ''))
+        for key, (offsets, codes) in self.lists.items():
+            codes.extend(intern(term) for term in meal.get(key, []))
+            offsets.append(len(codes))
+        quantities = meal.get('quantities') or {}
+        for ingredient in meal.get('ingredients', []):
+            amount, unit = base_quantity(quantities.get(ingredient))
+            self.amounts.append(amount)
+            self.units.append(unit)
+        return self
+
+    def add_meals_db(self, meals_db):
+        for meal_type, meals in meals_db.items():
+            if meal_type not in self.meal_types:
+                self.meal_types.append(meal_type)
+            for meal in meals:
+                self.add(meal_type, meal)
+        return self
+
+    def columns(self):
+        """The array columns accumulated so far, as NumPy arrays"""
+        columns = {
+            'type_codes': np.array(self.type_codes, dtype=np.int8),
+            'nutrition': np.array(self.nutrition, dtype=np.float32).reshape(len(self.ids), len(NUTRIENTS)),
+            'prep_time': np.array(self.prep_time, dtype=np.int16),
+            'difficulty': np.array(self.difficulty, dtype=np.int32)
+        }
+        for key, (offsets, codes) in self.lists.items():
+            columns[key] = Ragged(np.array(offsets, dtype=np.int32), np.array(codes, dtype=np.int32))
+        offsets = columns['ingredients'].offsets
+        columns['amounts'] = Ragged(offsets, np.array(self.amounts, dtype=np.float32))
+        columns['units'] = Ragged(offsets, np.array(self.units, dtype=np.int8))
+        return columns
+
+    def build(self, version=1):
+        """Freeze into a catalog; the builder stays usable for further adds"""
+        return MealCatalog(version=version, vocabulary=self.vocabulary, meal_types=list(self.meal_types),
+                           ids=list(self.ids), names=list(self.names), **self.columns())
+
+
+class MealCatalog:
+    """Immutable column store of meals; rows are positions in the columns"""
+
+    __slots__ = ('version', 'vocabulary', 'meal_types', 'ids', 'names', 'type_codes', 'nutrition',
+                 'prep_time', 'difficulty', 'ingredients', 'health_conditions', 'instructions',
+                 'amounts', 'units', 'id_index', 'type_rows', '_condition_masks')
+
+    def __init__(self, version, vocabulary, meal_types, ids, names, type_codes, nutrition, prep_time,
+                 difficulty, ingredients, health_conditions, instructions, amounts, units):
+        self.version = version
+        self.vocabulary = vocabulary
+        self.meal_types = meal_types
+        self.ids = ids
+        self.names = names
+        self.type_codes = type_codes
+        self.nutrition = nutrition
+        self.prep_time = prep_time
+        self.difficulty = difficulty
+        self.ingredients = ingredients
+        self.health_conditions = health_conditions
+        self.instructions = instructions
+        self.amounts = amounts
+        self.units = units
+        self.id_index = dict(zip(ids, range(len(ids))))
+        self.type_rows = {meal_type: np.flatnonzero(type_codes == code)
+                          for code, meal_type in enumerate(meal_types)}
+        # Safe to fill lazily: a snapshot never changes, so racing readers compute the same mask
+        self._condition_masks = {}
+
+    @classmethod
+    def from_meals_db(cls, meals_db, vocabulary=VOCABULARY):
+        return MealCatalogBuilder(vocabulary).add_meals_db(meals_db).build()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def with_changes(self, upserts=(), deletes=()):
+        """Next snapshot with (meal_type, meal) pairs added or replaced and meal ids removed"""
+        added = MealCatalogBuilder(self.vocabulary)
+        for meal_type, meal in upserts:
+            added.add(meal_type, meal)
+        removed = (set(deletes) | set(added.ids)) & self.id_index.keys()
+        if removed:
+            keep = np.flatnonzero(np.fromiter((meal_id not in removed for meal_id in self.ids),
+                                              dtype=bool, count=len(self.ids)))
+        else:
+            keep = np.arange(len(self.ids))
+
+        # Kept rows are gathered from this snapshot's arrays, new rows appended after them
+        meal_types = self.meal_types + [t for t in added.meal_types if t not in self.meal_types]
+        columns = added.columns()
+        type_map = np.array([meal_types.index(t) for t in added.meal_types], dtype=np.int8)
+        columns['type_codes'] = type_map[columns['type_codes']] if len(type_map) else columns['type_codes']
+        for key in ('type_codes', 'nutrition', 'prep_time', 'difficulty'):
+            columns[key] = np.concatenate([getattr(self, key)[keep], columns[key]])
+        for key in RAGGED_COLUMNS + QUANTITY_COLUMNS:
+            columns[key] = getattr(self, key).take(keep).concat(columns[key])
+
+        keep = keep.tolist()
+        return MealCatalog(
+            version=self.version + 1,
+            vocabulary=self.vocabulary,
+            meal_types=meal_types,
+            ids=[self.ids[row] for row in keep] + added.ids,
+            names=[self.names[row] for row in keep] + added.names,
+            **columns
+        )
+
+    def rows(self, meal_type=None):
+        if meal_type is None:
+            return np.arange(len(self.ids))
+        return self.type_rows.get(meal_type, np.empty(0, dtype=np.int64))
+
+    def row_of(self, meal_id):
+        return self.id_index.get(meal_id)
+
+    def meal_type(self, row):
+        return self.meal_types[self.type_codes[row]]
+
+    def rows_with_conditions(self, conditions, rows=None):
+        """Rows (optionally within `rows`) suitable for any of `conditions`"""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        for condition in conditions:
+            mask |= self._condition_mask(condition)
+        return np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+
+    def _condition_mask(self, condition):
+        mask = self._condition_masks.get(condition)
+        if mask is None:
+            mask = self.health_conditions.rows_containing([self.vocabulary.code(condition)], len(self.ids))
+            self._condition_masks[condition] = mask
+        return mask
+
+    def rows_with_ingredient_matching(self, predicate):
+        """Boolean mask of rows with an ingredient satisfying `predicate`"""
+        return self.ingredients.rows_containing(self.vocabulary.matching(predicate), len(self.ids))
+
+    def meal(self, row, with_type=False):
+        """The meal at `row` as a dict in the meals_database.json schema"""
+        return self.meals([row], with_type)[0]
+
+    def meals(self, rows, with_type=False):
+        """Dicts for many rows, decoding each column in one vectorized pass"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        nutrition = _numbers(self.nutrition[rows])
+        prep_times = self.prep_time[rows].tolist()
+        difficulties = self.vocabulary.lookup(self.difficulty[rows])
+        lists = {key: self._split(getattr(self, key), rows) for key in RAGGED_COLUMNS}
+        quantities = self._quantities(rows, lists['ingredients'])
+        meal_types = [self.meal_types[code] for code in self.type_codes[rows].tolist()] if with_type else None
+
+        meals = []
+        for i, row in enumerate(rows.tolist()):
+            meal = {
+                'id': self.ids[row],
+                'name': self.names[row],
+                'ingredients': lists['ingredients'][i],
+                'nutrition': dict(zip(NUTRIENTS, nutrition[i])),
+                'health_conditions': lists['health_conditions'][i],
+                'prep_time': None if prep_times[i] == NO_PREP_TIME else prep_times[i],
+                'difficulty': difficulties[i],
+                'instructions': lists['instructions'][i]
+            }
+            if quantities[i]:
+                meal['quantities'] = quantities[i]
+            if with_type:
+                meal['meal_type'] = meal_types[i]
+            meals.append(meal)
+        return meals
+
+    def _split(self, column, rows):
+        codes, lengths = column.gather(rows)
+        terms = self.vocabulary.lookup(codes)
+        split, start = [], 0
+        for length in lengths.tolist():
+            split.append(terms[start:start + length])
+            start += length
+        return split
+
+    def _quantities(self, rows, ingredients):
+        """Per row, the known quantities keyed by ingredient (empty when none are known)"""
+        amounts, lengths = self.amounts.gather(rows)
+        known = ~np.isnan(amounts)
+        if not known.any():
+            return [{}] * len(rows)
+        amounts = _numbers(np.where(known, amounts, 0))
+        units = self.units.gather(rows)[0].tolist()
+        known = known.tolist()
+        quantities, start = [], 0
+        for names, length in zip(ingredients, lengths.tolist()):
+            quantities.append({name: {'amount': amounts[j], 'unit': BASE_UNITS[units[j]]}
+                               for name, j in zip(names, range(start, start + length)) if known[j]})
+            start += length
+        return quantities
+
+    def to_meals_db(self):
+        return {meal_type: self.meals(self.rows(meal_type)) for meal_type in self.meal_types}
+
+
+def _numbers(values):
+    """float32 matrix to nested lists, rounding off storage noise; whole numbers become ints, NaN None"""
+    values = np.round(values.astype(np.float64), 2)
+    whole = values == np.floor(values)
+    numbers = values.astype(object)
+    numbers[whole] = values[whole].astype(np.int64)
+    numbers[np.isnan(values)] = None
+    return numbers.tolist()
@@ -1,26 +1,87 @@
 import json
 import os
 import random
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from utils.meal_catalog import MealCatalogBuilder
+
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2)
+    return json.dumps(value, indent=2).encode('utf-8')
 
 class MealDatabase:
-    """Database of meals with nutritional information"""
+    """Database of meals with nutritional information
+
+    The meals live in an immutable MealCatalog snapshot. Readers use
+    whatever snapshot `self.catalog` points at without locking; writers
+    build the next snapshot on the side and publish it by swapping the
+    reference, so a reader never sees a half-applied edit.
+
+    Foods imported into the catalog store stay there: they are not copied
+    into meals_database.json, and deleting one deletes it from the store.
+    Editing one moves it into the JSON file, which takes precedence.
+    """
     
     def __init__(self):
         self.meals_path = 'data/meals_database.json'
+        self.catalog_path = 'data/food_catalog.db'
+        self._write_lock = threading.Lock()
+        # Ids of meals whose only saved copy is in the catalog store
+        self._imported = set()
         self.load_meals_database()
     
     def load_meals_database(self):
-        """Load meals database from file"""
+        """Load meals database from file into a compact MealCatalog"""
         try:
             if os.path.exists(self.meals_path):
                 with open(self.meals_path, 'r') as f:
-                    self.meals_db = json.load(f)
+                    meals_db = json.load(f)
             else:
-                self.meals_db = self.create_default_meals_database()
-                self.save_meals_database()
+                meals_db = self.create_default_meals_database()
+                self.save_meals_database(meals_db)
         except Exception as e:
             print(f"Error loading meals database: {e}")
-            self.meals_db = self.create_default_meals_database()
+            meals_db = self.create_default_meals_database()
+        builder = MealCatalogBuilder().add_meals_db(meals_db)
+        del meals_db
+        self._imported = self.load_catalog_store(builder)
+        self.catalog = builder.build()
+
+    def load_catalog_store(self, builder):
+        """Add foods imported with utils.food_import, if a catalog store exists; returns the ids added"""
+        imported = set()
+        if not os.path.exists(self.catalog_path):
+            return imported
+        try:
+            from utils.catalog_store import CatalogStore
+            # Meals saved in the JSON file override the store's copy
+            known = set(builder.ids)
+            with CatalogStore(self.catalog_path) as store:
+                for meal in store.iter_meals():
+                    if meal['id'] not in known:
+                        builder.add(meal['meal_type'], meal)
+                        imported.add(meal['id'])
+        except Exception as e:
+            print(f"Error loading catalog store: {e}")
+        return imported
+
+    def delete_from_catalog_store(self, meal_ids):
+        """Delete meals from the catalog store so they are not loaded again"""
+        if not meal_ids or not os.path.exists(self.catalog_path):
+            return
+        from utils.catalog_store import CatalogStore
+        with CatalogStore(self.catalog_path) as store:
+            store.delete_meals(meal_ids)
     
     def create_default_meals_database(self):
         """Create comprehensive meals database with nutritional info"""
@@ -46,7 +107,14 @@ class MealDatabase:
                         "Cook steel cut oats according to package directions",
                         "Top with fresh berries and sliced almonds",
                         "Sprinkle with cinnamon"
-                    ]
+                    ],
+                    "quantities": {
+                        "steel cut oats": {"amount": 40, "unit": "g"},
+                        "blueberries": {"amount": 50, "unit": "g"},
+                        "strawberries": {"amount": 50, "unit": "g"},
+                        "almonds": {"amount": 10, "unit": "g"},
+                        "cinnamon": {"amount": 1, "unit": "g"}
+                    }
                 },
                 {
                     "id": "b002",
@@ -68,7 +136,13 @@ class MealDatabase:
                         "Layer Greek yogurt in a bowl",
                         "Add granola and berries",
                         "Drizzle with honey"
-                    ]
+                    ],
+                    "quantities": {
+                        "greek yogurt": {"amount": 170, "unit": "g"},
+                        "granola": {"amount": 30, "unit": "g"},
+                        "honey": {"amount": 10, "unit": "g"},
+                        "mixed berries": {"amount": 75, "unit": "g"}
+                    }
                 },
                 {
                     "id": "b003",
@@ -90,7 +164,14 @@ class MealDatabase:
                         "Toast whole grain bread",
                         "Mash avocado with lime juice",
                         "Top with sliced tomato and poached egg"
-                    ]
+                    ],
+                    "quantities": {
+                        "whole grain bread": {"amount": 60, "unit": "g"},
+                        "avocado": {"amount": 0.5, "unit": "piece"},
+                        "eggs": {"amount": 2, "unit": "piece"},
+                        "tomato": {"amount": 50, "unit": "g"},
+                        "lime": {"amount": 0.25, "unit": "piece"}
+                    }
                 }
             ],
             "lunch": [
@@ -114,7 +195,15 @@ class MealDatabase:
                         "Cook quinoa and roast sweet potato",
                         "Massage kale with lemon juice",
                         "Combine with chickpeas and tahini dressing"
-                    ]
+                    ],
+                    "quantities": {
+                        "quinoa": {"amount": 60, "unit": "g"},
+                        "chickpeas": {"amount": 80, "unit": "g"},
+                        "kale": {"amount": 50, "unit": "g"},
+                        "sweet potato": {"amount": 120, "unit": "g"},
+                        "tahini": {"amount": 15, "unit": "g"},
+                        "lemon": {"amount": 0.5, "unit": "piece"}
+                    }
                 },
                 {
                     "id": "l002",
@@ -136,7 +225,15 @@ class MealDatabase:
                         "Grill salmon with herbs",
                         "Prepare salad with mixed greens and vegetables",
                         "Dress with olive oil and balsamic vinegar"
-                    ]
+                    ],
+                    "quantities": {
+                        "salmon": {"amount": 120, "unit": "g"},
+                        "mixed greens": {"amount": 75, "unit": "g"},
+                        "cucumber": {"amount": 60, "unit": "g"},
+                        "tomatoes": {"amount": 80, "unit": "g"},
+                        "olive oil": {"amount": 10, "unit": "ml"},
+                        "balsamic vinegar": {"amount": 15, "unit": "ml"}
+                    }
                 },
                 {
                     "id": "l003",
@@ -158,7 +255,15 @@ class MealDatabase:
                         "Sauté vegetables in a large pot",
                         "Add lentils and broth, simmer 20 minutes",
                         "Season with herbs and spices"
-                    ]
+                    ],
+                    "quantities": {
+                        "red lentils": {"amount": 70, "unit": "g"},
+                        "carrots": {"amount": 60, "unit": "g"},
+                        "celery": {"amount": 40, "unit": "g"},
+                        "onion": {"amount": 50, "unit": "g"},
+                        "garlic": {"amount": 2, "unit": "piece"},
+                        "vegetable broth": {"amount": 240, "unit": "ml"}
+                    }
                 }
             ],
             "dinner": [
@@ -182,7 +287,14 @@ class MealDatabase:
                         "Season chicken with herbs",
                         "Bake chicken and roast vegetables",
                         "Serve with steamed broccoli"
-                    ]
+                    ],
+                    "quantities": {
+                        "chicken breast": {"amount": 150, "unit": "g"},
+                        "broccoli": {"amount": 100, "unit": "g"},
+                        "carrots": {"amount": 70, "unit": "g"},
+                        "herbs": {"amount": 2, "unit": "g"},
+                        "olive oil": {"amount": 15, "unit": "ml"}
+                    }
                 },
                 {
                     "id": "d002",
@@ -204,7 +316,14 @@ class MealDatabase:
                         "Bake sweet potato until tender",
                         "Season cod with lemon and garlic",
                         "Steam asparagus until crisp-tender"
-                    ]
+                    ],
+                    "quantities": {
+                        "cod fillet": {"amount": 150, "unit": "g"},
+                        "sweet potato": {"amount": 150, "unit": "g"},
+                        "asparagus": {"amount": 100, "unit": "g"},
+                        "lemon": {"amount": 0.5, "unit": "piece"},
+                        "garlic": {"amount": 1, "unit": "piece"}
+                    }
                 },
                 {
                     "id": "d003",
@@ -226,7 +345,15 @@ class MealDatabase:
                         "Cook brown rice",
                         "Stir-fry tofu until golden",
                         "Add vegetables and sauce, cook until tender"
-                    ]
+                    ],
+                    "quantities": {
+                        "firm tofu": {"amount": 150, "unit": "g"},
+                        "brown rice": {"amount": 60, "unit": "g"},
+                        "bell peppers": {"amount": 80, "unit": "g"},
+                        "snap peas": {"amount": 70, "unit": "g"},
+                        "ginger": {"amount": 5, "unit": "g"},
+                        "soy sauce": {"amount": 15, "unit": "ml"}
+                    }
                 }
             ],
             "snacks": [
@@ -249,7 +376,11 @@ class MealDatabase:
                     "instructions": [
                         "Slice apple",
                         "Serve with 2 tablespoons almond butter"
-                    ]
+                    ],
+                    "quantities": {
+                        "apple": {"amount": 1, "unit": "piece"},
+                        "almond butter": {"amount": 16, "unit": "g"}
+                    }
                 },
                 {
                     "id": "s002",
@@ -270,96 +401,141 @@ class MealDatabase:
                     "instructions": [
                         "Cut vegetables into sticks",
                         "Serve with 1/4 cup hummus"
-                    ]
+                    ],
+                    "quantities": {
+                        "hummus": {"amount": 60, "unit": "g"},
+                        "carrots": {"amount": 50, "unit": "g"},
+                        "cucumber": {"amount": 50, "unit": "g"},
+                        "bell peppers": {"amount": 40, "unit": "g"}
+                    }
                 }
             ]
         }
     
-    def save_meals_database(self):
-        """Save meals database to file"""
-        os.makedirs('data', exist_ok=True)
-        with open(self.meals_path, 'w') as f:
-            json.dump(self.meals_db, f, indent=2)
+    def snapshot(self):
+        """Current catalog; pass it to the read methods to keep one view across calls"""
+        return self.catalog
+
+    def update_meals(self, upserts=(), deletes=(), persist=True):
+        """Publish a new snapshot with (meal_type, meal) pairs added or replaced and ids removed
+
+        Writers are serialized; readers are never blocked and keep the
+        snapshot they started with. Returns the new catalog version.
+        """
+        upserts, deletes = list(upserts), list(deletes)
+        with self._write_lock:
+            catalog = self.catalog.with_changes(upserts, deletes)
+            if persist:
+                # A JSON copy may shadow a stored one, so every delete goes to the store
+                self.delete_from_catalog_store(deletes)
+                self._imported.difference_update(deletes)
+                self._imported.difference_update(meal['id'] for _, meal in upserts)
+                self.save_meals_database(catalog=catalog)
+            self.catalog = catalog
+        return catalog.version
+
+    def save_meals_database(self, meals_db=None, catalog=None):
+        """Save meals database to file, replacing it atomically"""
+        directory = os.path.dirname(self.meals_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.meals_database.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if meals_db is not None:
+                    f.write(_dumps(meals_db))
+                else:
+                    self._write_catalog(f, catalog if catalog is not None else self.catalog)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.meals_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_catalog(self, f, catalog, batch_size=5000):
+        """Stream a catalog in the layout json.dump(indent=2) produces, one batch of dicts at a time
+
+        Meals that live only in the catalog store are left out.
+        """
+        saved = None
+        if self._imported:
+            saved = np.fromiter((meal_id not in self._imported for meal_id in catalog.ids),
+                                dtype=bool, count=len(catalog.ids))
+        f.write(b'{')
+        for i, meal_type in enumerate(catalog.meal_types):
+            rows = catalog.rows(meal_type)
+            if saved is not None:
+                rows = rows[saved[rows]]
+            f.write(b'%s\n  %s: [' % (b',' if i else b'', _dumps(meal_type)))
+            for start in range(0, len(rows), batch_size):
+                # A dumped list is "[\n  {...},\n  {...}\n]": drop the brackets, indent two more
+                items = _dumps(catalog.meals(rows[start:start + batch_size]))[1:-2]
+                f.write((b',' if start else b'') + items.replace(b'\n', b'\n  '))
+            f.write(b'\n  ]' if len(rows) else b']')
+        f.write(b'\n}' if catalog.meal_types else b'}')
     
-    def get_meal_suggestions(self, meal_type, user_data):
+    def get_meal_suggestions(self, meal_type, user_data, catalog=None):
         """Get meal suggestions based on user's health conditions"""
         try:
-            meals = self.meals_db.get(meal_type, [])
+            catalog = self.catalog if catalog is None else catalog
+            rows = catalog.rows(meal_type)
             user_conditions = user_data.get('conditions', [])
             
-            # Filter meals based on health conditions
-            suitable_meals = []
-            for meal in meals:
-                meal_conditions = meal.get('health_conditions', [])
-                
-                # Check if meal is suitable for user's conditions
-                if not user_conditions:  # No specific conditions
-                    suitable_meals.append(meal)
-                else:
-                    # Meal is suitable if it addresses any of user's conditions
-                    if any(condition in meal_conditions for condition in user_conditions):
-                        suitable_meals.append(meal)
+            # Meal is suitable if it addresses any of user's conditions
+            suitable_rows = catalog.rows_with_conditions(user_conditions, rows) if user_conditions else rows
             
             # If no specific matches, return all meals for the type
-            if not suitable_meals:
-                suitable_meals = meals
+            if not len(suitable_rows):
+                suitable_rows = rows
             
             # Return up to 3 random suggestions
-            return random.sample(suitable_meals, min(3, len(suitable_meals)))
+            picked = random.sample(range(len(suitable_rows)), min(3, len(suitable_rows)))
+            return catalog.meals(suitable_rows[picked])
             
         except Exception as e:
             print(f"Error getting meal suggestions: {e}")
             return []
     
-    def get_nutrition_info(self, meal_id):
+    def get_nutrition_info(self, meal_id, catalog=None):
         """Get detailed nutrition information for a specific meal"""
         try:
-            for meal_type, meals in self.meals_db.items():
-                for meal in meals:
-                    if meal['id'] == meal_id:
-                        return meal
-            return None
+            catalog = self.catalog if catalog is None else catalog
+            row = catalog.row_of(meal_id)
+            return None if row is None else catalog.meal(row)
         except Exception as e:
             print(f"Error getting nutrition info: {e}")
             return None
     
-    def search_meals(self, query, meal_type=None):
+    def search_meals(self, query, meal_type=None, catalog=None):
         """Search meals by name or ingredients"""
         try:
-            results = []
+            catalog = self.catalog if catalog is None else catalog
             query = query.lower()
             
-            meal_types = [meal_type] if meal_type else self.meals_db.keys()
+            # Ingredients are matched once per distinct vocabulary term
+            ingredient_hits = catalog.rows_with_ingredient_matching(lambda term: query in term.lower())
             
+            results = []
+            meal_types = [meal_type] if meal_type else catalog.meal_types
             for mtype in meal_types:
-                meals = self.meals_db.get(mtype, [])
-                for meal in meals:
-                    # Search in name
-                    if query in meal['name'].lower():
-                        results.append(meal)
-                        continue
-                    
-                    # Search in ingredients
-                    if any(query in ingredient.lower() for ingredient in meal['ingredients']):
-                        results.append(meal)
+                rows = catalog.rows(mtype)
+                names = catalog.names
+                name_hits = np.fromiter((query in names[row].lower() for row in rows.tolist()),
+                                        dtype=bool, count=len(rows))
+                results.extend(catalog.meals(rows[name_hits | ingredient_hits[rows]]))
             
             return results
         except Exception as e:
             print(f"Error searching meals: {e}")
             return []
     
-    def get_meals_by_condition(self, condition):
+    def get_meals_by_condition(self, condition, catalog=None):
         """Get all meals suitable for a specific health condition"""
         try:
-            suitable_meals = []
-            
-            for meal_type, meals in self.meals_db.items():
-                for meal in meals:
-                    if condition in meal.get('health_conditions', []):
-                        meal['meal_type'] = meal_type
-                        suitable_meals.append(meal)
-            
-            return suitable_meals
+            catalog = self.catalog if catalog is None else catalog
+            rows = np.concatenate([catalog.rows_with_conditions([condition], catalog.rows(mtype))
+                                   for mtype in catalog.meal_types] or [np.empty(0, dtype=np.int64)])
+            return catalog.meals(rows, with_type=True)
         except Exception as e:
             print(f"Error getting meals by condition: {e}")
             return []
@@ -380,7 +556,7 @@ class MealDatabase:
             for meal in selected_meals:
                 nutrition = meal.get('nutrition', {})
                 for nutrient in total_nutrition:
-                    total_nutrition[nutrient] += nutrition.get(nutrient, 0)
+                    total_nutrition[nutrient] += nutrition.get(nutrient) or 0
             
             return total_nutrition
         except Exception as e:
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks']
+
+_QUANTITY = re.compile(r'^\s*(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?\s*[a-zA-Z]*\s*$')
+
+
+def to_number(value):
+    """Convert "12g" to 12 and "8-12g" to [8, 12]; other values pass through"""
+    if not isinstance(value, str):
+        return value
+    match = _QUANTITY.match(value)
+    if not match:
+        return value
+    low, high = (_parse_number(group) for group in match.groups())
+    return low if high is None else [low, high]
+
+
+def _parse_number(text):
+    if text is None:
+        return None
+    number = float(text)
+    return int(number) if number.is_integer() else number
+
+
+def compact_plan(meal_plan, plan_id=None):
+    """Flatten a generated plan so each distinct meal is sent only once"""
+    meals = {}
+    ids_by_content = {}
+    # Patched plans share meal objects between slots; hash each object once
+    ids_by_object = {}
+
+    def ref(meal):
+        meal_id = ids_by_object.get(id(meal))
+        if meal_id is not None:
+            return meal_id
+        key = _content_key(meal)
+        meal_id = ids_by_content.get(key)
+        if meal_id is None:
+            meal_id = hashlib.sha1(key).hexdigest()[:8]
+            ids_by_content[key] = meal_id
+            meals[meal_id] = _compact_meal(meal)
+        ids_by_object[id(meal)] = meal_id
+        return meal_id
+
+    today = {meal: ref(meal_plan[meal]) for meal in MEAL_TYPES if meal in meal_plan}
+    weekly = {
+        day: [ref(day_meals[meal]) for meal in MEAL_TYPES]
+        for day, day_meals in meal_plan.get('weekly_plan', {}).items()
+    }
+
+    return {
+        'plan_id': plan_id,
+        'meal_types': MEAL_TYPES,
+        'targets': meal_plan.get('nutrition_summary', {}),
+        'meals': meals,
+        'today': today,
+        'weekly': weekly
+    }
+
+
+def _content_key(meal):
+    if orjson is not None:
+        return orjson.dumps(meal, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(meal, sort_keys=True, default=str).encode('utf-8')
+
+
+def _compact_meal(meal):
+    compact = {
+        'name': meal.get('name'),
+        'ingredients': meal.get('ingredients', {}),
+        'nutrition': {k: to_number(v) for k, v in meal.get('nutrition', {}).items()},
+        'health_benefits': meal.get('health_benefits', [])
+    }
+    if meal.get('portions'):
+        compact['portions'] = meal['portions']
+    if meal.get('instructions'):
+        compact['instructions'] = meal['instructions']
+    if meal.get('quantities'):
+        compact['quantities'] = meal['quantities']
+    return compact
+
+
+def diff_plans(old, new):
+    """RFC 6902 JSON Patch operations turning plan `old` into plan `new`"""
+    ops = []
+    _diff(old, new, '', ops)
+    return ops
+
+
+def _diff(old, new, path, ops):
+    # Patched plans reuse untouched subtrees, so identity ends most comparisons early
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() - new.keys()):
+            ops.append({'op': 'remove', 'path': f"{path}/{_pointer(key)}"})
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, f"{path}/{_pointer(key)}", ops)
+            else:
+                ops.append({'op': 'add', 'path': f"{path}/{_pointer(key)}", 'value': value})
+    elif old != new:
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def _pointer(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def available_mimetypes():
+    """Mimetypes that can be produced, in server preference order"""
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.extend(MSGPACK_MIMETYPES)
+    return mimetypes
+
+
+def encode(payload, mimetype=JSON_MIMETYPE):
+    """Serialize a payload with the fastest encoder available for the mimetype"""
+    if mimetype in MSGPACK_MIMETYPES and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class PlanStore:
+    """Bounded LRU of generated plans and the profiles they were built from, so they can be patched
+
+    Plan IDs are profile hashes, shared by identical profiles and derivable
+    from a profile, so each entry also keeps the owners allowed to see it.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, plan_id, owner):
+        """Return (user_data, meal_plan) for a stored plan `owner` may see, or None"""
+        with self._lock:
+            entry = self._entries.get(plan_id)
+            if entry is None or owner not in entry[2]:
+                return None
+            self._entries.move_to_end(plan_id)
+            return entry[0], entry[1]
+
+    def put(self, plan_id, user_data, meal_plan, owner):
+        with self._lock:
+            entry = self._entries.get(plan_id)
+            owners = entry[2] if entry is not None else set()
+            owners.add(owner)
+            self._entries[plan_id] = (user_data, meal_plan, owners)
+            self._entries.move_to_end(plan_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def grant(self, plan_id, owner):
+        """Let another owner see a stored plan (e.g. the patient collecting a roster job's plan)"""
+        with self._lock:
+            entry = self._entries.get(plan_id)
+            if entry is not None:
+                entry[2].add(owner)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,200 @@
+"""
+Procurement lists: ingredient quantities summed across many plans.
+
+Each plan is reduced once, when it is recorded, to a vector of distinct
+(ingredient, unit) keys and their summed amounts. While a plan is being
+encoded a key is the ingredient's code in the shared catalog Vocabulary
+times the number of unit slots plus the unit's BASE_UNITS index, so
+template plans and catalog plans count the same ingredient under the same
+key. Vocabulary codes only hold within one process, so the store
+persists each key as a row id of its own ingredients table. Totals over
+any set of plans are one concatenation and a bincount over those ids,
+with no per-ingredient Python work until the result is formatted.
+
+Every record belongs to an owner: a patient's session, or a job for
+roster plans. An owner holds one current plan, so a new or patched plan
+retires the one it replaces and identical profiles of different patients
+still count separately. Ingredients without a known quantity are listed
+under `unquantified`, with the number of plans using them.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from utils.meal_catalog import BASE_UNITS, NO_UNIT, UNITS, VOCABULARY
+
+# Unit slot of ingredients without an amount
+UNQUANTIFIED = len(BASE_UNITS)
+_SLOTS = len(BASE_UNITS) + 1
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingredients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    unit INTEGER NOT NULL,
+    UNIQUE (name, unit)
+);
+CREATE TABLE IF NOT EXISTS plans (
+    owner TEXT PRIMARY KEY,
+    facility TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    ingredient_ids BLOB NOT NULL,
+    amounts BLOB NOT NULL,
+    recorded_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_by_facility ON plans (facility);
+CREATE INDEX IF NOT EXISTS plans_by_plan ON plans (plan_id);
+"""
+
+# SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 999
+
+
+def catalog_quantities(catalog, rows, servings):
+    """(keys, amounts) for catalog meals served at `rows` with the given servings, in one vectorized pass"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if not len(rows):
+        return _EMPTY
+    codes, lengths = catalog.ingredients.gather(rows)
+    amounts = catalog.amounts.gather(rows)[0].astype(np.float64)
+    amounts *= np.repeat(np.asarray(servings, dtype=np.float64), lengths)
+    units = catalog.units.gather(rows)[0].astype(np.int64)
+    unknown = units == NO_UNIT
+    units[unknown] = UNQUANTIFIED
+    amounts[unknown] = 0.0
+    return _reduce(codes.astype(np.int64) * _SLOTS + units, amounts)
+
+
+def plan_quantities(meal_plan, vocabulary=VOCABULARY):
+    """(keys, amounts) of the week of a generated template plan, from each meal's `quantities`"""
+    meals = [meal for day in meal_plan.get('weekly_plan', {}).values()
+             for meal in day.values() if isinstance(meal, dict)]
+    keys, amounts = [], []
+    intern = vocabulary.intern
+    for meal in meals:
+        for ingredient, quantity in meal.get('quantities', {}).items():
+            unit, factor = UNITS.get(quantity.get('unit'), (None, 0))
+            slot = BASE_UNITS.index(unit) if unit else UNQUANTIFIED
+            keys.append(intern(ingredient) * _SLOTS + slot)
+            amounts.append(quantity.get('amount', 0) * factor)
+    if not keys:
+        return _EMPTY
+    return _reduce(np.array(keys, dtype=np.int64), np.array(amounts, dtype=np.float64))
+
+
+def _reduce(keys, amounts):
+    """Distinct keys and the sum of their amounts"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=amounts, minlength=len(unique))
+
+
+class ProcurementStore:
+    """Current plan quantities per owner in SQLite, summed on demand per facility or set of plans"""
+
+    def __init__(self, path='data/procurement.db', vocabulary=VOCABULARY):
+        self.path = path
+        self.vocabulary = vocabulary
+        self._local = threading.local()
+        # Vocabulary key -> ingredient id and id -> (name, unit slot); ids never change once assigned
+        self._ids = {}
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+
+    def record(self, owner, plan_id, facility, quantities):
+        """Make a plan's (keys, amounts) the owner's current plan, under its facility (e.g. clinic)"""
+        keys, amounts = quantities
+        ids = self._ingredient_ids(keys)
+        self._conn().execute(
+            'INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?)',
+            (owner, facility or '', plan_id, ids.astype(np.int32).tobytes(),
+             np.asarray(amounts, dtype=np.float64).tobytes(), int(time.time())))
+
+    def retire(self, owner):
+        """Stop counting the owner's plan"""
+        self._conn().execute('DELETE FROM plans WHERE owner = ?', (owner,))
+
+    def _ingredient_ids(self, keys):
+        keys = keys.tolist()
+        missing = [key for key in keys if key not in self._ids]
+        if missing:
+            terms = self.vocabulary.lookup(np.array(missing) // _SLOTS)
+            rows = [(term, key % _SLOTS) for term, key in zip(terms, missing)]
+            conn = self._conn()
+            conn.executemany('INSERT OR IGNORE INTO ingredients (name, unit) VALUES (?, ?)', rows)
+            with self._lock:
+                for key, (name, unit) in zip(missing, rows):
+                    ingredient_id = conn.execute('SELECT id FROM ingredients WHERE name = ? AND unit = ?',
+                                                 (name, unit)).fetchone()[0]
+                    self._ids[key] = ingredient_id
+                    self._names[ingredient_id] = (name, unit)
+        return np.array([self._ids[key] for key in keys], dtype=np.int64)
+
+    def _ingredient_names(self, ids):
+        if any(ingredient_id not in self._names for ingredient_id in ids):
+            # Ingredients first recorded by another worker
+            rows = self._conn().execute('SELECT id, name, unit FROM ingredients').fetchall()
+            with self._lock:
+                self._names.update((ingredient_id, (name, unit)) for ingredient_id, name, unit in rows)
+        return [self._names[ingredient_id] for ingredient_id in ids]
+
+    def totals(self, facility=None, plan_ids=None):
+        """Summed quantities over the current plans of `facility` (all when None), optionally only `plan_ids`"""
+        conn = self._conn()
+        where, params = [], []
+        if facility is not None:
+            where.append('facility = ?')
+            params.append(facility)
+        query = 'SELECT ingredient_ids, amounts FROM plans'
+        if plan_ids is None:
+            rows = conn.execute(query + (' WHERE ' + where[0] if where else ''), params).fetchall()
+        else:
+            plan_ids = list(dict.fromkeys(plan_ids))
+            rows = []
+            for i in range(0, len(plan_ids), _MAX_PARAMS - 1):
+                batch = plan_ids[i:i + _MAX_PARAMS - 1]
+                clauses = where + [f"plan_id IN ({', '.join('?' * len(batch))})"]
+                rows += conn.execute(f"{query} WHERE {' AND '.join(clauses)}", params + batch).fetchall()
+
+        report = {'facility': facility, 'plans': len(rows), 'items': [], 'unquantified': []}
+        if not rows:
+            return report
+        ids = np.concatenate([np.frombuffer(blob, dtype=np.int32) for blob, _ in rows])
+        amounts = np.concatenate([np.frombuffer(blob, dtype=np.float64) for _, blob in rows])
+        # Ingredient ids are small and dense, so they index the sums directly
+        sums = np.bincount(ids, weights=amounts)
+        # A plan holds each ingredient once, so id counts are plan counts
+        plans = np.bincount(ids, minlength=len(sums))
+        used = np.flatnonzero(plans)
+
+        for (name, slot), amount, count in zip(self._ingredient_names(used.tolist()),
+                                                np.round(sums[used], 1).tolist(), plans[used].tolist()):
+            if slot == UNQUANTIFIED:
+                report['unquantified'].append({'ingredient': name, 'plans': count})
+            else:
+                report['items'].append({'ingredient': name, 'unit': BASE_UNITS[slot], 'amount': amount,
+                                        'plans': count})
+        report['items'].sort(key=lambda item: (item['ingredient'], item['unit']))
+        report['unquantified'].sort(key=lambda item: item['ingredient'])
+        return report
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def profile_hash(user_data):
+    """Stable short hash of a user profile, used as the plan ID"""
+    # List order (checkbox or allergy order) at most reorders the output,
+    # so equivalent profiles share one key
+    normalized = {
+        key: sorted(value) if isinstance(value, list) else value
+        for key, value in user_data.items()
+    }
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class RenderCache:
+    """Bounded LRU cache of rendered plan pages with background pre-rendering"""
+
+    def __init__(self, max_entries=512, workers=2):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prerender')
+
+    def get(self, key):
+        """Return (html, etag) for a cached page, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, html):
+        """Store rendered HTML and return its (html, etag) entry"""
+        etag = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        entry = (html, etag)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def prerender(self, key, render_fn):
+        """Render a page in the background so the next view is a cache hit"""
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return
+            future = self._executor.submit(self._render, key, render_fn)
+            self._pending[key] = future
+
+    def get_or_render(self, key, render_fn):
+        """Return a cached entry, waiting on an in-flight pre-render if there is one"""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"Background render failed: {e}")
+        else:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+
+        return self.put(key, render_fn())
+
+    def _render(self, key, render_fn):
+        try:
+            return self.put(key, render_fn())
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
@@ -0,0 +1,120 @@
+"""
+Fingerprinted, precompressed static assets.
+
+The build step copies every file under static/ to static/dist/ with a
+content hash in its name (css/style.css -> css/style.3f9a1c0b2d4e.css),
+writes maximum-effort .gz and (if brotli is installed) .br variants next
+to each compressible file, and records the mapping in
+static/dist/manifest.json:
+
+    python -m utils.static_assets
+
+At runtime url_for('static', ...) resolves to the hashed name, and hashed
+files are served with their precompressed variant and a one-year
+immutable cache header, since any content change produces a new URL.
+Without a manifest, assets are served as plain static files.
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import send_from_directory
+
+from utils.compression import COMPRESSIBLE_MIMETYPES, MIN_SIZE, available_encodings, compress
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 86400
+# Maximum compression: this runs once per build, not per request
+BUILD_LEVELS = {'br': 11, 'gzip': 9}
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def fingerprinted_name(path, data):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def build_assets(static_dir='static'):
+    """Write hashed and precompressed copies of every static file; returns the manifest"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [d for d in dirs if d != DIST_DIR]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            hashed = fingerprinted_name(logical, data)
+            manifest[logical] = hashed
+
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write(target, data)
+            if mimetypes.guess_type(logical)[0] in COMPRESSIBLE_MIMETYPES and len(data) >= MIN_SIZE:
+                for encoding in available_encodings():
+                    compressed = compress(data, encoding, BUILD_LEVELS[encoding])
+                    if len(compressed) < len(data):
+                        _write(target + SUFFIXES[encoding], compressed)
+
+    os.makedirs(dist_dir, exist_ok=True)
+    _write(os.path.join(dist_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def _write(path, data):
+    # Atomic, so workers never serve a half-written asset
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class StaticAssets:
+    """Manifest lookups and serving for the built asset directory"""
+
+    def __init__(self, static_dir='static'):
+        self.dist_dir = os.path.abspath(os.path.join(static_dir, DIST_DIR))
+        self.manifest = {}
+        try:
+            with open(os.path.join(self.dist_dir, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Loading static asset manifest failed: {e}")
+
+    def url_filename(self, filename):
+        """Path under /static/ for a logical asset name: the hashed copy once built"""
+        hashed = self.manifest.get(filename)
+        return f"{DIST_DIR}/{hashed}" if hashed else filename
+
+    def send(self, filename, accept_encodings):
+        """Response for a hashed asset, using the best precompressed variant the client accepts"""
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        variants = [encoding for encoding in available_encodings()
+                    if os.path.exists(os.path.join(self.dist_dir, filename + SUFFIXES[encoding]))]
+        encoding = accept_encodings.best_match(variants) if variants else None
+
+        path = filename + SUFFIXES[encoding] if encoding else filename
+        response = send_from_directory(self.dist_dir, path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if variants:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fingerprint and precompress static assets')
+    parser.add_argument('--static', default='static', help='Static directory to build from')
+    args = parser.parse_args()
+    manifest = build_assets(args.static)
+    print(f"Built {len(manifest)} assets into {os.path.join(args.static, DIST_DIR)}")
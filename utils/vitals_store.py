@@ -0,0 +1,344 @@
+"""
+Append-only history of patient vitals.
+
+Each (patient, metric) series is stored column-wise in SQLite. Readings
+first land in a small tail table; every TAIL_LIMIT readings (or any bulk
+append at least that long) are sealed into segment rows of up to
+SEGMENT_SIZE readings. A segment holds the timestamps and fixed-point
+values, plus its precomputed daily rollup (count, sum, min, max per day),
+as delta-encoded columns in one zlib blob each. Range queries decode only
+the segments they overlap; rollups and trends read the daily columns, and
+weekly rollups are merged from them, so neither touches raw readings.
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Metric -> fixed-point scale (readings are stored as round(value * scale))
+METRICS = {
+    'systolic_bp': 1,
+    'diastolic_bp': 1,
+    'blood_sugar': 10,
+    'weight': 10,
+    'bmi': 10
+}
+METRIC_CODES = {metric: i for i, metric in enumerate(METRICS)}
+# Weekly change below which a trend counts as stable, in the metric's unit
+TREND_THRESHOLDS = {
+    'systolic_bp': 1.0,
+    'diastolic_bp': 1.0,
+    'blood_sugar': 1.0,
+    'weight': 0.2,
+    'bmi': 0.1
+}
+PERIODS = {'day': 86400, 'week': 7 * 86400}
+SEGMENT_SIZE = 512
+TAIL_LIMIT = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    patient TEXT NOT NULL,
+    metric INTEGER NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    readings BLOB NOT NULL,
+    daily BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_by_series ON segments (patient, metric, end_ts);
+CREATE TABLE IF NOT EXISTS tail (
+    patient TEXT NOT NULL,
+    metric INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (patient, metric, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    patient TEXT NOT NULL,
+    metric INTEGER NOT NULL,
+    tail_count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    last_value INTEGER NOT NULL,
+    PRIMARY KEY (patient, metric)
+) WITHOUT ROWID;
+"""
+
+_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+_COLUMN_HEADER = struct.Struct('<qB')
+
+
+def pack_columns(columns):
+    """Equal-length int64 columns -> one blob of per-column delta encodings, zlib-compressed.
+
+    Each column keeps its first value and stores the rest as deltas in the
+    narrowest integer type that holds them.
+    """
+    headers, bodies = [struct.pack('<HI', len(columns), len(columns[0]))], []
+    for values in columns:
+        deltas = np.diff(values)
+        for code, dtype in enumerate(_DTYPES):
+            info = np.iinfo(dtype)
+            if not len(deltas) or (deltas.min() >= info.min and deltas.max() <= info.max):
+                break
+        headers.append(_COLUMN_HEADER.pack(int(values[0]), code))
+        bodies.append(deltas.astype(dtype).tobytes())
+    return b''.join(headers) + zlib.compress(b''.join(bodies))
+
+
+def unpack_columns(blob):
+    n_columns, length = struct.unpack_from('<HI', blob)
+    offset = 6
+    headers = []
+    for _ in range(n_columns):
+        headers.append(_COLUMN_HEADER.unpack_from(blob, offset))
+        offset += _COLUMN_HEADER.size
+    body = zlib.decompress(blob[offset:])
+    columns, position = [], 0
+    for first, code in headers:
+        dtype = np.dtype(_DTYPES[code])
+        deltas = np.frombuffer(body, dtype=dtype, count=length - 1, offset=position)
+        position += (length - 1) * dtype.itemsize
+        values = np.empty(length, dtype=np.int64)
+        values[0] = first
+        np.cumsum(deltas, out=values[1:])
+        values[1:] += first
+        columns.append(values)
+    return columns
+
+
+def bucket_start(ts, period):
+    """Start of the day or (Monday-based) week holding each timestamp, UTC"""
+    ts = np.asarray(ts, dtype=np.int64)
+    day = ts - ts % 86400
+    if period == 'day':
+        return day
+    # 1970-01-01 was a Thursday
+    return day - ((day // 86400 + 3) % 7) * 86400
+
+
+def aggregate(buckets, counts, totals, lows, highs):
+    """Merge rollup rows sharing a bucket; returns the same five columns sorted by bucket"""
+    if not len(buckets):
+        return buckets, counts, totals, lows, highs
+    order = np.argsort(buckets, kind='stable')
+    buckets, counts, totals, lows, highs = (column[order] for column in (buckets, counts, totals, lows, highs))
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    return (buckets[starts], np.add.reduceat(counts, starts), np.add.reduceat(totals, starts),
+            np.minimum.reduceat(lows, starts), np.maximum.reduceat(highs, starts))
+
+
+def daily_rollup(ts, fixed):
+    """Daily (bucket, count, sum, min, max) columns of raw readings"""
+    return aggregate(bucket_start(ts, 'day'), np.ones(len(ts), dtype=np.int64), fixed, fixed, fixed)
+
+
+class VitalsStore:
+    """Per-patient vitals series with rollups; safe to share across threads"""
+
+    def __init__(self, path='data/vitals.db'):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # -----------------------------
+    # WRITES
+    # -----------------------------
+    def append(self, patient, readings, ts=None):
+        """Record one assessment: {metric: value} at `ts` (default now)"""
+        ts = int(time.time() if ts is None else ts)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for metric, value in readings.items():
+                if metric in METRICS and value:
+                    self._append(conn, patient, metric, np.array([ts]), np.array([value], dtype=float))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def append_series(self, patient, metric, timestamps, values):
+        """Bulk-append many readings of one metric (e.g. an import or device sync)"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown vitals metric {metric!r}, expected one of {list(METRICS)}")
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._append(conn, patient, metric, np.asarray(timestamps, dtype=np.int64),
+                         np.asarray(values, dtype=float))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _append(self, conn, patient, metric, ts, values):
+        code = METRIC_CODES[metric]
+        order = np.argsort(ts, kind='stable')
+        ts = ts[order]
+        fixed = np.round(values[order] * METRICS[metric]).astype(np.int64)
+
+        # Long batches are sealed straight away; short ones wait in the tail
+        if len(ts) >= TAIL_LIMIT:
+            self._insert_segments(conn, patient, code, ts, fixed)
+            pending, added = 0, len(ts)
+        else:
+            # A repeated timestamp (e.g. a resubmitted form) replaces the earlier reading
+            rows = dict(zip(ts.tolist(), fixed.tolist()))
+            replaced = conn.execute(
+                f"SELECT COUNT(*) FROM tail WHERE patient = ? AND metric = ? AND ts IN ({','.join('?' * len(rows))})",
+                (patient, code, *rows)).fetchone()[0]
+            conn.executemany('INSERT OR REPLACE INTO tail VALUES (?, ?, ?, ?)',
+                             [(patient, code, t, v) for t, v in rows.items()])
+            pending = added = len(rows) - replaced
+
+        last = int(np.argmax(ts))
+        tail_count = conn.execute(
+            "INSERT INTO series VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (patient, metric) DO UPDATE SET "
+            "  tail_count = tail_count + excluded.tail_count, total = total + excluded.total, "
+            "  last_value = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_value ELSE last_value END, "
+            "  last_ts = MAX(last_ts, excluded.last_ts) "
+            "RETURNING tail_count",
+            (patient, code, pending, added, int(ts[last]), int(fixed[last]))).fetchone()[0]
+        if tail_count >= TAIL_LIMIT:
+            self._seal(conn, patient, code)
+
+    def _insert_segments(self, conn, patient, code, ts, fixed):
+        rows = []
+        for i in range(0, len(ts), SEGMENT_SIZE):
+            chunk_ts, chunk_values = ts[i:i + SEGMENT_SIZE], fixed[i:i + SEGMENT_SIZE]
+            rows.append((patient, code, int(chunk_ts[0]), int(chunk_ts[-1]), len(chunk_ts),
+                         pack_columns([chunk_ts, chunk_values]),
+                         pack_columns(daily_rollup(chunk_ts, chunk_values))))
+        conn.executemany(
+            'INSERT INTO segments (patient, metric, start_ts, end_ts, count, readings, daily) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _seal(self, conn, patient, code):
+        rows = conn.execute('SELECT ts, value FROM tail WHERE patient = ? AND metric = ? ORDER BY ts',
+                            (patient, code)).fetchall()
+        data = np.array(rows, dtype=np.int64)
+        self._insert_segments(conn, patient, code, data[:, 0], data[:, 1])
+        conn.execute('DELETE FROM tail WHERE patient = ? AND metric = ?', (patient, code))
+        conn.execute('UPDATE series SET tail_count = 0 WHERE patient = ? AND metric = ?', (patient, code))
+
+    # -----------------------------
+    # QUERIES
+    # -----------------------------
+    def _segments(self, column, patient, metric, start, end):
+        return self._conn().execute(
+            f'SELECT {column} FROM segments WHERE patient = ? AND metric = ? AND end_ts >= ? AND start_ts <= ?',
+            (patient, METRIC_CODES[metric], int(start), int(end)))
+
+    def _tail(self, patient, metric, start, end):
+        rows = self._conn().execute(
+            'SELECT ts, value FROM tail WHERE patient = ? AND metric = ? AND ts BETWEEN ? AND ?',
+            (patient, METRIC_CODES[metric], int(start), int(end))).fetchall()
+        return np.array(rows, dtype=np.int64).reshape(-1, 2)
+
+    def range(self, patient, metric, start=0, end=None):
+        """(timestamps, values) of readings with start <= ts <= end, oldest first"""
+        end = 2 ** 62 if end is None else int(end)
+        parts = [unpack_columns(blob) for blob, in self._segments('readings', patient, metric, start, end)]
+        tail = self._tail(patient, metric, start, end)
+        parts.append([tail[:, 0], tail[:, 1]])
+
+        ts = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        keep = (ts >= start) & (ts <= end)
+        ts, values = ts[keep], values[keep]
+        order = np.argsort(ts, kind='stable')
+        return ts[order], values[order] / METRICS[metric]
+
+    def rollups(self, patient, metric, period='day', start=0, end=None):
+        """Rows of {bucket, count, mean, min, max} per day or week in [start, end]"""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period!r}, expected one of {list(PERIODS)}")
+        end = 2 ** 62 if end is None else int(end)
+        first = int(bucket_start([start], period)[0])
+        parts = [unpack_columns(blob) for blob, in self._segments('daily', patient, metric, first, end)]
+        tail = self._tail(patient, metric, first, end)
+        parts.append(daily_rollup(tail[:, 0], tail[:, 1]))
+
+        # Days can straddle segments, and weeks are merged from days
+        columns = [np.concatenate([part[i] for part in parts]) for i in range(5)]
+        if not len(columns[0]):
+            return []
+        if period == 'week':
+            columns[0] = bucket_start(columns[0], 'week')
+        buckets, counts, totals, lows, highs = aggregate(*columns)
+        keep = (buckets >= first) & (buckets <= end)
+
+        scale = METRICS[metric]
+        return [{'bucket': bucket, 'count': count, 'mean': round(total / count / scale, 2),
+                 'min': low / scale, 'max': high / scale}
+                for bucket, count, total, low, high in zip(
+                    buckets[keep].tolist(), counts[keep].tolist(), totals[keep].tolist(),
+                    lows[keep].tolist(), highs[keep].tolist())]
+
+    def trend(self, patient, metric, days=90, now=None, latest=None):
+        """Latest value, change and least-squares weekly slope over the last `days` days"""
+        now = int(time.time() if now is None else now)
+        daily = self.rollups(patient, metric, 'day', now - days * 86400, now)
+        if not daily:
+            return None
+        if latest is None:
+            latest = self.latest(patient).get(metric)
+        x = np.array([row['bucket'] for row in daily], dtype=float) / 86400
+        y = np.array([row['mean'] for row in daily])
+        slope = float(np.polyfit(x, y, 1)[0]) * 7 if len(daily) > 1 else 0.0
+        threshold = TREND_THRESHOLDS[metric]
+        return {
+            'latest': latest,
+            'readings': sum(row['count'] for row in daily),
+            'mean': round(float(np.average(y, weights=[row['count'] for row in daily])), 2),
+            'change': round(float(y[-1] - y[0]), 2),
+            'slope_per_week': round(slope, 2),
+            'direction': 'rising' if slope > threshold else 'falling' if slope < -threshold else 'stable'
+        }
+
+    def trends(self, patient, days=90, now=None):
+        """trend() for every metric the patient has readings for"""
+        latest = self.latest(patient)
+        trends = {}
+        for metric in latest:
+            trend = self.trend(patient, metric, days, now, latest[metric])
+            if trend is not None:
+                trends[metric] = trend
+        return trends
+
+    def latest(self, patient):
+        """Most recent reading of each metric"""
+        rows = self._conn().execute('SELECT metric, last_value FROM series WHERE patient = ? ORDER BY metric',
+                                    (patient,)).fetchall()
+        metrics = list(METRICS)
+        return {metrics[code]: value / METRICS[metrics[code]] for code, value in rows}
+
+    def stats(self):
+        """Reading count, file size and bytes per reading"""
+        conn = self._conn()
+        readings = conn.execute('SELECT COALESCE(SUM(total), 0) FROM series').fetchone()[0]
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = os.path.getsize(self.path)
+        return {'readings': readings, 'bytes': size,
+                'bytes_per_reading': round(size / readings, 2) if readings else None}